@@ -7,21 +7,31 @@ Main application class that combines all components
 import os
 import json
 import time
-import threading
-import schedule
+import itertools
 import secrets
 from datetime import datetime, timedelta
-from collections import deque
 from flask import Flask, render_template, session, redirect, url_for, jsonify
 import logging
 
 # Import configuration and utilities
 from config import Config, WEBSOCKETS_AVAILABLE, MONGODB_AVAILABLE, ensure_directories, ensure_data_files
-from utils.rate_limiter import RateLimiter
-from utils.helpers import load_token, format_command, validate_server_id, validate_region
+from utils.rate_limiter import HierarchicalRateLimiter
+from utils.gportal_client import GPortalGraphQLClient
+from utils.command_dispatcher import CommandDispatcher
+from utils.console_stream import ConsoleStreamBroadcaster
+from utils.message_buffer import IndexedMessageBuffer, message_sequence
+from utils.console_rules import console_rules
+from utils.console_events import console_events
+from utils.console_archive import console_archive, server_key
+from utils.search_index import search_index
+from utils.runtime import runtime
+from utils.helpers import load_token, token_cache, format_command, validate_server_id, validate_region
 
 # Import systems
 from systems.koth import VanillaKothSystem
+from systems.economy import EconomyLedger, TransferEngine
+from systems.leaderboard import BalanceLeaderboard
+from systems.player_stats import PlayerStats
 
 
 # Import route blueprints
@@ -51,18 +61,32 @@ class GustBotEnhanced:
         ensure_directories()
         ensure_data_files()
         
-        # Rate limiter for G-Portal API
-        self.rate_limiter = RateLimiter(
-            max_calls=Config.RATE_LIMIT_MAX_CALLS,
-            time_window=Config.RATE_LIMIT_TIME_WINDOW
+        # Shared event loop for timers, WebSocket work and background I/O
+        runtime.start()
+        
+        # Rate limiter for G-Portal API (global, per-server and per-caller budgets)
+        self.rate_limiter = HierarchicalRateLimiter()
+        
+        # Shared keep-alive HTTP client for all G-Portal GraphQL traffic
+        self.graphql_client = GPortalGraphQLClient()
+        
+        # Per-server command queues drained by a bounded worker pool
+        self.command_dispatcher = CommandDispatcher(
+            self.send_console_command_graphql,
+            batch_send_func=self.send_console_commands_graphql
         )
+        self.command_dispatcher.start()
         
         # In-memory storage for demo mode
         self.servers = []
         self.events = []
         self.economy = {}
         self.clans = []
-        self.console_output = deque(maxlen=Config.CONSOLE_MESSAGE_BUFFER_SIZE)
+        self.console_output = IndexedMessageBuffer(maxlen=Config.CONSOLE_MESSAGE_BUFFER_SIZE)
+        if Config.CONSOLE_ARCHIVE_ENABLED:
+            # Number new messages after archived ones so seq orders history across restarts
+            message_sequence.advance(console_archive.last_seq())
+        self.console_stream = ConsoleStreamBroadcaster()
         self.gambling_history = []
         self.managed_servers = []
         self.event_history = []
@@ -78,8 +102,18 @@ class GustBotEnhanced:
         # Database connection (optional)
         self.init_database()
         
+        # Balance changes: write-behind ledger with MongoDB, striped locks in memory
+        self.economy_ledger = None
+        if self.db is not None and Config.ECONOMY_WRITE_BEHIND:
+            self.economy_ledger = EconomyLedger(self.db)
+            self.economy_ledger.start()
+        self.transfer_engine = TransferEngine(self.db, self.economy, ledger=self.economy_ledger,
+                                              leaderboard=BalanceLeaderboard())
+        self.transfer_engine.recover_transfers()
+        
         # Initialize systems
         self.vanilla_koth = VanillaKothSystem(self)
+        self.player_stats = PlayerStats()
         
         # WebSocket manager for live console (only if websockets available)
         if WEBSOCKETS_AVAILABLE:
@@ -119,11 +153,34 @@ class GustBotEnhanced:
             # Test the connection
             self.mongo_client.admin.command('ping')
             logger.info("✅ Connected to MongoDB")
+            self.ensure_indexes()
         except Exception as e:
             logger.warning(f"⚠️ MongoDB connection failed: {e}")
             logger.info("   Running in demo mode with in-memory storage")
             self.db = None
     
+    def ensure_indexes(self):
+        """Create the MongoDB indexes the economy and history queries rely on"""
+        from pymongo import ASCENDING, DESCENDING
+        
+        indexes = [
+            ('economy', [('userId', ASCENDING)], {'unique': True}),
+            ('economy', [('balance', DESCENDING), ('userId', ASCENDING)], {}),
+            ('transactions', [('userId', ASCENDING), ('timestamp', DESCENDING)], {}),
+            ('transactions', [('fromUserId', ASCENDING), ('timestamp', DESCENDING)], {}),
+            ('transactions', [('toUserId', ASCENDING), ('timestamp', DESCENDING)], {}),
+            ('gambling_logs', [('userId', ASCENDING), ('timestamp', DESCENDING)], {}),
+            ('koth_events', [('status', ASCENDING)], {})
+        ]
+        
+        for collection, keys, options in indexes:
+            try:
+                self.db[collection].create_index(keys, **options)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not create index {keys} on {collection}: {e}")
+        
+        logger.info(f"📇 Ensured {len(indexes)} MongoDB indexes")
+    
     def setup_routes(self):
         """Setup Flask routes and blueprints"""                # Register authentication blueprint
         self.app.register_blueprint(auth_bp)
@@ -135,16 +192,16 @@ class GustBotEnhanced:
         events_bp = init_events_routes(self.app, self.db, self.events, self.vanilla_koth, self.console_output)
         self.app.register_blueprint(events_bp)
 
-        economy_bp = init_economy_routes(self.app, self.db, self.economy)
+        economy_bp = init_economy_routes(self.app, self.db, self.economy, self.transfer_engine)
         self.app.register_blueprint(economy_bp)
 
-        gambling_bp = init_gambling_routes(self.app, self.db, self.gambling)
+        gambling_bp = init_gambling_routes(self.app, self.db, self.economy, self.transfer_engine)
         self.app.register_blueprint(gambling_bp)
 
         clans_bp = init_clans_routes(self.app, self.db, self.clans)
         self.app.register_blueprint(clans_bp)
 
-        users_bp = init_users_routes(self.app, self.db, self.users, self.console_output)
+        users_bp = init_users_routes(self.app, self, self.db, self.console_output)
         self.app.register_blueprint(users_bp)
         # Logs routes
         logs_bp = init_logs_routes(self.app, self.db, self.logs)
@@ -205,9 +262,8 @@ class GustBotEnhanced:
                     'type': 'command'
                 })
                 
-                # Simulate response in separate thread
+                # Simulate response with a runtime timer
                 def simulate_response():
-                    time.sleep(1)
                     self.console_output.append({
                         'timestamp': datetime.now().isoformat(),
                         'message': f"[DEMO] Command executed: {command}",
@@ -217,12 +273,30 @@ class GustBotEnhanced:
                         'type': 'system'
                     })
                 
-                threading.Thread(target=simulate_response, daemon=True).start()
+                runtime.call_later(1, simulate_response)
                 return jsonify({'success': True, 'demo_mode': True})
             
-            # Real mode - send command
-            result = self.send_console_command_graphql(command, server_id, region)
-            return jsonify({'success': result, 'demo_mode': False})
+            # Real mode - queue command and return immediately
+            ticket = self.queue_console_command(command, server_id, region)
+            return jsonify({
+                'success': ticket.status != 'rejected',
+                'demo_mode': False,
+                'commandId': ticket.command_id,
+                'status': ticket.status,
+                'error': ticket.error
+            })
+        
+        @self.app.route('/api/console/commands/<command_id>')
+        def get_console_command_status(command_id):
+            """Get status of a queued console command"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            status = self.command_dispatcher.get_status(command_id)
+            if not status:
+                return jsonify({'success': False, 'error': 'Command not found'}), 404
+            
+            return jsonify({'success': True, 'command': status})
         
         @self.app.route('/api/console/output')
         def get_console_output():
@@ -318,13 +392,21 @@ class GustBotEnhanced:
                 return jsonify({'error': 'Authentication required'}), 401
             
             if self.websocket_manager:
-                status = self.websocket_manager.get_connection_status()
+                stats = self.websocket_manager.get_stats()
+                status = stats['connection_details']
+                throughput = stats['throughput']
+                consumer_queues = stats['consumer_queues']
             else:
                 status = {}
+                throughput = {}
+                consumer_queues = {}
             
             return jsonify({
                 'connections': status,
                 'total_connections': len(status),
+                'throughput': throughput,
+                'consumer_queues': consumer_queues,
+                'stream': self.console_stream.get_stats(),
                 'demo_mode': session.get('demo_mode', True),
                 'websockets_available': WEBSOCKETS_AVAILABLE
             })
@@ -339,10 +421,24 @@ class GustBotEnhanced:
             server_id = request.args.get('serverId')
             limit = int(request.args.get('limit', 50))
             message_type = request.args.get('type')
+            since = request.args.get('since', type=int)
             
             if message_type == 'all':
                 message_type = None
             
+            # A cursor from before a restart can't be resumed - start over
+            reset = since is not None and since > message_sequence.current
+            if reset:
+                since = None
+            
+            if since is not None:
+                return jsonify(get_live_messages_since(server_id, limit, message_type, since))
+            
+            # Messages above the watermark may still have lower-numbered
+            # neighbours on their way into another buffer - leave them for
+            # the next poll so the cursor never skips one
+            watermark = message_sequence.published
+            
             # Get WebSocket messages (live server console) if available
             ws_messages = []
             if self.websocket_manager:
@@ -352,22 +448,20 @@ class GustBotEnhanced:
                     message_type=message_type
                 )
             
-            # Get console output messages (demo/commands/system messages only)
-            console_messages = []
-            for msg in self.console_output:
+            # Get console output messages (demo/commands/system messages only),
+            # reading only the requested type's entries
+            console_messages = (
+                msg for msg in self.console_output.iter_newest(message_type)
                 # Only include non-WebSocket messages to avoid duplication
-                if msg.get('source') != 'websocket_live':
-                    console_messages.append(msg)
-            
-            # Filter console messages by type
-            if message_type and message_type != 'all':
-                console_messages = [msg for msg in console_messages if msg.get('type') == message_type]
+                if msg.get('source') != 'websocket_live'
+            )
+            console_messages = list(itertools.islice(console_messages, limit)) if limit else list(console_messages)
             
             # Combine WebSocket and console messages
-            all_messages = ws_messages + console_messages[-limit:]
+            all_messages = [msg for msg in ws_messages + console_messages if msg.get('seq', 0) <= watermark]
             
-            # Sort by timestamp
-            all_messages.sort(key=lambda x: x.get("timestamp", ""))
+            # Sort by arrival order
+            all_messages.sort(key=lambda x: x.get("seq", 0))
             
             # Limit results
             final_messages = all_messages[-limit:] if limit else all_messages
@@ -375,11 +469,87 @@ class GustBotEnhanced:
             return jsonify({
                 'messages': final_messages,
                 'count': len(final_messages),
+                'cursor': max((msg.get('seq', 0) for msg in final_messages), default=0),
+                'has_more': False,
+                'reset': reset,
                 'server_id': server_id,
                 'timestamp': datetime.now().isoformat(),
                 'websockets_available': WEBSOCKETS_AVAILABLE
             })
         
+        def get_live_messages_since(server_id, limit, message_type, since):
+            """Get only the messages that arrived after a cursor"""
+            watermark = message_sequence.published
+            
+            ws_messages = []
+            if self.websocket_manager:
+                ws_messages = self.websocket_manager.get_messages(
+                    server_id=server_id,
+                    limit=limit + 1,
+                    message_type=message_type,
+                    since=since
+                )
+            
+            # Console output messages (demo/commands/system) newer than the cursor
+            console_messages = [
+                msg for msg in self.console_output.since(since, message_type)
+                if msg.get('source') != 'websocket_live'
+            ]
+            
+            new_messages = [msg for msg in ws_messages + console_messages if msg.get('seq', 0) <= watermark]
+            new_messages.sort(key=lambda x: x.get("seq", 0))
+            
+            # Oldest first so the next poll continues where this one stopped
+            final_messages = new_messages[:limit] if limit else new_messages
+            
+            return {
+                'messages': final_messages,
+                'count': len(final_messages),
+                'cursor': final_messages[-1]['seq'] if final_messages else since,
+                'has_more': len(new_messages) > len(final_messages),
+                'reset': False,
+                'server_id': server_id,
+                'timestamp': datetime.now().isoformat(),
+                'websockets_available': WEBSOCKETS_AVAILABLE
+            }
+        
+        @self.app.route('/api/console/live/stream')
+        def stream_live_messages():
+            """Stream live console messages as Server-Sent Events"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            from flask import request, Response, stream_with_context
+            server_ids = [sid for sid in request.args.get('serverId', '').split(',') if sid]
+            message_types = [t for t in request.args.get('type', '').split(',') if t and t != 'all']
+            
+            subscriber = self.console_stream.subscribe(server_ids, message_types)
+            if subscriber is None:
+                return jsonify({'error': 'Too many live console streams'}), 503
+            
+            def generate():
+                try:
+                    yield f"retry: {Config.CONSOLE_AUTO_REFRESH_INTERVAL}\n\n"
+                    while True:
+                        payload = subscriber.next_payload(Config.CONSOLE_STREAM_KEEPALIVE)
+                        
+                        drops = subscriber.take_drops()
+                        if drops:
+                            yield f"event: overflow\ndata: {json.dumps({'dropped': drops})}\n\n"
+                        
+                        if payload is None:
+                            yield ": keepalive\n\n"
+                        else:
+                            yield f"data: {payload}\n\n"
+                finally:
+                    self.console_stream.unsubscribe(subscriber)
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
         @self.app.route('/api/console/live/test')
         def test_live_console():
             """Test endpoint to check live console functionality"""
@@ -445,13 +615,10 @@ class GustBotEnhanced:
             limit = int(request.args.get('limit', 50))
             message_type = request.args.get('type')
             
-            console_messages = list(self.console_output)
-            
-            # Filter by type
-            if message_type and message_type != 'all':
-                console_messages = [msg for msg in console_messages if msg.get('type') == message_type]
-            
-            final_messages = console_messages[-limit:] if limit else console_messages
+            # Newest first from the requested type's entries only
+            newest = self.console_output.iter_newest(message_type)
+            final_messages = list(itertools.islice(newest, limit)) if limit else list(newest)
+            final_messages.reverse()
             
             return jsonify({
                 'messages': final_messages,
@@ -644,6 +811,193 @@ class GustBotEnhanced:
             diagnostics = self.get_server_diagnostics_api(server_id)
             return jsonify(diagnostics)
         
+        @self.app.route('/api/graphql/stats')
+        def graphql_stats():
+            """Get G-Portal GraphQL client statistics"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            return jsonify({
+                'client': self.graphql_client.get_stats(),
+                'dispatch': self.command_dispatcher.get_stats(),
+                'rate_limits': self.rate_limiter.get_stats(),
+                'token': token_cache.get_stats(),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        @self.app.route('/api/console/events')
+        def console_event_feed():
+            """Get recent typed console events (kills, joins, leaves, chats, saves)"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            from flask import request
+            limit = request.args.get('limit', 50, type=int)
+            kind = request.args.get('kind')
+            server_id = request.args.get('serverId')
+            
+            return jsonify({
+                'events': console_events.get_recent(limit, kind, server_id),
+                'stats': console_events.get_stats()
+            })
+        
+        @self.app.route('/api/console/players')
+        def console_player_stats():
+            """Get per-player kill, death and session counts from the live console"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            from flask import request
+            server_id = request.args.get('serverId')
+            if not server_id:
+                return jsonify({'error': 'serverId is required'}), 400
+            
+            name = request.args.get('player')
+            if name:
+                player = self.player_stats.get_player(server_id, name)
+                if player is None:
+                    return jsonify({'error': 'Player not seen on this server'}), 404
+                return jsonify(player)
+            
+            try:
+                players = self.player_stats.top(
+                    server_id,
+                    stat=request.args.get('sort', 'kills'),
+                    limit=request.args.get('limit', 10, type=int)
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'players': players,
+                'stats': self.player_stats.get_stats()
+            })
+        
+        @self.app.route('/api/console/archive')
+        def console_archive_query():
+            """Search archived console history by server, time range, type and text"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            from flask import request
+            
+            def parse_time(value):
+                # Epoch seconds or ISO 8601
+                if not value:
+                    return None
+                try:
+                    return float(value)
+                except ValueError:
+                    return datetime.fromisoformat(value).timestamp()
+            
+            try:
+                start = parse_time(request.args.get('start'))
+                end = parse_time(request.args.get('end'))
+            except ValueError:
+                return jsonify({'error': 'start and end must be epoch seconds or ISO 8601 times'}), 400
+            
+            server_id = request.args.get('serverId')
+            if server_id:
+                try:
+                    server_key(server_id)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            
+            limit = max(1, min(request.args.get('limit', 200, type=int), Config.CONSOLE_ARCHIVE_QUERY_LIMIT))
+            results = console_archive.query(
+                server_id=server_id,
+                start=start,
+                end=end,
+                message_type=request.args.get('type'),
+                contains=request.args.get('q'),
+                after_seq=request.args.get('afterSeq', type=int)
+            )
+            
+            # Read one extra message to report truncation without scanning further
+            messages = list(itertools.islice(results, limit + 1))
+            truncated = len(messages) > limit
+            results.close()
+            
+            return jsonify({
+                'messages': messages[:limit],
+                'count': min(len(messages), limit),
+                'truncated': truncated
+            })
+        
+        @self.app.route('/api/console/archive/stats')
+        def console_archive_stats():
+            """Get console archive write statistics"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            return jsonify(console_archive.get_stats())
+        
+        @self.app.route('/api/search')
+        def global_search():
+            """Search archived console messages and downloaded logs by player ID, name or words"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            from flask import request
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({'error': 'Query parameter q is required'}), 400
+            
+            started = time.perf_counter()
+            results = search_index.search(
+                query,
+                server_id=request.args.get('serverId'),
+                source=request.args.get('source'),
+                limit=min(request.args.get('limit', 100, type=int), Config.SEARCH_RESULT_LIMIT)
+            )
+            
+            return jsonify({
+                'query': query,
+                'results': results,
+                'count': len(results),
+                'took_ms': round((time.perf_counter() - started) * 1000, 2)
+            })
+        
+        @self.app.route('/api/search/stats')
+        def search_stats():
+            """Get search index statistics"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            return jsonify(search_index.get_stats())
+        
+        @self.app.route('/api/console/rules')
+        def console_rules_stats():
+            """Get console classification rules and per-rule match counts"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            return jsonify(console_rules.get_stats())
+        
+        @self.app.route('/api/console/rules/reload', methods=['POST'])
+        def reload_console_rules():
+            """Reload console classification rules from disk"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            success = console_rules.reload()
+            return jsonify({
+                'success': success,
+                'error': console_rules.last_error,
+                'rules': len(console_rules.get_stats()['rules'])
+            })
+        
+        @self.app.route('/api/rate-limits/stats')
+        def rate_limit_stats():
+            """Get live G-Portal rate limit utilization per level"""
+            if 'logged_in' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            return jsonify({
+                'rate_limits': self.rate_limiter.get_stats(),
+                'timestamp': datetime.now().isoformat()
+            })
+        
         @self.app.route('/health')
         def health_check():
             """Health check endpoint"""
@@ -655,6 +1009,7 @@ class GustBotEnhanced:
                 'websockets_available': WEBSOCKETS_AVAILABLE,
                 'active_events': len(self.vanilla_koth.get_active_events()),
                 'live_connections': len(self.live_connections) if self.live_connections else 0,
+                'runtime': runtime.get_stats(),
                 'features': {
                     'console_commands': True,
                     'event_management': True,
@@ -667,92 +1022,122 @@ class GustBotEnhanced:
                 }
             })
     
-    def send_console_command_graphql(self, command, sid, region):
+    def send_console_command_graphql(self, command, sid, region, caller_class='interactive'):
         """Send console command via GraphQL with rate limiting"""
-        import requests
-        
-        self.rate_limiter.wait_if_needed("graphql")
+        return self.send_console_commands_graphql([(command, sid, region)], caller_class)[0]
+    
+    def send_console_commands_graphql(self, commands, caller_class='interactive'):
+        """
+        Send one or more console commands in a single GraphQL request
         
-        token = load_token()
-        if not token:
-            logger.warning("❌ No G-Portal token available")
-            return False
+        Args:
+            commands (list): (command, server_id, region) tuples
+            caller_class (str): Rate limit class (interactive, koth or bulk)
+            
+        Returns:
+            list: Success flag for each command, in the same order
+        """
+        results = [False] * len(commands)
+        if not commands:
+            return results
         
         # Validate inputs
-        is_valid, server_id = validate_server_id(sid)
-        if not is_valid:
-            logger.error(f"❌ Invalid server ID: {sid}")
-            return False
-        
-        if not validate_region(region):
-            logger.error(f"❌ Invalid region: {region}")
-            return False
+        batch = []
+        for index, (command, sid, region) in enumerate(commands):
+            is_valid, server_id = validate_server_id(sid)
+            if not is_valid:
+                logger.error(f"❌ Invalid server ID: {sid}")
+                continue
+            
+            if not validate_region(region):
+                logger.error(f"❌ Invalid region: {region}")
+                continue
+            
+            # Format command properly
+            batch.append((index, server_id, region.upper(), format_command(command)))
         
-        endpoint = Config.GPORTAL_API_ENDPOINT
+        if not batch:
+            return results
         
-        # Format command properly
-        formatted_command = format_command(command)
+        self.rate_limiter.wait_if_needed(
+            server_ids=[server_id for _, server_id, _, _ in batch],
+            caller_class=caller_class
+        )
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "User-Agent": "GUST-Bot/1.0"
-        }
+        token = load_token()
+        if not token:
+            logger.warning("❌ No G-Portal token available")
+            return results
         
-        payload = {
-            "operationName": "sendConsoleMessage",
-            "variables": {
-                "sid": server_id,
-                "region": region.upper(),
-                "message": formatted_command
-            },
-            "query": """mutation sendConsoleMessage($sid: Int!, $region: REGION!, $message: String!) {
-              sendConsoleMessage(rsid: {id: $sid, region: $region}, message: $message) {
-                ok
-                __typename
-              }
-            }"""
-        }
+        payload = self.graphql_client.build_console_payload(
+            [(server_id, region, formatted_command) for _, server_id, region, formatted_command in batch]
+        )
         
         try:
-            logger.info(f"🔄 Sending command to server {server_id} ({region}): {formatted_command}")
-            response = requests.post(endpoint, json=payload, headers=headers, timeout=15)
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if 'data' in data and 'sendConsoleMessage' in data['data']:
-                        result = data['data']['sendConsoleMessage']
-                        success = result.get('ok', False)
-                        logger.info(f"✅ Command result: {success}")
-                        
-                        # Add to console output for tracking
-                        self.console_output.append({
-                            'timestamp': datetime.now().isoformat(),
-                            'command': formatted_command,
-                            'server_id': str(server_id),
-                            'status': 'sent' if success else 'failed',
-                            'source': 'api',
-                            'type': 'command'
-                        })
-                        
-                        return success
-                    elif 'errors' in data:
-                        logger.error(f"❌ GraphQL errors: {data['errors']}")
-                        return False
-                    else:
-                        logger.error(f"❌ Unexpected response format")
-                        return False
-                except json.JSONDecodeError as e:
-                    logger.error(f"❌ Failed to parse JSON response: {e}")
-                    return False
+            if len(batch) == 1:
+                _, server_id, region, formatted_command = batch[0]
+                logger.info(f"🔄 Sending command to server {server_id} ({region}): {formatted_command}")
             else:
+                logger.info(f"🔄 Sending batch of {len(batch)} commands to "
+                            f"{len(set(item[1] for item in batch))} server(s)")
+            response = self.graphql_client.post(payload, token)
+            
+            if response.status_code != 200:
                 logger.error(f"❌ HTTP error {response.status_code}")
-                return False
+                return results
+            
+            try:
+                data = response.json()
+            except json.JSONDecodeError as e:
+                logger.error(f"❌ Failed to parse JSON response: {e}")
+                return results
+            
+            if not data.get('data'):
+                if 'errors' in data:
+                    logger.error(f"❌ GraphQL errors: {data['errors']}")
+                else:
+                    logger.error(f"❌ Unexpected response format")
+                return results
+            
+            if 'errors' in data:
+                logger.warning(f"⚠️ GraphQL errors in batch: {data['errors']}")
+            
+            ok_flags = self.graphql_client.parse_console_results(data, len(batch))
+            
+            for (index, server_id, region, formatted_command), success in zip(batch, ok_flags):
+                results[index] = success
+                
+                # Add to console output for tracking
+                self.console_output.append({
+                    'timestamp': datetime.now().isoformat(),
+                    'command': formatted_command,
+                    'server_id': str(server_id),
+                    'status': 'sent' if success else 'failed',
+                    'source': 'api',
+                    'type': 'command'
+                })
+            
+            logger.info(f"✅ Command result: {sum(ok_flags)}/{len(ok_flags)} ok")
+            return results
                 
         except Exception as e:
             logger.error(f"❌ Unexpected error: {e}")
-            return False
+            return results
+    
+    def queue_console_command(self, command, sid, region, caller_class='interactive'):
+        """
+        Queue console command for asynchronous delivery
+        
+        Args:
+            command (str): Console command
+            sid: Server ID
+            region (str): Server region
+            caller_class (str): Rate limit class (interactive, koth or bulk)
+            
+        Returns:
+            CommandTicket: Ticket with command ID and future
+        """
+        return self.command_dispatcher.submit(command, sid, region, caller_class)
     
     # Economy API methods (placeholder implementations)
     def transfer_coins_api(self, from_user, to_user, amount):
@@ -796,17 +1181,20 @@ class GustBotEnhanced:
         }
     
     def start_background_tasks(self):
-        """Start background tasks"""
-        def run_scheduled():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-        
+        """Start background tasks on the shared runtime"""
         # Schedule cleanup tasks
-        schedule.every(5).minutes.do(self.cleanup_expired_events)
+        runtime.every(Config.EVENT_CLEANUP_INTERVAL, self.cleanup_expired_events)
+        
+        # Refresh the G-Portal token before it expires so senders never wait on it
+        token_cache.start_refresher()
+        
+        # Write partial console archive blocks and drop history past retention
+        if Config.CONSOLE_ARCHIVE_ENABLED:
+            runtime.every(Config.CONSOLE_ARCHIVE_FLUSH_INTERVAL, console_archive.flush, name='console_archive_flush')
+            runtime.every(3600, console_archive.prune, name='console_archive_prune')
         
-        thread = threading.Thread(target=run_scheduled, daemon=True)
-        thread.start()
+        # Index new archive blocks and downloaded logs for /api/search
+        runtime.every(Config.SEARCH_INDEX_REFRESH_INTERVAL, search_index.refresh, name='search_index_refresh')
         
         logger.info("📅 Background tasks started")
     
@@ -843,6 +1231,13 @@ class GustBotEnhanced:
             # Clean up WebSocket connections
             if self.websocket_manager:
                 self.websocket_manager.stop()
+            self.command_dispatcher.stop()
+            self.graphql_client.close()
+            token_cache.stop_refresher()
+            console_archive.flush()
+            if self.economy_ledger:
+                self.economy_ledger.stop()
+            runtime.stop()
         except Exception as e:
             logger.error(f"\n❌ Error: {e}")
 
@@ -0,0 +1,205 @@
+"""
+GUST Bot Enhanced - Console Classifier Benchmark
+===============================================
+Checks that the compiled classifier matches the original if-chain and
+measures the speedup on a console corpus, then checks the console rule
+engine against trying every rule in order and times it on the corpus
+and on long and unmatched lines (cost should grow linearly with length).
+
+Usage:
+    python benchmarks/classify_benchmark.py [corpus.txt] [--rounds N]
+
+corpus.txt holds one captured console line per line. Without it a
+synthetic corpus shaped like live Rust console traffic is used.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import MessageClassifier
+from utils.console_rules import ConsoleRuleEngine
+
+def legacy_classify_message(message):
+    """Original if-chain classifier, kept as the reference implementation"""
+    if not message:
+        return "system"
+    
+    message_lower = message.lower()
+    
+    if any(pattern in message_lower for pattern in ["[save]", "saving", "saved", "save to", "beginning save"]):
+        return "save"
+    elif any(pattern in message_lower for pattern in ["[chat]", "global.say", "player chat", "say "]):
+        return "chat"
+    elif any(pattern in message_lower for pattern in ["vip", "admin", "moderator", "owner", "auth"]):
+        return "auth"
+    elif any(pattern in message_lower for pattern in ["[kill]", "killed", "died", "death", "suicide"]):
+        return "kill"
+    elif any(pattern in message_lower for pattern in ["error", "exception", "failed", "fail", "crash"]):
+        return "error"
+    elif any(pattern in message_lower for pattern in ["warning", "warn", "alert"]):
+        return "warning"
+    elif any(pattern in message_lower for pattern in ["executing console", "command", "executed"]):
+        return "command"
+    elif any(pattern in message_lower for pattern in ["player", "connected", "disconnected", "joined", "left"]):
+        return "player"
+    elif any(pattern in message_lower for pattern in ["server", "startup", "shutdown", "restart"]):
+        return "server"
+    else:
+        return "system"
+
+SAMPLE_LINES = [
+    "Saving complete",
+    "[SAVE] Saving 48211 entities",
+    "Saved 48211 ents, cache(0.12), write(0.03), disk(0.01)",
+    "[CHAT] {name}[{sid}] : anyone want to trade scrap?",
+    "Executing console system command 'global.say KOTH starts in 5 minutes'",
+    "{name}[{sid}] was killed by {other}[{sid2}]",
+    "{name}[{sid}] died (Bleeding)",
+    "{name} has entered the game",
+    "{name}[{sid}/{steam}] joined [windows/{steam}]",
+    "{ip}:{port}/{steam}/{name} disconnecting: closing",
+    "Kicked: {name} - Steam Auth Timeout",
+    "NullReferenceException: Object reference not set to an instance of an object",
+    "Failed to load plugin AutoDoors (timeout)",
+    "[VIP] {name} granted vip by admin",
+    "Server startup complete",
+    "Calling 'OnServerSave' on 'Backpacks v3.13.2' took 128ms",
+    "{name}[{sid}] has auth level 1",
+    "Invalid Position: {name}[{sid}] (-1234.5, 12.0, 881.2) (deviation: 12.3)",
+    "Unity FPS: {fps}, entities: 48211, memory: {mem}MB",
+    "Warning: collider mesh has {n} triangles",
+]
+
+NAMES = ["Oscar", "r0ck", "VIPanda", "Mod_Tom", "Zed", "killerqueen", "Saviour", "Ada"]
+
+def build_corpus(size, seed=1):
+    """
+    Build a synthetic console corpus
+    
+    Args:
+        size (int): Number of lines
+        seed (int): Random seed
+        
+    Returns:
+        list: Console lines
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        template = rng.choice(SAMPLE_LINES)
+        corpus.append(template.format(
+            name=rng.choice(NAMES),
+            other=rng.choice(NAMES),
+            sid=rng.randint(1000000, 9999999),
+            sid2=rng.randint(1000000, 9999999),
+            steam=rng.randint(76561190000000000, 76561199999999999),
+            ip="10.0.%d.%d" % (rng.randint(0, 255), rng.randint(0, 255)),
+            port=rng.randint(1024, 65535),
+            fps=rng.randint(20, 256),
+            mem=rng.randint(4000, 16000),
+            n=rng.randint(1000, 90000),
+        ))
+    return corpus
+
+def legacy_rule_match(engine, message):
+    """Reference rule matching: search every rule in priority order"""
+    searches, _, _, _, _ = engine._state[0]
+    for index, search in enumerate(searches):
+        found = search(message)
+        if found:
+            return engine._state[1][index].name
+    return None
+
+def build_long_lines(length, seed=2):
+    """
+    Build long console lines that stress the rule engine
+    
+    Args:
+        length (int): Characters per line
+        seed (int): Random seed
+        
+    Returns:
+        dict: Case name -> lines
+    """
+    rng = random.Random(seed)
+    filler = lambda: ''.join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(length))
+    return {
+        "unmatched": [filler() for _ in range(20)],
+        "no brackets": ["z" * length for _ in range(20)],
+        "kill near-miss": [f"Oscar[1] was killed by {filler()}" for _ in range(20)],
+        "kill at end": [f"{filler()} Oscar[1] was killed by Zed[2]" for _ in range(20)],
+    }
+
+def time_it(func, corpus, rounds):
+    """Get the best per-pass time of func over the corpus"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for line in corpus:
+            func(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="captured console log, one line per message")
+    parser.add_argument("--rounds", type=int, default=5, help="timing rounds (best is reported)")
+    parser.add_argument("--size", type=int, default=50000, help="synthetic corpus size")
+    args = parser.parse_args()
+    
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8", errors="replace") as f:
+            corpus = [line.rstrip("\n") for line in f]
+    else:
+        corpus = build_corpus(args.size)
+    
+    # Equivalence first - every line must classify exactly as before
+    classifier = MessageClassifier()
+    mismatches = [line for line in corpus if legacy_classify_message(line) != classifier.classify(line)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatches, first: {mismatches[0]!r}")
+        return 1
+    print(f"✅ {len(corpus)} lines classified identically")
+    
+    legacy = time_it(legacy_classify_message, corpus, args.rounds)
+    compiled = time_it(classifier._classify, corpus, args.rounds)
+    cached = time_it(classifier.classify, corpus, args.rounds)
+    
+    per_line = lambda seconds: seconds / len(corpus) * 1e6
+    print(f"legacy if-chain    {per_line(legacy):7.2f} µs/line")
+    print(f"compiled           {per_line(compiled):7.2f} µs/line  ({legacy / compiled:.2f}x)")
+    print(f"compiled + LRU     {per_line(cached):7.2f} µs/line  ({legacy / cached:.2f}x)")
+    print(f"cache: {classifier.cache_info()}")
+    
+    # Console rules - the prefilter must never change which rule wins
+    engine = ConsoleRuleEngine(cache_size=1)
+    match_rule = lambda line: engine._state[3].__wrapped__(line)
+    long_cases = {length: build_long_lines(length) for length in (1000, 10000)}
+    checked = corpus + [line for cases in long_cases.values() for lines in cases.values() for line in lines]
+    mismatches = [line for line in checked if legacy_rule_match(engine, line) != getattr(match_rule(line), 'rule', None)]
+    if mismatches:
+        print(f"❌ console rules: {len(mismatches)} mismatches, first: {mismatches[0][:120]!r}")
+        return 1
+    print(f"✅ console rules ({engine.source}): {len(checked)} lines matched identically")
+    
+    rules_all = time_it(lambda line: legacy_rule_match(engine, line), corpus, args.rounds)
+    rules_prefiltered = time_it(match_rule, corpus, args.rounds)
+    print(f"every rule         {per_line(rules_all):7.2f} µs/line")
+    print(f"keyword prefilter  {per_line(rules_prefiltered):7.2f} µs/line  ({rules_all / rules_prefiltered:.2f}x)")
+    
+    for name in long_cases[1000]:
+        timings = []
+        for length, cases in long_cases.items():
+            lines = cases[name]
+            timings.append(time_it(match_rule, lines, args.rounds) / len(lines) / length * 1e9)
+        print(f"{name:<18} {timings[0]:7.1f} ns/char at 1k, {timings[1]:7.1f} ns/char at 10k")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,16 +36,54 @@ class Config:
     # Rate limiting settings
     RATE_LIMIT_MAX_CALLS = 5
     RATE_LIMIT_TIME_WINDOW = 1  # seconds
+    RATE_LIMIT_SERVER_MAX_CALLS = 3  # per server, within the global budget
+    RATE_LIMIT_SERVER_TIME_WINDOW = 1  # seconds
+    RATE_LIMIT_CLASS_LIMITS = {  # caller class -> (max_calls, time_window)
+        'interactive': (5, 1),
+        'koth': (3, 1),
+        'bulk': (2, 1)
+    }
     
     # WebSocket settings
     WEBSOCKET_URI = "wss://www.g-portal.com/ngpapi/"
     WEBSOCKET_PING_INTERVAL = 30
     WEBSOCKET_PING_TIMEOUT = 10
     WEBSOCKET_CONNECTION_TIMEOUT = 15
+    WEBSOCKET_MULTIPLEX = True  # share one socket per token across all servers
+    WEBSOCKET_RECONNECT_BASE_DELAY = 1  # seconds, doubled per failed attempt
+    WEBSOCKET_RECONNECT_MAX_DELAY = 60  # seconds
+    WEBSOCKET_MAX_RECONNECT_ATTEMPTS = 0  # consecutive failures before giving up, 0 = never
+    WEBSOCKET_MESSAGE_LOG_MODE = 'sampled'  # 'all' logs every live line and rule notify, 'sampled' one per server (and rule) per interval, 'off'
+    WEBSOCKET_MESSAGE_LOG_INTERVAL = 60  # seconds between sampled per-server message logs
+    WEBSOCKET_STATS_WINDOW = 10  # seconds of history for messages/sec and bytes/sec
+    WEBSOCKET_CONSUMER_QUEUE_SIZE = 1000  # live messages queued per server for the consumer callback
+    WEBSOCKET_OVERFLOW_POLICY = 'drop_by_type'  # 'drop_oldest', 'drop_newest' or 'drop_by_type'
+    WEBSOCKET_DROPPABLE_TYPES = ['save', 'system', 'player', 'server', 'warning']  # shed first by drop_by_type
     
     # G-Portal API settings
     GPORTAL_AUTH_URL = 'https://auth.g-portal.com/auth/realms/master/protocol/openid-connect/token'
     GPORTAL_API_ENDPOINT = "https://www.g-portal.com/ngpapi/"
+    TOKEN_REFRESH_LEAD_TIME = 60  # seconds before expiry to refresh in the background
+    
+    # GraphQL HTTP connection pool settings
+    GRAPHQL_POOL_CONNECTIONS = 4
+    GRAPHQL_POOL_MAXSIZE = 16
+    GRAPHQL_MAX_RETRIES = 2  # connection failures only
+    GRAPHQL_RETRY_BACKOFF = 0.3
+    GRAPHQL_CONNECT_TIMEOUT = 5  # seconds
+    GRAPHQL_READ_TIMEOUT = 15  # seconds
+    
+    # Console command dispatch settings
+    COMMAND_DISPATCH_WORKERS = 4
+    COMMAND_QUEUE_MAX_PER_SERVER = 500
+    COMMAND_HISTORY_SIZE = 1000
+    COMMAND_BATCH_WINDOW = 0.05  # seconds to coalesce commands into one request
+    COMMAND_BATCH_MAX = 20
+    COMMAND_RESULT_TIMEOUT = 30  # seconds routes wait for a queued command
+    
+    # Shared async runtime settings
+    RUNTIME_MAX_WORKERS = 8  # threads for blocking calls made from the runtime loop
+    EVENT_CLEANUP_INTERVAL = 300  # seconds between expired event sweeps
     
     # Server settings
     DEFAULT_HOST = '127.0.0.1'
@@ -58,12 +96,47 @@ class Config:
     
     # Console settings
     CONSOLE_MESSAGE_BUFFER_SIZE = 1000
+    CONSOLE_CLASSIFIER_CACHE_SIZE = 2048  # recently classified lines kept in the LRU
+    CONSOLE_RULES_FILE = 'data/console_rules.json'
+    CONSOLE_RULES_RELOAD_INTERVAL = 5  # seconds between rules file change checks
+    CONSOLE_EVENT_HISTORY = 500  # recent typed console events kept for the API
+    CONSOLE_ARCHIVE_ENABLED = True
+    CONSOLE_ARCHIVE_DIR = 'data/console_archive'
+    CONSOLE_ARCHIVE_BLOCK_SIZE = 256  # messages per compressed block (one sparse index entry each)
+    CONSOLE_ARCHIVE_SEGMENT_SIZE = 16 * 1024 * 1024  # compressed bytes before starting a new segment
+    CONSOLE_ARCHIVE_FLUSH_INTERVAL = 5  # seconds before a partial block is written
+    CONSOLE_ARCHIVE_RETENTION_DAYS = 14  # days of archived history kept on disk
+    CONSOLE_ARCHIVE_QUERY_LIMIT = 5000  # maximum messages returned per archive query
+    
+    # Search index settings
+    SEARCH_INDEX_DIR = 'data/search_index'
+    SEARCH_INDEX_REFRESH_INTERVAL = 10  # seconds between incremental index refreshes
+    SEARCH_INDEX_SEGMENT_DOCS = 200000  # documents per segment written by a refresh
+    SEARCH_INDEX_MERGE_FACTOR = 4  # adjacent segments of a similar size merged together
+    SEARCH_RESULT_LIMIT = 500  # maximum results per search
     CONSOLE_AUTO_REFRESH_INTERVAL = 3000  # milliseconds
     CONSOLE_RECONNECT_INTERVAL = 30000  # milliseconds
+    CONSOLE_STREAM_MAX_CLIENTS = 20  # concurrent Server-Sent Events clients
+    CONSOLE_STREAM_QUEUE_SIZE = 200  # messages buffered per client before dropping
+    CONSOLE_STREAM_KEEPALIVE = 15  # seconds between keepalive comments
     
     # KOTH Event settings
     KOTH_DEFAULT_DURATION = 30  # minutes
     KOTH_PREPARATION_TIME = 300  # 5 minutes in seconds
+    KOTH_JOURNAL_FILE = 'data/koth_journal.jsonl'  # event progress journal when MongoDB is not used
+    KOTH_JOURNAL_FSYNC = True  # fsync every journal record
+    KOTH_KILL_PERSIST_DELAY = 2  # seconds kill tally changes are coalesced before being persisted
+    KOTH_STALE_ANNOUNCEMENT = 30  # seconds late before a missed announcement is skipped on resume
+    KOTH_RECOVERY_MAX_LATE = 3600  # seconds after its end an interrupted event is still completed
+    
+    # Economy ledger settings (MongoDB mode)
+    ECONOMY_WRITE_BEHIND = True  # batch balance changes and logs instead of writing each one
+    ECONOMY_WAL_FILE = 'data/economy_wal.jsonl'  # changes not yet flushed to MongoDB
+    ECONOMY_WAL_FSYNC = True  # fsync every write-ahead log record
+    ECONOMY_FLUSH_INTERVAL = 2  # seconds between write-behind flushes
+    ECONOMY_FLUSH_BATCH_SIZE = 500  # operations per bulk_write; a full batch flushes early
+    ECONOMY_TRANSACTIONS = True  # without write-behind, run transfers in a session transaction when MongoDB supports it
+    ECONOMY_PENDING_TRANSFERS = 'pending_transfers'  # journal of transfers in flight when transactions are unavailable
     
     # Arena locations for KOTH events
     ARENA_LOCATIONS = [
@@ -9,13 +9,14 @@ from datetime import datetime
 import uuid
 
 from routes.auth import require_auth
+from systems.economy import TransferEngine
 import logging
 
 logger = logging.getLogger(__name__)
 
 economy_bp = Blueprint('economy', __name__)
 
-def init_economy_routes(app, db, economy_storage):
+def init_economy_routes(app, db, economy_storage, engine=None):
     """
     Initialize economy routes with dependencies
     
@@ -23,18 +24,17 @@ def init_economy_routes(app, db, economy_storage):
         app: Flask app instance
         db: Database connection (optional)
         economy_storage: In-memory economy storage
+        engine (TransferEngine): Shared balance engine (created if omitted)
     """
     
+    engine = engine or TransferEngine(db, economy_storage)
+    
     @economy_bp.route('/api/economy/balance/<user_id>')
     @require_auth
     def get_user_balance(user_id):
         """Get user's economy balance"""
         try:
-            if db:
-                user = db.economy.find_one({'userId': user_id})
-                balance = user.get('balance', 0) if user else 0
-            else:
-                balance = economy_storage.get(user_id, 0)
+            balance = engine.balance(user_id)
             
             logger.info(f"💰 Balance check for {user_id}: {balance}")
             return jsonify({'balance': balance, 'userId': user_id})
@@ -62,26 +62,24 @@ def init_economy_routes(app, db, economy_storage):
             if from_user == to_user:
                 return jsonify({'success': False, 'error': 'Cannot transfer to yourself'})
             
+            # Transaction log, recorded with the balance change if it succeeds
+            transaction = {
+                'transactionId': str(uuid.uuid4()),
+                'type': 'transfer',
+                'fromUserId': from_user,
+                'toUserId': to_user,
+                'amount': amount,
+                'timestamp': datetime.now().isoformat(),
+                'status': 'completed'
+            }
+            
             # Perform transfer
-            result = transfer_coins_internal(from_user, to_user, amount, db, economy_storage)
+            result = transfer_coins_internal(from_user, to_user, amount, db, economy_storage, engine,
+                                             ('transactions', transaction))
             
             if result['success']:
                 logger.info(f"💸 Transfer successful: {from_user} -> {to_user}, amount: {amount}")
                 
-                # Log the transaction
-                transaction = {
-                    'transactionId': str(uuid.uuid4()),
-                    'type': 'transfer',
-                    'fromUserId': from_user,
-                    'toUserId': to_user,
-                    'amount': amount,
-                    'timestamp': datetime.now().isoformat(),
-                    'status': 'completed'
-                }
-                
-                if db:
-                    db.transactions.insert_one(transaction)
-                
             return jsonify(result)
             
         except Exception as e:
@@ -104,22 +102,6 @@ def init_economy_routes(app, db, economy_storage):
             if amount <= 0:
                 return jsonify({'success': False, 'error': 'Amount must be greater than 0'})
             
-            # Add coins
-            if db:
-                db.economy.update_one(
-                    {'userId': user_id},
-                    {'$inc': {'balance': amount}},
-                    upsert=True
-                )
-                # Get new balance
-                user = db.economy.find_one({'userId': user_id})
-                new_balance = user.get('balance', 0) if user else 0
-            else:
-                economy_storage[user_id] = economy_storage.get(user_id, 0) + amount
-                new_balance = economy_storage[user_id]
-            
-            logger.info(f"💰 Added {amount} coins to {user_id}, new balance: {new_balance}")
-            
             # Log the transaction
             transaction = {
                 'transactionId': str(uuid.uuid4()),
@@ -131,8 +113,10 @@ def init_economy_routes(app, db, economy_storage):
                 'status': 'completed'
             }
             
-            if db:
-                db.transactions.insert_one(transaction)
+            # Add coins (recorded together with the transaction)
+            new_balance = engine.adjust(user_id, amount, ('transactions', transaction))
+            
+            logger.info(f"💰 Added {amount} coins to {user_id}, new balance: {new_balance}")
             
             return jsonify({
                 'success': True,
@@ -160,31 +144,6 @@ def init_economy_routes(app, db, economy_storage):
             if amount <= 0:
                 return jsonify({'success': False, 'error': 'Amount must be greater than 0'})
             
-            # Check current balance
-            if db:
-                user = db.economy.find_one({'userId': user_id})
-                current_balance = user.get('balance', 0) if user else 0
-            else:
-                current_balance = economy_storage.get(user_id, 0)
-            
-            if current_balance < amount:
-                return jsonify({'success': False, 'error': 'Insufficient balance'})
-            
-            # Remove coins
-            if db:
-                db.economy.update_one(
-                    {'userId': user_id},
-                    {'$inc': {'balance': -amount}}
-                )
-                # Get new balance
-                user = db.economy.find_one({'userId': user_id})
-                new_balance = user.get('balance', 0) if user else 0
-            else:
-                economy_storage[user_id] = economy_storage.get(user_id, 0) - amount
-                new_balance = economy_storage[user_id]
-            
-            logger.info(f"💸 Removed {amount} coins from {user_id}, new balance: {new_balance}")
-            
             # Log the transaction
             transaction = {
                 'transactionId': str(uuid.uuid4()),
@@ -196,8 +155,13 @@ def init_economy_routes(app, db, economy_storage):
                 'status': 'completed'
             }
             
-            if db:
-                db.transactions.insert_one(transaction)
+            # Remove coins only if the balance covers them (checked atomically),
+            # recorded together with the transaction
+            new_balance = engine.adjust(user_id, -amount, ('transactions', transaction))
+            if new_balance is None:
+                return jsonify({'success': False, 'error': 'Insufficient balance'})
+            
+            logger.info(f"💸 Removed {amount} coins from {user_id}, new balance: {new_balance}")
             
             return jsonify({
                 'success': True,
@@ -245,9 +209,12 @@ def init_economy_routes(app, db, economy_storage):
         """Get economy leaderboard"""
         try:
             limit = int(request.args.get('limit', 10))
+            offset = int(request.args.get('offset', 0))
             
             leaderboard = []
-            if db:
+            if engine.leaderboard is not None:
+                leaderboard = engine.leaderboard.top(limit, offset)
+            elif db:
                 cursor = db.economy.find({}).sort('balance', -1).limit(limit)
                 leaderboard = list(cursor)
                 # Remove MongoDB _id field
@@ -266,6 +233,31 @@ def init_economy_routes(app, db, economy_storage):
             logger.error(f"❌ Error getting leaderboard: {e}")
             return jsonify({'error': 'Failed to get leaderboard'}), 500
     
+    @economy_bp.route('/api/economy/rank/<user_id>')
+    @require_auth
+    def get_user_rank(user_id):
+        """Get a user's leaderboard rank and the players ranked around them"""
+        try:
+            if engine.leaderboard is None:
+                return jsonify({'error': 'Leaderboard index not available'}), 503
+            
+            radius = min(int(request.args.get('radius', 5)), 50)
+            rank = engine.leaderboard.rank(user_id)
+            if rank is None:
+                return jsonify({'error': 'User has no balance'}), 404
+            
+            return jsonify({
+                'userId': user_id,
+                'rank': rank,
+                'balance': engine.balance(user_id),
+                'players': len(engine.leaderboard),
+                'around': engine.leaderboard.around(user_id, radius)
+            })
+            
+        except Exception as e:
+            logger.error(f"❌ Error getting rank for {user_id}: {e}")
+            return jsonify({'error': 'Failed to get rank'}), 500
+    
     @economy_bp.route('/api/economy/stats')
     @require_auth
     def get_economy_stats():
@@ -334,7 +326,7 @@ def init_economy_routes(app, db, economy_storage):
     
     return economy_bp
 
-def transfer_coins_internal(from_user, to_user, amount, db, economy_storage):
+def transfer_coins_internal(from_user, to_user, amount, db, economy_storage, engine=None, document=None):
     """
     Internal function to transfer coins between users
     
@@ -344,57 +336,15 @@ def transfer_coins_internal(from_user, to_user, amount, db, economy_storage):
         amount (int): Amount to transfer
         db: Database connection
         economy_storage: In-memory storage
+        engine (TransferEngine): Engine to use (created for db/storage if omitted)
+        document (tuple): (collection, transaction) recorded if the transfer succeeds
         
     Returns:
         dict: Transfer result
     """
     try:
-        if db:
-            # Check sender balance
-            sender = db.economy.find_one({'userId': from_user})
-            sender_balance = sender.get('balance', 0) if sender else 0
-            
-            if sender_balance < amount:
-                return {'success': False, 'error': 'Insufficient balance'}
-            
-            # Perform transfer
-            db.economy.update_one(
-                {'userId': from_user},
-                {'$inc': {'balance': -amount}},
-                upsert=True
-            )
-            
-            db.economy.update_one(
-                {'userId': to_user},
-                {'$inc': {'balance': amount}},
-                upsert=True
-            )
-            
-            # Get new balances
-            sender = db.economy.find_one({'userId': from_user})
-            receiver = db.economy.find_one({'userId': to_user})
-            
-            return {
-                'success': True,
-                'senderNewBalance': sender.get('balance', 0) if sender else 0,
-                'receiverNewBalance': receiver.get('balance', 0) if receiver else 0
-            }
-            
-        else:
-            # In-memory demo mode
-            sender_balance = economy_storage.get(from_user, 0)
-            if sender_balance < amount:
-                return {'success': False, 'error': 'Insufficient balance'}
-            
-            economy_storage[from_user] = sender_balance - amount
-            economy_storage[to_user] = economy_storage.get(to_user, 0) + amount
-            
-            return {
-                'success': True,
-                'senderNewBalance': economy_storage[from_user],
-                'receiverNewBalance': economy_storage[to_user]
-            }
-            
+        engine = engine or TransferEngine(db, economy_storage)
+        return engine.transfer(from_user, to_user, amount, document)
     except Exception as e:
         logger.error(f"❌ Internal transfer error: {e}")
         return {'success': False, 'error': 'Transfer failed'}
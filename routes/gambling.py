@@ -10,13 +10,14 @@ import secrets
 import uuid
 
 from routes.auth import require_auth
+from systems.economy import TransferEngine
 import logging
 
 logger = logging.getLogger(__name__)
 
 gambling_bp = Blueprint('gambling', __name__)
 
-def init_gambling_routes(app, db, economy_storage):
+def init_gambling_routes(app, db, economy_storage, engine=None):
     """
     Initialize gambling routes with dependencies
     
@@ -24,8 +25,11 @@ def init_gambling_routes(app, db, economy_storage):
         app: Flask app instance
         db: Database connection (optional)
         economy_storage: In-memory economy storage
+        engine (TransferEngine): Shared balance engine (created if omitted)
     """
     
+    engine = engine or TransferEngine(db, economy_storage)
+    
     @gambling_bp.route('/api/gambling/slots', methods=['POST'])
     @require_auth
     def play_slots():
@@ -41,16 +45,6 @@ def init_gambling_routes(app, db, economy_storage):
             if bet_amount <= 0:
                 return jsonify({'success': False, 'error': 'Bet amount must be greater than 0'})
             
-            # Check user balance
-            if db:
-                user = db.economy.find_one({'userId': user_id})
-                current_balance = user.get('balance', 0) if user else 0
-            else:
-                current_balance = economy_storage.get(user_id, 0)
-            
-            if current_balance < bet_amount:
-                return jsonify({'success': False, 'error': 'Insufficient balance'})
-            
             # Generate slot results
             symbols = ['🍒', '🍋', '🔔', '⭐', '💎']
             result = [secrets.choice(symbols) for _ in range(3)]
@@ -58,18 +52,7 @@ def init_gambling_routes(app, db, economy_storage):
             # Calculate winnings
             winnings = calculate_slot_winnings(result, bet_amount)
             
-            # Update balance
             net_change = winnings - bet_amount
-            new_balance = current_balance + net_change
-            
-            if db:
-                db.economy.update_one(
-                    {'userId': user_id},
-                    {'$set': {'balance': new_balance}},
-                    upsert=True
-                )
-            else:
-                economy_storage[user_id] = new_balance
             
             # Log the game
             game_log = {
@@ -83,8 +66,10 @@ def init_gambling_routes(app, db, economy_storage):
                 'timestamp': datetime.now().isoformat()
             }
             
-            if db:
-                db.gambling_logs.insert_one(game_log)
+            # Take the bet, pay out and log the game in one atomic change
+            new_balance = engine.settle_bet(user_id, bet_amount, winnings, ('gambling_logs', game_log))
+            if new_balance is None:
+                return jsonify({'success': False, 'error': 'Insufficient balance'})
             
             logger.info(f"🎰 Slots: {user_id} bet {bet_amount}, result {result}, winnings {winnings}")
             
@@ -120,33 +105,12 @@ def init_gambling_routes(app, db, economy_storage):
             if choice not in ['heads', 'tails']:
                 return jsonify({'success': False, 'error': 'Choice must be heads or tails'})
             
-            # Check user balance
-            if db:
-                user = db.economy.find_one({'userId': user_id})
-                current_balance = user.get('balance', 0) if user else 0
-            else:
-                current_balance = economy_storage.get(user_id, 0)
-            
-            if current_balance < bet_amount:
-                return jsonify({'success': False, 'error': 'Insufficient balance'})
-            
             # Flip the coin
             result = secrets.choice(['heads', 'tails'])
             won = result == choice
             
             # Calculate net change
             net_change = bet_amount if won else -bet_amount
-            new_balance = current_balance + net_change
-            
-            # Update balance
-            if db:
-                db.economy.update_one(
-                    {'userId': user_id},
-                    {'$set': {'balance': new_balance}},
-                    upsert=True
-                )
-            else:
-                economy_storage[user_id] = new_balance
             
             # Log the game
             game_log = {
@@ -161,8 +125,10 @@ def init_gambling_routes(app, db, economy_storage):
                 'timestamp': datetime.now().isoformat()
             }
             
-            if db:
-                db.gambling_logs.insert_one(game_log)
+            # Take the bet, pay out and log the game in one atomic change
+            new_balance = engine.settle_bet(user_id, bet_amount, bet_amount + net_change, ('gambling_logs', game_log))
+            if new_balance is None:
+                return jsonify({'success': False, 'error': 'Insufficient balance'})
             
             logger.info(f"🪙 Coinflip: {user_id} bet {bet_amount} on {choice}, result {result}, won: {won}")
             
@@ -199,16 +165,6 @@ def init_gambling_routes(app, db, economy_storage):
             if prediction < 1 or prediction > 6:
                 return jsonify({'success': False, 'error': 'Prediction must be between 1 and 6'})
             
-            # Check user balance
-            if db:
-                user = db.economy.find_one({'userId': user_id})
-                current_balance = user.get('balance', 0) if user else 0
-            else:
-                current_balance = economy_storage.get(user_id, 0)
-            
-            if current_balance < bet_amount:
-                return jsonify({'success': False, 'error': 'Insufficient balance'})
-            
             # Roll the dice
             result = secrets.randbelow(6) + 1
             won = result == prediction
@@ -221,18 +177,6 @@ def init_gambling_routes(app, db, economy_storage):
                 winnings = 0
                 net_change = -bet_amount
             
-            new_balance = current_balance + net_change
-            
-            # Update balance
-            if db:
-                db.economy.update_one(
-                    {'userId': user_id},
-                    {'$set': {'balance': new_balance}},
-                    upsert=True
-                )
-            else:
-                economy_storage[user_id] = new_balance
-            
             # Log the game
             game_log = {
                 'gameId': str(uuid.uuid4()),
@@ -247,8 +191,10 @@ def init_gambling_routes(app, db, economy_storage):
                 'timestamp': datetime.now().isoformat()
             }
             
-            if db:
-                db.gambling_logs.insert_one(game_log)
+            # Take the bet, pay out and log the game in one atomic change
+            new_balance = engine.settle_bet(user_id, bet_amount, winnings, ('gambling_logs', game_log))
+            if new_balance is None:
+                return jsonify({'success': False, 'error': 'Insufficient balance'})
             
             logger.info(f"🎲 Dice: {user_id} bet {bet_amount}, predicted {prediction}, rolled {result}, won: {won}")
             
@@ -129,37 +129,16 @@ def classify_message(message):
     """
     Classify console message type based on content
     
+    Delegates to the console rule engine so every classifier agrees.
+    
     Args:
         message (str): Console message text
         
     Returns:
         str: Message type classification
     """
-    if not message:
-        return "system"
-        
-    message_lower = message.lower()
-    
-    if any(pattern in message_lower for pattern in ["[save]", "saving", "saved", "save to", "beginning save"]):
-        return "save"
-    elif any(pattern in message_lower for pattern in ["[chat]", "global.say", "player chat", "say "]):
-        return "chat"
-    elif any(pattern in message_lower for pattern in ["vip", "admin", "moderator", "owner", "auth"]):
-        return "auth"
-    elif any(pattern in message_lower for pattern in ["[kill]", "killed", "died", "death", "suicide"]):
-        return "kill"
-    elif any(pattern in message_lower for pattern in ["error", "exception", "failed", "fail", "crash"]):
-        return "error"
-    elif any(pattern in message_lower for pattern in ["warning", "warn", "alert"]):
-        return "warning"
-    elif any(pattern in message_lower for pattern in ["executing console", "command", "executed"]):
-        return "command"
-    elif any(pattern in message_lower for pattern in ["player", "connected", "disconnected", "joined", "left"]):
-        return "player"
-    elif any(pattern in message_lower for pattern in ["server", "startup", "shutdown", "restart"]):
-        return "server"
-    else:
-        return "system"
+    from utils.console_rules import console_rules
+    return console_rules.match(message).type
 
 def get_type_icon(message_type):
     """
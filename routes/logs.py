@@ -10,7 +10,10 @@ import time
 from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
 from routes.auth import require_auth
+from utils.search_index import search_index
+from utils.console_archive import server_key
 import logging
+import hashlib
 import os
 
 # Try to import token functions - create fallbacks if not available
@@ -36,6 +39,48 @@ logger = logging.getLogger(__name__)
 
 logs_bp = Blueprint('logs', __name__)
 
+def append_raw_log(server_id, text):
+    """
+    Append the new part of a downloaded public.log to the server's raw log
+    
+    G-Portal returns the whole cumulative log on every download. The
+    length and hash of the previous download are kept next to the raw
+    file; when the new download starts with it, only the bytes after it
+    are appended, otherwise the log was rotated and all of it is new.
+    The raw file therefore holds every line once and the search index
+    only tails what was appended.
+    
+    Args:
+        server_id: Server ID
+        text (str): Downloaded log text
+        
+    Returns:
+        str: Raw log path
+    """
+    raw_path = os.path.join('logs', f"public_{server_key(server_id)}.log")
+    state_path = raw_path + '.state'
+    data = text.encode('utf-8')
+    
+    previous = {}
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+    
+    seen = previous.get('length', 0)
+    if not (0 < seen <= len(data) and hashlib.sha256(data[:seen]).hexdigest() == previous.get('sha256')):
+        seen = 0
+    
+    if len(data) > seen:
+        with open(raw_path, 'ab') as f:
+            f.write(data[seen:])
+    
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({'length': len(data), 'sha256': hashlib.sha256(data).hexdigest()}, f)
+    return raw_path
+
 class GPortalLogAPI:
     """G-Portal API client for log management"""
     
@@ -210,6 +255,11 @@ def init_logs_routes(app, db, logs_storage):
                         'error': 'No server ID provided and no servers configured'
                     })
             
+            try:
+                server_key(server_id)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+            
             # Get server region if available
             region = 'us'  # default
             if hasattr(app, 'gust_bot') and hasattr(app.gust_bot, 'servers') and app.gust_bot.servers:
@@ -238,6 +288,10 @@ def init_logs_routes(app, db, logs_storage):
                 with open(output_path, 'w', encoding='utf-8') as f:
                     json.dump(formatted_logs, f, indent=2)
                 
+                # Add the new lines to the server's raw log for the search index
+                raw_path = append_raw_log(server_id, result['data'])
+                search_index.add_log_file(raw_path, server_id)
+                
                 # Create log entry
                 log_entry = {
                     'id': f"log_{timestamp}",
@@ -246,6 +300,7 @@ def init_logs_routes(app, db, logs_storage):
                     'timestamp': datetime.now().isoformat(),
                     'entries_count': len(formatted_logs),
                     'file_path': output_path,
+                    'raw_file_path': raw_path,
                     'download_file': output_file,
                     'recent_entries': formatted_logs[-10:] if formatted_logs else []  # Last 10 entries
                 }
@@ -6,8 +6,10 @@ Routes for user administration, bans, and item management
 
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime, timedelta
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import uuid
 
+from config import Config
 from routes.auth import require_auth
 import logging
 
@@ -26,6 +28,20 @@ def init_users_routes(app, gust_bot, db, console_output):
         console_output: Console output deque
     """
     
+    def send_command(command, server_id, region):
+        """
+        Send a command through the dispatcher and wait for its result
+        
+        Admin actions issued together (item gives, kicks, bans) are
+        coalesced into a single GraphQL request by the dispatcher.
+        """
+        ticket = gust_bot.queue_console_command(command, server_id, region)
+        try:
+            return ticket.future.result(timeout=Config.COMMAND_RESULT_TIMEOUT)
+        except FutureTimeoutError:
+            logger.warning(f"⚠️ Timed out waiting for command {ticket.command_id}: {command}")
+            return False
+    
     @users_bp.route('/api/bans/temp', methods=['POST'])
     @require_auth
     def temp_ban_user():
@@ -48,7 +64,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send ban command
             command = f'banid "{user_id}" "{reason}"'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Calculate unban time
@@ -114,7 +130,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send permanent ban command
             command = f'ban "{user_id}" "{reason}"'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Store ban record
@@ -171,7 +187,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send unban command
             command = f'unban "{user_id}"'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Update ban record status
@@ -226,7 +242,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send give item command
             command = f'give "{player_id}" "{item}" {amount}'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Log the item give
@@ -280,7 +296,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send kick command
             command = f'kick "{user_id}" "{reason}"'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Add to console output
@@ -322,7 +338,7 @@ def init_users_routes(app, gust_bot, db, console_output):
             
             # Send teleport command
             command = f'teleport "{user_id}" {x} {y} {z}'
-            result = gust_bot.send_console_command_graphql(command, server_id, region)
+            result = send_command(command, server_id, region)
             
             if result:
                 # Add to console output
@@ -0,0 +1,845 @@
+"""
+GUST Bot Enhanced - Economy Engine
+=================================
+Atomic balance changes, coin transfers and a write-behind MongoDB ledger
+"""
+
+import os
+import json
+import uuid
+import zlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import Config
+from utils.runtime import runtime
+
+try:
+    from pymongo import ReturnDocument, UpdateOne, ReplaceOne
+    from pymongo.errors import DuplicateKeyError
+except ImportError:
+    ReturnDocument = UpdateOne = ReplaceOne = None
+    DuplicateKeyError = Exception
+
+logger = logging.getLogger(__name__)
+
+class StripedLock:
+    """
+    Fixed pool of locks shared out by key
+    
+    Each user ID maps to one stripe, so operations on different users
+    rarely contend while operations on the same user are serialized.
+    Locks for several keys are always taken in stripe order, so two
+    transfers in opposite directions cannot deadlock.
+    """
+    
+    def __init__(self, stripes=64):
+        """
+        Initialize striped lock
+        
+        Args:
+            stripes (int): Number of locks in the pool
+        """
+        self._locks = [threading.Lock() for _ in range(stripes)]
+    
+    def _stripe(self, key):
+        """Stripe index of a key (stable across processes)"""
+        return zlib.crc32(str(key).encode('utf-8')) % len(self._locks)
+    
+    @contextmanager
+    def hold(self, *keys):
+        """
+        Hold the locks of every key
+        
+        Args:
+            *keys: User IDs
+        """
+        stripes = sorted({self._stripe(key) for key in keys})
+        for stripe in stripes:
+            self._locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+balance_locks = StripedLock()
+
+class EconomyLedger:
+    """
+    In-process economy state with batched write-behind to MongoDB
+    
+    Balances live in memory and are authoritative for this process:
+    changes apply immediately and are only queued for MongoDB. Every
+    change is first appended to a local write-ahead log, so nothing is
+    lost between flushes. The log is group-committed: records are
+    appended under the ledger lock, and the caller then waits outside it
+    for one fsync that covers every record appended so far, so
+    concurrent changes share a sync instead of queueing for their own.
+    A balance change and the transaction or game log document that
+    explains it are one record. A flush writes the queued state with ordered
+    bulk_write batches: the latest balance of each changed user as a
+    $set, and transaction and game log documents as upserts keyed by
+    _id. Both are idempotent, so replaying the log after a crash in the
+    middle of a flush cannot apply a change twice.
+    
+    The log is rotated when a flush starts and the rotated files are
+    deleted once MongoDB has the data. A failed flush keeps its files and
+    requeues its batch for the next attempt.
+    """
+    
+    def __init__(self, db, wal_path=None, flush_interval=None, batch_size=None, fsync=None):
+        """
+        Initialize ledger
+        
+        Args:
+            db: MongoDB database
+            wal_path (str): Write-ahead log path
+            flush_interval (float): Seconds between flushes
+            batch_size (int): Operations per bulk_write (also triggers a flush)
+            fsync (bool): fsync the log before a change returns
+        """
+        self.db = db
+        self.wal_path = wal_path or Config.ECONOMY_WAL_FILE
+        self.flush_interval = flush_interval or Config.ECONOMY_FLUSH_INTERVAL
+        self.batch_size = batch_size or Config.ECONOMY_FLUSH_BATCH_SIZE
+        self.fsync = Config.ECONOMY_WAL_FSYNC if fsync is None else fsync
+        
+        self.balances = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_balances = {}
+        self._pending_documents = []
+        self._wal = None
+        self._generation = 0
+        self._flush_requested = False
+        
+        # Group commit: records appended vs. durable, one syncing thread at a time
+        self._sync_condition = threading.Condition()
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        
+        self.changes = 0
+        self.syncs = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.operations_written = 0
+        self.last_flush = None
+    
+    def start(self):
+        """Load balances, replay the write-ahead log and start periodic flushing"""
+        for user in self.db.economy.find({}, {'userId': True, 'balance': True, '_id': False}):
+            if 'userId' in user:
+                self.balances[user['userId']] = user.get('balance', 0)
+                self._loaded.add(user['userId'])
+        
+        recovered = self._recover()
+        if recovered:
+            logger.info(f"♻️ Replayed {recovered} economy ledger record(s) from the write-ahead log")
+            self.flush()
+        
+        runtime.every(self.flush_interval, self.flush, name='economy_ledger_flush')
+        logger.info(f"💰 Economy ledger started ({len(self.balances)} balances cached)")
+    
+    # Write-ahead log
+    
+    def _rotated_paths(self):
+        """Rotated log files, oldest first"""
+        directory = os.path.dirname(self.wal_path) or '.'
+        prefix = os.path.basename(self.wal_path) + '.'
+        generations = []
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                generations.append(int(name[len(prefix):]))
+        return [(generation, f"{self.wal_path}.{generation}") for generation in sorted(generations)]
+    
+    def _recover(self):
+        """Queue every change still in the log files and apply it to the cache"""
+        paths = self._rotated_paths()
+        if paths:
+            self._generation = paths[-1][0]
+        if os.path.exists(self.wal_path):
+            paths.append((None, self.wal_path))
+        
+        records = 0
+        for _, path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"⚠️ Skipping damaged economy ledger line: {line[:80]!r}")
+                        continue
+                    if record.get('op') == 'balances':
+                        self.balances.update(record['balances'])
+                        self._loaded.update(record['balances'])
+                        self._pending_balances.update(record['balances'])
+                        self._pending_documents.extend(
+                            (collection, document) for collection, document in record.get('documents', ()))
+                    elif record.get('op') == 'document':
+                        self._pending_documents.append((record['collection'], record['document']))
+                    records += 1
+        return records
+    
+    def _log(self, record):
+        """
+        Append a record to the write-ahead log buffer (lock held)
+        
+        Returns:
+            int: Ticket to pass to _sync() once the lock is released
+        """
+        if self._wal is None:
+            os.makedirs(os.path.dirname(self.wal_path) or '.', exist_ok=True)
+            self._wal = open(self.wal_path, 'a', encoding='utf-8')
+        self._wal.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._appended += 1
+        return self._appended
+    
+    def _sync(self, ticket):
+        """
+        Wait until a logged record is durable (lock not held)
+        
+        The first waiter becomes the leader: it writes out everything
+        appended so far and fsyncs once, and every record in that group
+        is released together. Others wait for a leader whose group covers
+        their ticket.
+        
+        Args:
+            ticket (int): Value returned by _log()
+        """
+        with self._sync_condition:
+            while self._synced < ticket:
+                if not self._syncing:
+                    self._syncing = True
+                    break
+                self._sync_condition.wait()
+            else:
+                return
+        
+        synced = self._synced
+        try:
+            with self._lock:
+                target = self._appended
+                descriptor = None
+                if self._wal is not None:
+                    self._wal.flush()
+                    if self.fsync:
+                        # A duplicate stays valid if a flush rotates the log meanwhile
+                        descriptor = os.dup(self._wal.fileno())
+            if descriptor is not None:
+                try:
+                    os.fsync(descriptor)
+                finally:
+                    os.close(descriptor)
+            synced = target
+            self.syncs += 1
+        finally:
+            with self._sync_condition:
+                self._synced = max(self._synced, synced)
+                self._syncing = False
+                self._sync_condition.notify_all()
+    
+    def _rotate(self):
+        """Close the live log and rename it for the flush in progress (lock held)"""
+        if self._wal is not None:
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._wal.close()
+            self._wal = None
+        if not os.path.exists(self.wal_path):
+            return self._generation
+        self._generation += 1
+        os.replace(self.wal_path, f"{self.wal_path}.{self._generation}")
+        return self._generation
+    
+    # Changes
+    
+    def balance(self, user_id):
+        """
+        Get a cached balance, loading it from MongoDB on first use
+        
+        Args:
+            user_id (str): User ID (its balance stripe must be held)
+            
+        Returns:
+            int: Balance
+        """
+        if user_id not in self._loaded:
+            user = self.db.economy.find_one({'userId': user_id}, {'balance': True, '_id': False})
+            self.balances[user_id] = user.get('balance', 0) if user else 0
+            self._loaded.add(user_id)
+        return self.balances[user_id]
+    
+    def set_balances(self, balances, documents=()):
+        """
+        Record new balances as one log record (their stripes must be held)
+        
+        A transfer changes two balances; logging them together means a
+        crash can never replay the debit without the credit. The
+        transaction or game log of the change goes in the same record.
+        
+        Args:
+            balances (dict): User ID -> new balance
+            documents (iterable): (collection, document) pairs to insert
+        """
+        documents = [(collection, self._with_id(document)) for collection, document in documents]
+        record = {"op": "balances", "balances": balances}
+        if documents:
+            record["documents"] = documents
+        
+        with self._lock:
+            ticket = self._log(record)
+            self._pending_balances.update(balances)
+            self._pending_documents.extend(documents)
+            self.changes += 1
+        self._sync(ticket)
+        self.balances.update(balances)
+        self._maybe_flush()
+    
+    def add_document(self, collection, document):
+        """
+        Queue a document insert (transaction, game log...)
+        
+        Args:
+            collection (str): Collection name
+            document (dict): JSON-serializable document; gets an _id if missing
+        """
+        document = self._with_id(document)
+        with self._lock:
+            ticket = self._log({"op": "document", "collection": collection, "document": document})
+            self._pending_documents.append((collection, document))
+        self._sync(ticket)
+        self._maybe_flush()
+    
+    @staticmethod
+    def _with_id(document):
+        """Give a document an _id so replaying its insert is idempotent"""
+        document.setdefault('_id', uuid.uuid4().hex)
+        return document
+    
+    def _maybe_flush(self):
+        """Start a flush in the background once a batch is full"""
+        with self._lock:
+            if self._flush_requested:
+                return
+            if len(self._pending_balances) + len(self._pending_documents) < self.batch_size:
+                return
+            self._flush_requested = True
+        runtime.submit(runtime.run_blocking(self.flush))
+    
+    # Flushing
+    
+    def flush(self):
+        """
+        Write queued changes to MongoDB
+        
+        Returns:
+            int: Operations written
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._flush_requested = False
+                if not self._pending_balances and not self._pending_documents:
+                    return 0
+                balances, self._pending_balances = self._pending_balances, {}
+                documents, self._pending_documents = self._pending_documents, []
+                generation = self._rotate()
+            
+            try:
+                written = self._write(balances, documents)
+            except Exception as e:
+                with self._lock:
+                    # Requeue behind anything newer that arrived meanwhile
+                    for user_id, balance in balances.items():
+                        self._pending_balances.setdefault(user_id, balance)
+                    self._pending_documents[:0] = documents
+                self.flush_errors += 1
+                logger.error(f"❌ Economy ledger flush failed, will retry: {e}")
+                return 0
+            
+            for rotated_generation, path in self._rotated_paths():
+                if rotated_generation <= generation:
+                    os.remove(path)
+            
+            self.flushes += 1
+            self.operations_written += written
+            self.last_flush = written
+            return written
+    
+    def _write(self, balances, documents):
+        """Write one flush worth of changes with ordered bulk writes"""
+        operations = [UpdateOne({'userId': user_id}, {'$set': {'balance': balance}}, upsert=True)
+                      for user_id, balance in balances.items()]
+        for start in range(0, len(operations), self.batch_size):
+            self.db.economy.bulk_write(operations[start:start + self.batch_size], ordered=True)
+        
+        by_collection = {}
+        for collection, document in documents:
+            by_collection.setdefault(collection, []).append(
+                ReplaceOne({'_id': document['_id']}, document, upsert=True))
+        for collection, inserts in by_collection.items():
+            for start in range(0, len(inserts), self.batch_size):
+                self.db[collection].bulk_write(inserts[start:start + self.batch_size], ordered=True)
+        
+        return len(operations) + len(documents)
+    
+    def stop(self):
+        """Flush and close the write-ahead log"""
+        runtime.cancel('economy_ledger_flush')
+        self.flush()
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+    
+    def get_stats(self):
+        """
+        Get ledger statistics
+        
+        Returns:
+            dict: Cache size, queue depth and flush counters
+        """
+        with self._lock:
+            pending = len(self._pending_balances) + len(self._pending_documents)
+        return {
+            "cached_balances": len(self.balances),
+            "pending": pending,
+            "changes": self.changes,
+            "syncs": self.syncs,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "operations_written": self.operations_written,
+            "last_flush_operations": self.last_flush
+        }
+
+class TransferEngine:
+    """
+    Balance changes that cannot overdraw or lose updates
+    
+    Three modes, chosen by what is passed in:
+    
+    - ledger: balances are changed in the ledger's cache under
+      balance_locks and written behind to MongoDB in batches
+    - MongoDB only: every change is one conditional find_one_and_update
+      whose filter only matches while the balance covers the debit, with
+      $inc applied server-side, so concurrent debits never go below zero.
+      Transfers run the debit, credit and transaction log in one session
+      transaction when the deployment supports it (replica set or
+      mongos); on a standalone server they go through a pending-transfer
+      record that recover_transfers() finishes after a crash
+    - memory: economy_storage is changed under balance_locks
+    
+    A BalanceLeaderboard passed in is loaded once and then updated with
+    every balance the engine writes, so it never needs re-sorting.
+    """
+    
+    def __init__(self, db, storage, locks=None, ledger=None, leaderboard=None):
+        """
+        Initialize transfer engine
+        
+        Args:
+            db: MongoDB database, None for in-memory mode
+            storage (dict): In-memory balances (user ID -> coins)
+            locks (StripedLock): Lock pool, shared by default
+            ledger (EconomyLedger): Write-behind ledger for MongoDB mode
+            leaderboard (BalanceLeaderboard): Rank index to keep up to date
+        """
+        self.db = db
+        self.ledger = ledger
+        self.storage = ledger.balances if ledger is not None else storage
+        self.locks = locks or balance_locks
+        self.direct = db is not None and ledger is None
+        self.leaderboard = leaderboard
+        self._transactions = None  # MongoDB transaction support, checked on first transfer
+        
+        if leaderboard is not None:
+            if self.direct:
+                wallets = db.economy.find({}, {'userId': True, 'balance': True, '_id': False})
+                leaderboard.load((user['userId'], user.get('balance', 0)) for user in wallets if 'userId' in user)
+            else:
+                leaderboard.load(dict(self.storage))
+        
+        self.transfers = 0
+        self.rejected = 0
+        self.failed = 0
+        self.refunds = 0
+        self.recovered = 0
+    
+    def _get(self, user_id):
+        """Current balance (stripe held)"""
+        if self.ledger is not None:
+            return self.ledger.balance(user_id)
+        return self.storage.get(user_id, 0)
+    
+    def _set(self, balances, document=None):
+        """Store new balances and the document explaining them (stripes held)"""
+        if self.ledger is not None:
+            self.ledger.set_balances(balances, [document] if document else ())
+        else:
+            self.storage.update(balances)
+        if self.leaderboard is not None:
+            self.leaderboard.update_many(balances)
+    
+    def balance(self, user_id):
+        """
+        Get a user's balance
+        
+        Args:
+            user_id (str): User ID
+            
+        Returns:
+            int: Balance
+        """
+        if self.direct:
+            user = self.db.economy.find_one({'userId': user_id})
+            return user.get('balance', 0) if user else 0
+        with self.locks.hold(user_id):
+            return self._get(user_id)
+    
+    def apply(self, user_id, delta, required=0, document=None):
+        """
+        Atomically change a balance if it covers a required amount
+        
+        Args:
+            user_id (str): User ID
+            delta (int): Coins to add (negative to remove)
+            required (int): Minimum balance for the change to apply
+            document (tuple): (collection, document) recorded with the change
+            
+        Returns:
+            int: New balance, or None if the balance is below required
+        """
+        if self.direct:
+            query = {'userId': user_id}
+            if required > 0:
+                query['balance'] = {'$gte': required}
+            # The stripe keeps leaderboard updates for a user in MongoDB order
+            with self.locks.hold(user_id):
+                user = self.db.economy.find_one_and_update(
+                    query,
+                    {'$inc': {'balance': delta}},
+                    projection={'balance': True, '_id': False},
+                    upsert=required <= 0,
+                    return_document=ReturnDocument.AFTER
+                )
+                if user is None:
+                    return None
+                if self.leaderboard is not None:
+                    self.leaderboard.update(user_id, user['balance'])
+            if document:
+                self.record(*document)
+            return user['balance']
+        
+        with self.locks.hold(user_id):
+            balance = self._get(user_id)
+            if balance < required:
+                return None
+            self._set({user_id: balance + delta}, document)
+            return balance + delta
+    
+    def adjust(self, user_id, amount, document=None):
+        """
+        Add (positive) or remove (negative) coins
+        
+        Args:
+            user_id (str): User ID
+            amount (int): Coins to add, negative to remove
+            document (tuple): (collection, document) recorded with the change
+            
+        Returns:
+            int: New balance, or None if a removal exceeds the balance
+        """
+        return self.apply(user_id, amount, max(-amount, 0), document)
+    
+    def settle_bet(self, user_id, bet, payout, document=None):
+        """
+        Take a bet and pay out winnings in one atomic change
+        
+        Args:
+            user_id (str): User ID
+            bet (int): Amount staked (must be covered by the balance)
+            payout (int): Amount paid back (0 for a loss)
+            document (tuple): (collection, game log) recorded with the change
+            
+        Returns:
+            int: New balance, or None if the balance does not cover the bet
+        """
+        return self.apply(user_id, payout - bet, bet, document)
+    
+    def record(self, collection, document):
+        """
+        Store a transaction or game log document
+        
+        Args:
+            collection (str): Collection name
+            document (dict): Document to insert
+        """
+        if self.ledger is not None:
+            self.ledger.add_document(collection, document)
+        elif self.direct:
+            self.db[collection].insert_one(document)
+    
+    def transfer(self, from_user, to_user, amount, document=None):
+        """
+        Move coins between users
+        
+        Args:
+            from_user (str): Source user ID
+            to_user (str): Destination user ID
+            amount (int): Amount to transfer
+            document (tuple): (collection, transaction) recorded if it succeeds
+            
+        Returns:
+            dict: Transfer result with both new balances
+        """
+        if from_user == to_user:
+            return {'success': False, 'error': 'Cannot transfer to yourself'}
+        
+        if not self.direct:
+            # Hold both stripes so the pair of balances changes together
+            with self.locks.hold(from_user, to_user):
+                balance = self._get(from_user)
+                if balance < amount:
+                    self.rejected += 1
+                    return {'success': False, 'error': 'Insufficient balance'}
+                receiver_balance = self._get(to_user) + amount
+                self._set({from_user: balance - amount, to_user: receiver_balance}, document)
+                self.transfers += 1
+                return {
+                    'success': True,
+                    'senderNewBalance': balance - amount,
+                    'receiverNewBalance': receiver_balance
+                }
+        
+        if self._transactions is None:
+            self._transactions = Config.ECONOMY_TRANSACTIONS and self._supports_transactions()
+        
+        # The stripes keep leaderboard updates for both users in MongoDB order
+        with self.locks.hold(from_user, to_user):
+            try:
+                if self._transactions:
+                    balances = self._transfer_in_transaction(from_user, to_user, amount, document)
+                else:
+                    balances = self._transfer_two_phase(from_user, to_user, amount, document)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Transfer from {from_user} to {to_user} failed: {e}")
+                return {'success': False, 'error': 'Transfer failed'}
+            
+            if balances is None:
+                self.rejected += 1
+                return {'success': False, 'error': 'Insufficient balance'}
+            
+            sender_balance, receiver_balance = balances
+            if self.leaderboard is not None:
+                self.leaderboard.update_many({from_user: sender_balance, to_user: receiver_balance})
+        
+        self.transfers += 1
+        return {
+            'success': True,
+            'senderNewBalance': sender_balance,
+            'receiverNewBalance': receiver_balance
+        }
+    
+    def _supports_transactions(self):
+        """Check whether the MongoDB deployment runs multi-document transactions"""
+        try:
+            hello = self.db.client.admin.command('hello')
+        except Exception as e:
+            logger.warning(f"⚠️ Could not check MongoDB transaction support: {e}")
+            return False
+        return 'setName' in hello or hello.get('msg') == 'isdbgrid'
+    
+    def _transfer_in_transaction(self, from_user, to_user, amount, document):
+        """
+        Debit, credit and log a transfer in one session transaction
+        
+        Returns:
+            tuple: (sender balance, receiver balance), None if the sender is short
+        """
+        economy = self.db.economy
+        projection = {'balance': True, '_id': False}
+        
+        def run(session):
+            sender = economy.find_one_and_update(
+                {'userId': from_user, 'balance': {'$gte': amount}},
+                {'$inc': {'balance': -amount}},
+                projection=projection,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if sender is None:
+                return None
+            receiver = economy.find_one_and_update(
+                {'userId': to_user},
+                {'$inc': {'balance': amount}},
+                projection=projection,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if document:
+                collection, transaction = document
+                self.db[collection].insert_one(transaction, session=session)
+            return sender['balance'], receiver['balance']
+        
+        with self.db.client.start_session() as session:
+            return session.with_transaction(run)
+    
+    def _transfer_two_phase(self, from_user, to_user, amount, document):
+        """
+        Debit, credit and log a transfer through a pending-transfer record
+        
+        Used where MongoDB has no transactions. The record is written
+        before the debit, and each wallet notes the transfer ID in
+        pendingTransfers in the same update as its $inc, so every step
+        applies at most once. A failure after the debit refunds the
+        sender; if the process dies instead, recover_transfers() finishes
+        the transfer at the next start.
+        
+        Returns:
+            tuple: (sender balance, receiver balance), None if the sender is short
+        """
+        transfer_id = uuid.uuid4().hex
+        record = {
+            '_id': transfer_id,
+            'from': from_user,
+            'to': to_user,
+            'amount': amount,
+            'document': list(document) if document else None,
+            'state': 'pending'
+        }
+        pending = self.db[Config.ECONOMY_PENDING_TRANSFERS]
+        pending.insert_one(record)
+        
+        sender = self.db.economy.find_one_and_update(
+            {'userId': from_user, 'balance': {'$gte': amount}, 'pendingTransfers': {'$ne': transfer_id}},
+            {'$inc': {'balance': -amount}, '$push': {'pendingTransfers': transfer_id}},
+            projection={'balance': True, '_id': False},
+            return_document=ReturnDocument.AFTER
+        )
+        if sender is None:
+            pending.delete_one({'_id': transfer_id})
+            return None
+        
+        try:
+            receiver_balance = self._complete_transfer(record)
+        except Exception as e:
+            logger.error(f"❌ Credit to {to_user} failed, refunding {from_user}: {e}")
+            self._undo_transfer(record)
+            raise
+        
+        return sender['balance'], receiver_balance
+    
+    def _complete_transfer(self, record):
+        """Credit, log and clear a debited transfer (each step is safe to repeat)"""
+        transfer_id = record['_id']
+        economy = self.db.economy
+        projection = {'balance': True, '_id': False}
+        
+        economy.update_one({'userId': record['to']}, {'$setOnInsert': {'balance': 0}}, upsert=True)
+        receiver = economy.find_one_and_update(
+            {'userId': record['to'], 'pendingTransfers': {'$ne': transfer_id}},
+            {'$inc': {'balance': record['amount']}, '$push': {'pendingTransfers': transfer_id}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if receiver is None:
+            # Credited before an interruption
+            receiver = economy.find_one({'userId': record['to']}, projection)
+        
+        if record.get('document'):
+            collection, transaction = record['document']
+            transaction.setdefault('_id', transfer_id)
+            try:
+                self.db[collection].insert_one(transaction)
+            except DuplicateKeyError:
+                pass
+        
+        pending = self.db[Config.ECONOMY_PENDING_TRANSFERS]
+        pending.update_one({'_id': transfer_id}, {'$set': {'state': 'committed'}})
+        economy.update_many(
+            {'userId': {'$in': [record['from'], record['to']]}},
+            {'$pull': {'pendingTransfers': transfer_id}}
+        )
+        pending.delete_one({'_id': transfer_id})
+        return receiver['balance']
+    
+    def _undo_transfer(self, record):
+        """Refund the sender of a transfer that was debited but not credited"""
+        transfer_id = record['_id']
+        try:
+            refunded = self.db.economy.update_one(
+                {'userId': record['from'], 'pendingTransfers': transfer_id},
+                {'$inc': {'balance': record['amount']}, '$pull': {'pendingTransfers': transfer_id}}
+            )
+            self.db[Config.ECONOMY_PENDING_TRANSFERS].delete_one({'_id': transfer_id})
+        except Exception as e:
+            logger.error(f"❌ Refund of transfer {transfer_id} failed, it will be finished at the next start: {e}")
+            return
+        if refunded.modified_count:
+            self.refunds += 1
+    
+    def recover_transfers(self):
+        """
+        Finish transfers interrupted by a crash (MongoDB without transactions)
+        
+        Call once at startup, before transfers are served. A transfer whose
+        sender was never debited is dropped; any other is completed, so
+        coins that left the sender always reach the receiver.
+        
+        Returns:
+            int: Transfers recovered
+        """
+        if not self.direct:
+            return 0
+        
+        recovered = 0
+        pending = self.db[Config.ECONOMY_PENDING_TRANSFERS]
+        for record in list(pending.find({})):
+            transfer_id = record['_id']
+            try:
+                debited = record.get('state') == 'committed' or self.db.economy.find_one(
+                    {'userId': record['from'], 'pendingTransfers': transfer_id}, {'_id': True}
+                ) is not None
+                if debited:
+                    self._complete_transfer(record)
+                    recovered += 1
+                else:
+                    pending.delete_one({'_id': transfer_id})
+            except Exception as e:
+                logger.error(f"❌ Could not recover transfer {transfer_id}: {e}")
+        
+        if recovered:
+            self.recovered += recovered
+            logger.info(f"🔁 Finished {recovered} interrupted coin transfer(s)")
+            if self.leaderboard is not None:
+                wallets = self.db.economy.find({}, {'userId': True, 'balance': True, '_id': False})
+                self.leaderboard.load((user['userId'], user.get('balance', 0)) for user in wallets if 'userId' in user)
+        return recovered
+    
+    def get_stats(self):
+        """
+        Get transfer counters
+        
+        Returns:
+            dict: Completed, rejected and failed transfers
+        """
+        stats = {
+            "backend": "ledger" if self.ledger is not None else "mongodb" if self.direct else "memory",
+            "transfers": self.transfers,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "refunds": self.refunds,
+            "recovered": self.recovered,
+            "transactions": self._transactions
+        }
+        if self.ledger is not None:
+            stats["ledger"] = self.ledger.get_stats()
+        if self.leaderboard is not None:
+            stats["leaderboard"] = self.leaderboard.get_stats()
+        return stats
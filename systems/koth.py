@@ -6,16 +6,95 @@ Uses only standard console commands available in all Rust servers
 """
 
 import time
-import threading
 import uuid
+import threading
+from collections import namedtuple, deque
 from datetime import datetime
 
 from config import Config
 from utils.helpers import get_countdown_announcements
+from utils.console_events import console_events
+from utils.scheduler import scheduler
+from utils.runtime import runtime
+from .koth_store import create_koth_store
 import logging
 
 logger = logging.getLogger(__name__)
 
+TimelineStep = namedtuple('TimelineStep', ['offset', 'action', 'payload'])
+
+SUPPLY_COMMANDS = [
+    'giveall medical.bandage 5',
+    'giveall ammo.pistol 60',
+    'giveall weapon.pistol.revolver 1'
+]
+
+def build_koth_timeline(duration_minutes, preparation=None):
+    """
+    Build the declarative timeline of a KOTH event
+    
+    Offsets are seconds from the event start. 'say' payloads are
+    templates filled from the event data.
+    
+    Args:
+        duration_minutes (int): Length of the active phase
+        preparation (int): Seconds of announcements before the fight
+        
+    Returns:
+        list: TimelineStep entries in firing order
+    """
+    preparation = preparation if preparation is not None else Config.KOTH_PREPARATION_TIME
+    duration = int(duration_minutes * 60)
+    end = preparation + duration
+    
+    steps = [
+        TimelineStep(0, 'say', '<color=yellow><size=30>[KOTH EVENT]</size></color> '
+                               f'King of the Hill starting in {preparation // 60} minutes at {{arena_location}}!'),
+        TimelineStep(2, 'say', '<color=yellow>[KOTH]</color> Reward: {reward_amount} {reward_item} for survivors!'),
+        TimelineStep(4, 'say', '<color=yellow>[KOTH]</color> Duration: {duration_minutes} minutes. '
+                               'Get to {arena_location} and prepare for battle!'),
+    ]
+    
+    # Countdown announcements
+    for delay, message in get_countdown_announcements():
+        if delay < preparation:
+            steps.append(TimelineStep(preparation - delay, 'say',
+                                      f'<color=red><size=25>[KOTH]</size></color> Starting in {message}!'))
+    
+    # Active phase
+    steps += [
+        TimelineStep(preparation, 'phase', 'active'),
+        TimelineStep(preparation, 'say', '<color=red><size=35>[KOTH EVENT STARTED!]</size></color> '
+                                         'Fight to be the last standing at {arena_location}!'),
+        TimelineStep(preparation + 2, 'say', '<color=green>[KOTH]</color> Combat supplies distributed!'),
+        TimelineStep(preparation + 2, 'commands', SUPPLY_COMMANDS),
+    ]
+    
+    # Reminder every 5 minutes, then a final countdown
+    for remaining in range(duration - 300, 0, -300):
+        steps.append(TimelineStep(end - remaining, 'say',
+                                  f'<color=yellow>[KOTH]</color> {remaining // 60} minutes remaining! '
+                                  'Stay alive at {arena_location}!'))
+    for remaining in (60, 30, 10, 5):
+        if remaining < duration:
+            steps.append(TimelineStep(end - remaining, 'say',
+                                      f'<color=red>[KOTH]</color> {remaining} seconds remaining!'))
+    
+    # End and rewards (in vanilla, we can't easily track location)
+    steps += [
+        TimelineStep(end, 'phase', 'finished'),
+        TimelineStep(end, 'say', '<color=red><size=35>[KOTH EVENT ENDED!]</size></color> '
+                                 'Distributing rewards to survivors...'),
+        TimelineStep(end + 3, 'commands', ['giveall {reward_item} {reward_amount}']),
+        TimelineStep(end + 4, 'say', '<color=gold><size=30>[KOTH REWARDS DISTRIBUTED!]</size></color> '
+                                     'All participants received {reward_amount} {reward_item}!'),
+        TimelineStep(end + 4, 'winner', None),
+        TimelineStep(end + 4, 'cleanup', None),
+    ]
+    
+    # Stable sort keeps same-offset steps in the order listed
+    return sorted(steps, key=lambda step: step.offset)
+
 class VanillaKothSystem:
     """
     KOTH system that works with vanilla Rust servers
@@ -32,6 +111,30 @@ class VanillaKothSystem:
         self.gust_bot = gust_bot
         self.active_events = {}
         
+        # Durable event progress (MongoDB when connected, else a file journal).
+        # Writes are queued and run in order on the I/O executor; kill tallies
+        # are coalesced and written after a short delay or at the next step
+        self.store = create_koth_store(getattr(gust_bot, 'db', None))
+        self._persist_lock = threading.Lock()
+        self._persist_queue = deque()
+        self._persist_draining = False
+        self._dirty_kills = set()
+        self._kill_flush = None
+        self.recovery_stats = {
+            "backend": self.store.backend,
+            "recovered": 0,
+            "abandoned": 0,
+            "steps_skipped": 0,
+            "stale_announcements_skipped": 0,
+            "persist_errors": 0,
+            "recovered_at": None
+        }
+        
+        # Kill feed from the live console, already parsed into KillEvents
+        console_events.subscribe(self._on_kill, kinds=('kill',))
+        
+        self.recover_events()
+    
     def start_koth_event_fixed(self, event_data):
         """
         Start a KOTH event using only vanilla Rust commands
@@ -43,210 +146,234 @@ class VanillaKothSystem:
             bool: True if event started successfully
         """
         server_id = event_data['serverId']
-        region = event_data.get('region', 'US')
         duration = event_data.get('duration', Config.KOTH_DEFAULT_DURATION)
-        reward_item = event_data.get('reward_item', 'scrap')
-        reward_amount = event_data.get('reward_amount', 1000)
-        arena_location = event_data.get('arena_location', 'Launch Site')
         
         # Create event entry
         event_id = f"koth_{server_id}_{int(time.time())}"
-        
-        self.active_events[event_id] = {
+        definition = {
             'server_id': server_id,
-            'region': region,
-            'start_time': datetime.now(),
+            'region': event_data.get('region', 'US'),
+            'started_at': time.time(),
             'duration_minutes': duration,
-            'reward_item': reward_item,
-            'reward_amount': reward_amount,
-            'arena_location': arena_location,
-            'phase': 'announcement',
-            'winner': None
+            'preparation': Config.KOTH_PREPARATION_TIME,
+            'reward_item': event_data.get('reward_item', 'scrap'),
+            'reward_amount': event_data.get('reward_amount', 1000),
+            'arena_location': event_data.get('arena_location', 'Launch Site')
         }
         
-        # Store in GUST bot's events list
-        if hasattr(self.gust_bot, 'events'):
-            self.gust_bot.events.append({
-                'eventId': event_id,
-                'type': 'koth',
-                'serverId': server_id,
-                'duration': duration,
-                'reward': f"{reward_amount} {reward_item}",
-                'status': 'active',
-                'startTime': datetime.now().isoformat(),
-                'arena_location': arena_location
-            })
-        
-        # Start the event in a separate thread
-        threading.Thread(target=self._run_koth_event_sequence, args=(event_id,), daemon=True).start()
+        # Journal first so a crash right after starting can still resume
+        self._persist('record_start', event_id, definition)
+        event = self._activate(event_id, definition)
+        
+        self._schedule_timeline(event_id, event, completed_step=-1)
         
         logger.info(f"🎯 KOTH event {event_id} started for server {server_id}")
         return True
     
-    def _run_koth_event_sequence(self, event_id):
+    def _activate(self, event_id, definition, kills=None):
         """
-        Run the complete KOTH event sequence
+        Register an event in memory and in the GUST bot's events list
         
         Args:
             event_id (str): Event ID
+            definition (dict): Persisted event definition
+            kills (dict): Kill tally to restore
+            
+        Returns:
+            dict: Active event data
         """
-        event = self.active_events[event_id]
+        event = dict(definition)
+        event.update({
+            'start_time': datetime.fromtimestamp(definition['started_at']),
+            'phase': 'announcement',
+            'winner': None,
+            'kills': dict(kills or {})
+        })
+        self.active_events[event_id] = event
         
-        try:
-            logger.info(f"🎯 Starting KOTH event sequence: {event_id}")
-            
-            # Phase 1: Announcement and preparation (5 minutes)
-            self._announcement_phase(event_id)
-            
-            # Phase 2: Active combat phase
-            self._active_phase(event_id)
-            
-            # Phase 3: End event and rewards
-            self._end_phase(event_id)
-            
-            logger.info(f"✅ KOTH event completed successfully: {event_id}")
-            
-        except Exception as e:
-            logger.error(f"❌ Error in KOTH event {event_id}: {e}")
-            self._emergency_end_event(event_id)
+        # Store in GUST bot's events list
+        if hasattr(self.gust_bot, 'events'):
+            if not any(e.get('eventId') == event_id for e in self.gust_bot.events):
+                self.gust_bot.events.append({
+                    'eventId': event_id,
+                    'type': 'koth',
+                    'serverId': event['server_id'],
+                    'duration': event['duration_minutes'],
+                    'reward': f"{event['reward_amount']} {event['reward_item']}",
+                    'status': 'active',
+                    'startTime': event['start_time'].isoformat(),
+                    'arena_location': event['arena_location']
+                })
+        
+        return event
     
-    def _announcement_phase(self, event_id):
+    def _schedule_timeline(self, event_id, event, completed_step, resumed=False):
         """
-        Announcement phase - 5 minutes to prepare
+        Schedule the remaining timeline steps against absolute deadlines
         
         Args:
             event_id (str): Event ID
+            event (dict): Active event data
+            completed_step (int): Index of the last step already run
+            resumed (bool): True when resuming after a restart
         """
-        event = self.active_events[event_id]
-        
-        logger.info(f"📢 Starting announcement phase for {event_id}")
-        
-        # Initial announcement
-        self._send_command(event, 
-            f'global.say "<color=yellow><size=30>[KOTH EVENT]</size></color> '
-            f'King of the Hill starting in 5 minutes at {event["arena_location"]}!"')
-        
-        time.sleep(2)
-        
-        self._send_command(event,
-            f'global.say "<color=yellow>[KOTH]</color> Reward: {event["reward_amount"]} {event["reward_item"]} '
-            f'for survivors!"')
-        
-        time.sleep(2)
-        
-        self._send_command(event,
-            f'global.say "<color=yellow>[KOTH]</color> Duration: {event["duration_minutes"]} minutes. '
-            f'Get to {event["arena_location"]} and prepare for battle!"')
-        
-        # Countdown announcements
-        countdown_announcements = get_countdown_announcements()
+        timeline = build_koth_timeline(event['duration_minutes'], event['preparation'])
+        elapsed = time.time() - event['started_at']
+        started = time.monotonic() - elapsed
+        
+        for index, step in enumerate(timeline):
+            if index <= completed_step:
+                if step.action == 'phase':
+                    event['phase'] = step.payload
+                continue
+            
+            # Announcements missed while the bot was down are no longer true
+            if resumed and step.action == 'say' and step.offset < elapsed - Config.KOTH_STALE_ANNOUNCEMENT:
+                self.recovery_stats['stale_announcements_skipped'] += 1
+                continue
+            
+            scheduler.schedule_at(started + step.offset, self._run_step, event_id, index, step, group=event_id)
+    
+    def recover_events(self):
+        """
+        Resume unfinished events from the state store after a restart
         
-        start_time = time.time()
+        Each event continues from the step after the last one recorded,
+        so sent announcements are not repeated, while overdue phase
+        changes, supply drops and rewards run immediately.
         
-        for delay, message in countdown_announcements:
-            # Calculate when to send this announcement
-            target_time = start_time + (Config.KOTH_PREPARATION_TIME - delay)
+        Returns:
+            int: Number of events resumed
+        """
+        try:
+            pending = self.store.load_active()
+        except Exception as e:
+            logger.error(f"❌ Could not load KOTH state: {e}")
+            return 0
+        
+        for state in pending:
+            event_id = state['event_id']
+            completed_step = state.get('completed_step', -1)
+            kills = state.get('kills') or {}
+            definition = {key: value for key, value in state.items()
+                          if key not in ('event_id', 'completed_step', 'kills')}
             
-            # Wait until it's time
-            current_time = time.time()
-            if target_time > current_time:
-                time.sleep(target_time - current_time)
+            try:
+                timeline = build_koth_timeline(definition['duration_minutes'], definition['preparation'])
+                overdue = time.time() - definition['started_at'] - timeline[-1].offset
+                if overdue > Config.KOTH_RECOVERY_MAX_LATE:
+                    logger.warning(f"⚠️ Abandoning KOTH event {event_id}, ended {int(overdue)}s ago")
+                    self._persist('record_end', event_id)
+                    self.recovery_stats['abandoned'] += 1
+                    continue
+                
+                event = self._activate(event_id, definition, kills)
+                self._schedule_timeline(event_id, event, completed_step, resumed=True)
+            except Exception as e:
+                logger.error(f"❌ Could not resume KOTH event {event_id}: {e}")
+                self.recovery_stats['abandoned'] += 1
+                continue
             
-            self._send_command(event,
-                f'global.say "<color=red><size=25>[KOTH]</size></color> '
-                f'Starting in {message}!"')
+            self.recovery_stats['recovered'] += 1
+            self.recovery_stats['steps_skipped'] += completed_step + 1
+            logger.info(f"♻️ Resumed KOTH event {event_id} after step {completed_step + 1}/{len(timeline)}")
         
-        event['phase'] = 'active'
-        logger.info(f"⚔️ Announcement phase completed for {event_id}")
+        if pending:
+            self.recovery_stats['recovered_at'] = datetime.now().isoformat()
+        return self.recovery_stats['recovered']
     
-    def _active_phase(self, event_id):
+    def _persist(self, method, *args):
         """
-        Active combat phase
+        Queue a state store write
+        
+        Writes are drained in order by one task on the I/O executor, so
+        the event loop never waits on the journal fsync or MongoDB.
         
         Args:
-            event_id (str): Event ID
+            method (str): State store method
+            *args: Method arguments
         """
-        event = self.active_events[event_id]
-        
-        logger.info(f"⚔️ Starting active phase for {event_id}")
-        
-        # Event starts
-        self._send_command(event,
-            f'global.say "<color=red><size=35>[KOTH EVENT STARTED!]</size></color> '
-            f'Fight to be the last standing at {event["arena_location"]}!"')
-        
-        time.sleep(2)
-        
-        # Give basic combat supplies to all players
-        self._send_command(event, 'global.say "<color=green>[KOTH]</color> Combat supplies distributed!"')
-        
-        supply_commands = [
-            'giveall medical.bandage 5',
-            'giveall ammo.pistol 60', 
-            'giveall weapon.pistol.revolver 1'
-        ]
+        with self._persist_lock:
+            self._persist_queue.append((method, args))
+            if self._persist_draining:
+                return
+            self._persist_draining = True
         
-        for cmd in supply_commands:
-            self._send_command(event, cmd)
-            time.sleep(1)
-        
-        # Monitor event duration
-        duration_seconds = event['duration_minutes'] * 60
-        elapsed = 0
-        
-        # Periodic announcements during event
-        while elapsed < duration_seconds:
-            time.sleep(30)  # Check every 30 seconds
-            elapsed += 30
-            
-            remaining_minutes = (duration_seconds - elapsed) // 60
-            remaining_seconds = (duration_seconds - elapsed) % 60
-            
-            # Announcement every 5 minutes
-            if remaining_minutes > 0 and remaining_minutes % 5 == 0 and remaining_seconds == 0:
-                self._send_command(event,
-                    f'global.say "<color=yellow>[KOTH]</color> '
-                    f'{remaining_minutes} minutes remaining! Stay alive at {event["arena_location"]}!"')
+        runtime.submit(runtime.run_blocking(self._drain_persist))
+    
+    def _drain_persist(self):
+        """Run queued state store writes in order (I/O executor)"""
+        while True:
+            with self._persist_lock:
+                if not self._persist_queue:
+                    self._persist_draining = False
+                    return
+                method, args = self._persist_queue.popleft()
             
-            # Final countdown
-            elif remaining_minutes == 0 and remaining_seconds in [60, 30, 10, 5]:
-                self._send_command(event,
-                    f'global.say "<color=red>[KOTH]</color> '
-                    f'{int(remaining_seconds)} seconds remaining!"')
-        
-        event['phase'] = 'finished'
-        logger.info(f"🏁 Active phase completed for {event_id}")
+            try:
+                getattr(self.store, method)(*args)
+            except Exception as e:
+                self.recovery_stats['persist_errors'] += 1
+                logger.error(f"❌ KOTH state {method} failed for {args[0]}: {e}")
     
-    def _end_phase(self, event_id):
+    def _flush_kills(self):
+        """Queue one snapshot of each kill tally changed since the last flush"""
+        with self._persist_lock:
+            dirty, self._dirty_kills = self._dirty_kills, set()
+            if self._kill_flush is not None:
+                self._kill_flush.cancel()
+                self._kill_flush = None
+        
+        for event_id in dirty:
+            event = self.active_events.get(event_id)
+            if event is not None:
+                self._persist('record_kills', event_id, dict(event['kills']))
+    
+    def _run_step(self, event_id, index, step):
         """
-        End the event and determine winner
+        Run one timeline step of an event (called by the scheduler)
         
         Args:
             event_id (str): Event ID
+            index (int): Position of the step in the timeline
+            step (TimelineStep): Step to run
         """
-        event = self.active_events[event_id]
-        
-        logger.info(f"🏆 Starting end phase for {event_id}")
-        
-        self._send_command(event,
-            f'global.say "<color=red><size=35>[KOTH EVENT ENDED!]</size></color> '
-            f'Distributing rewards to survivors..."')
-        
-        time.sleep(3)
-        
-        # Give rewards to all players (in vanilla, we can't easily track location)
-        reward_command = f'giveall {event["reward_item"]} {event["reward_amount"]}'
-        self._send_command(event, reward_command)
-        
-        time.sleep(1)
+        event = self.active_events.get(event_id)
+        if event is None:
+            return
         
-        self._send_command(event,
-            f'global.say "<color=gold><size=30>[KOTH REWARDS DISTRIBUTED!]</size></color> '
-            f'All participants received {event["reward_amount"]} {event["reward_item"]}!"')
+        try:
+            if step.action == 'say':
+                self._send_command(event, f'global.say "{step.payload.format_map(event)}"')
+            
+            elif step.action == 'commands':
+                # Queued back to back so the dispatcher sends them as one batch
+                for command in step.payload:
+                    self._send_command(event, command.format_map(event))
+            
+            elif step.action == 'phase':
+                event['phase'] = step.payload
+                logger.info(f"⚔️ KOTH event {event_id} entered {step.payload} phase")
+            
+            elif step.action == 'winner':
+                if event['kills']:
+                    event['winner'] = max(event['kills'], key=event['kills'].get)
+                    self._send_command(event,
+                        f'global.say "<color=gold>[KOTH]</color> Top fighter: {event["winner"]} '
+                        f'with {event["kills"][event["winner"]]} kills!"')
+            
+            elif step.action == 'cleanup':
+                self._cleanup_event(event_id)
+                logger.info(f"✅ KOTH event completed successfully: {event_id}")
+                return
+            
+        except Exception as e:
+            logger.error(f"❌ Error in KOTH event {event_id} at step {step.action}: {e}")
+            self._emergency_end_event(event_id)
+            return
         
-        # Clean up
-        self._cleanup_event(event_id)
-        logger.info(f"✅ End phase completed for {event_id}")
+        self._flush_kills()
+        self._persist('record_step', event_id, index)
     
     def _emergency_end_event(self, event_id):
         """
@@ -272,6 +399,8 @@ class VanillaKothSystem:
         """
         if event_id in self.active_events:
             del self.active_events[event_id]
+        scheduler.cancel_group(event_id)
+        self._persist('record_end', event_id)
         
         # Remove from GUST bot events list
         if hasattr(self.gust_bot, 'events'):
@@ -281,23 +410,49 @@ class VanillaKothSystem:
     
     def _send_command(self, event, command):
         """
-        Send a command to the server
+        Queue a command for the server without blocking the event sequence
         
         Args:
             event (dict): Event data
             command (str): Console command to send
         """
+        def on_done(future):
+            if not future.result():
+                logger.warning(f"❌ Failed to send command: {command}")
+        
         try:
-            success = self.gust_bot.send_console_command_graphql(
+            ticket = self.gust_bot.queue_console_command(
                 command, 
                 event['server_id'], 
-                event['region']
+                event['region'],
+                caller_class='koth'
             )
-            if not success:
-                logger.warning(f"❌ Failed to send command: {command}")
+            ticket.future.add_done_callback(on_done)
         except Exception as e:
             logger.error(f"❌ Error sending command '{command}': {e}")
     
+    def _on_kill(self, event):
+        """
+        Count kills for KOTH events in their active phase
+        
+        Args:
+            event (KillEvent): Kill parsed from the live console
+        """
+        if not event.killer:
+            return
+        
+        server_id = str(event.server_id).split('_')[0]
+        for event_id, koth_event in list(self.active_events.items()):
+            if str(koth_event['server_id']) == server_id and koth_event['phase'] == 'active':
+                kills = koth_event['kills']
+                kills[event.killer] = kills.get(event.killer, 0) + 1
+                
+                # Persisted as one snapshot shortly after, not once per kill
+                with self._persist_lock:
+                    self._dirty_kills.add(event_id)
+                    if self._kill_flush is None:
+                        self._kill_flush = scheduler.schedule(Config.KOTH_KILL_PERSIST_DELAY, self._flush_kills)
+    
     def get_active_events(self):
         """
         Get list of active KOTH events
@@ -341,6 +496,7 @@ class VanillaKothSystem:
             # Add computed status
             event['elapsed_time'] = (datetime.now() - event['start_time']).total_seconds()
             event['is_active'] = event['phase'] in ['announcement', 'active']
+            event['pending_steps'] = scheduler.pending(event_id)
             return event
         return None
     
@@ -375,5 +531,7 @@ class VanillaKothSystem:
             "active_events": active_count,
             "phases": phases,
             "system_status": "operational",
+            "scheduler": scheduler.get_stats(),
+            "recovery": dict(self.recovery_stats, records_written=self.store.records_written),
             "vanilla_compatible": True
         }
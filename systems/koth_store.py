@@ -0,0 +1,223 @@
+"""
+GUST Bot Enhanced - KOTH State Store
+===================================
+Durable KOTH event state for resuming events after a restart
+"""
+
+import os
+import json
+import logging
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class KothJournalStore:
+    """
+    Append-only JSON-lines journal of KOTH event progress
+    
+    Every change is one line: 'start' with the full event definition,
+    'step' with the index of the last completed timeline step, 'kills'
+    with the current tally and 'end'. Replaying the file rebuilds the
+    state of every unfinished event; a torn last line from a crash is
+    ignored. The journal is compacted to just the live events on load.
+    """
+    
+    backend = "journal"
+    
+    def __init__(self, path=None, fsync=None):
+        """
+        Initialize journal store
+        
+        Args:
+            path (str): Journal file path
+            fsync (bool): fsync after every record
+        """
+        self.path = path or Config.KOTH_JOURNAL_FILE
+        self.fsync = Config.KOTH_JOURNAL_FSYNC if fsync is None else fsync
+        self._lock = threading.Lock()
+        self._live = set()
+        self.records_written = 0
+    
+    def _append(self, record):
+        """Append one record to the journal"""
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._write(line)
+    
+    def _write(self, line):
+        """Append a serialized record (lock must be held)"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.records_written += 1
+    
+    def record_start(self, event_id, event):
+        """
+        Persist a new event
+        
+        Args:
+            event_id (str): Event ID
+            event (dict): JSON-serializable event definition
+        """
+        line = json.dumps({"op": "start", "id": event_id, "event": event}, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._live.add(event_id)
+            self._write(line)
+    
+    def record_step(self, event_id, index):
+        """
+        Persist the index of the last completed timeline step
+        
+        Args:
+            event_id (str): Event ID
+            index (int): Timeline step index
+        """
+        self._append({"op": "step", "id": event_id, "index": index})
+    
+    def record_kills(self, event_id, kills):
+        """
+        Persist the kill tally
+        
+        Args:
+            event_id (str): Event ID
+            kills (dict): Killer name -> kills
+        """
+        self._append({"op": "kills", "id": event_id, "kills": kills})
+    
+    def record_end(self, event_id):
+        """
+        Mark an event finished, truncating the journal once nothing is live
+        
+        Args:
+            event_id (str): Event ID
+        """
+        with self._lock:
+            self._live.discard(event_id)
+            if self._live:
+                self._write(json.dumps({"op": "end", "id": event_id}) + '\n')
+                return
+            
+            with open(self.path, 'w', encoding='utf-8'):
+                pass
+    
+    def load_active(self):
+        """
+        Replay the journal and compact it to the unfinished events
+        
+        Returns:
+            list: Event definitions with 'event_id', 'completed_step' and 'kills'
+        """
+        events = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"⚠️ Skipping damaged KOTH journal line: {line[:80]!r}")
+                        continue
+                    
+                    event_id = record.get("id")
+                    op = record.get("op")
+                    if op == "start":
+                        events[event_id] = dict(record["event"], event_id=event_id, completed_step=-1, kills={})
+                    elif event_id not in events:
+                        continue
+                    elif op == "step":
+                        events[event_id]["completed_step"] = record["index"]
+                    elif op == "kills":
+                        events[event_id]["kills"] = record["kills"]
+                    elif op == "end":
+                        del events[event_id]
+        
+        self._compact(events.values())
+        self._live = set(events)
+        return list(events.values())
+    
+    def _compact(self, events):
+        """Rewrite the journal with one snapshot per live event"""
+        temp_path = self.path + '.tmp'
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for event in events:
+                    definition = {key: value for key, value in event.items()
+                                  if key not in ('event_id', 'completed_step', 'kills')}
+                    event_id = event['event_id']
+                    f.write(json.dumps({"op": "start", "id": event_id, "event": definition}) + '\n')
+                    f.write(json.dumps({"op": "step", "id": event_id, "index": event['completed_step']}) + '\n')
+                    if event['kills']:
+                        f.write(json.dumps({"op": "kills", "id": event_id, "kills": event['kills']}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+
+class KothMongoStore:
+    """KOTH event progress kept in the koth_events MongoDB collection"""
+    
+    backend = "mongodb"
+    
+    def __init__(self, db):
+        """
+        Initialize MongoDB store
+        
+        Args:
+            db: MongoDB database
+        """
+        self.collection = db.koth_events
+        self.records_written = 0
+    
+    def record_start(self, event_id, event):
+        """Persist a new event"""
+        self.collection.replace_one(
+            {'_id': event_id},
+            dict(event, status='active', completed_step=-1, kills={}),
+            upsert=True
+        )
+        self.records_written += 1
+    
+    def record_step(self, event_id, index):
+        """Persist the index of the last completed timeline step"""
+        self.collection.update_one({'_id': event_id}, {'$set': {'completed_step': index}})
+        self.records_written += 1
+    
+    def record_kills(self, event_id, kills):
+        """Persist the kill tally"""
+        self.collection.update_one({'_id': event_id}, {'$set': {'kills': kills}})
+        self.records_written += 1
+    
+    def record_end(self, event_id):
+        """Mark an event finished"""
+        self.collection.update_one({'_id': event_id}, {'$set': {'status': 'ended'}})
+        self.records_written += 1
+    
+    def load_active(self):
+        """
+        Load unfinished events
+        
+        Returns:
+            list: Event definitions with 'event_id', 'completed_step' and 'kills'
+        """
+        events = []
+        for document in self.collection.find({'status': 'active'}):
+            document['event_id'] = document.pop('_id')
+            document.pop('status', None)
+            events.append(document)
+        return events
+
+def create_koth_store(db=None):
+    """
+    Create the KOTH state store for the current storage mode
+    
+    Args:
+        db: MongoDB database, None for the file journal
+        
+    Returns:
+        KothJournalStore or KothMongoStore: State store
+    """
+    if db is not None:
+        return KothMongoStore(db)
+    return KothJournalStore()
@@ -0,0 +1,261 @@
+"""
+GUST Bot Enhanced - Balance Leaderboard
+======================================
+Order-statistics index of player balances for ranks and top lists
+"""
+
+import random
+import threading
+
+class _Node:
+    """Skip list node; width[level] counts the positions next[level] skips"""
+    
+    __slots__ = ('key', 'next', 'width')
+    
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+class BalanceLeaderboard:
+    """
+    Indexable skip list of (balance, user) ordered richest first
+    
+    Every link stores how many positions it skips, so besides O(log n)
+    inserts and removals the list can find the entry at a given rank and
+    the rank of a given entry in O(log n). That makes top-N, a player's
+    rank and "players around me" cheap however many wallets exist, and
+    the index is updated on each balance change instead of re-sorting
+    every user per request. Ties are ordered by user ID so ranks are
+    stable.
+    """
+    
+    MAX_LEVELS = 24  # balanced up to ~16M entries
+    
+    def __init__(self):
+        """Initialize an empty leaderboard"""
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._balances = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.updates = 0
+    
+    def __len__(self):
+        return len(self._balances)
+    
+    # Skip list primitives (lock held)
+    
+    def _search(self, key):
+        """Find the last node before key on every level and its position"""
+        chain = [None] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+    
+    def _random_levels(self):
+        """Levels of a new node (each further level with probability 1/2)"""
+        levels = 1
+        while levels < self.MAX_LEVELS and self._random.random() < 0.5:
+            levels += 1
+        return levels
+    
+    def _insert(self, key):
+        """Insert a key"""
+        chain, steps_at_level = self._search(key)
+        levels = self._random_levels()
+        
+        node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+    
+    def _remove(self, key):
+        """Remove a key that is present"""
+        chain, _ = self._search(key)
+        node = chain[0].next[0]
+        levels = len(node.next)
+        for level in range(levels):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+    
+    def _node_at(self, index):
+        """Node at a 0-based position"""
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+    
+    def _position(self, key):
+        """0-based position of a present key"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+    
+    def _entries(self, start, count):
+        """Entries from a 0-based position onward"""
+        entries = []
+        if start >= len(self._balances):
+            return entries
+        node = self._node_at(start)
+        for rank in range(start + 1, start + count + 1):
+            if node is None:
+                break
+            entries.append({'rank': rank, 'userId': node.key[1], 'balance': -node.key[0]})
+            node = node.next[0]
+        return entries
+    
+    # Public API
+    
+    def update(self, user_id, balance):
+        """
+        Set a user's balance
+        
+        Args:
+            user_id (str): User ID
+            balance (int): New balance
+        """
+        with self._lock:
+            old = self._balances.get(user_id)
+            if old == balance:
+                return
+            if old is not None:
+                self._remove((-old, user_id))
+            self._insert((-balance, user_id))
+            self._balances[user_id] = balance
+            self.updates += 1
+    
+    def load(self, balances):
+        """
+        Replace the leaderboard contents in one pass
+        
+        Sorting once and linking nodes left to right is O(n log n) overall
+        and much faster than inserting wallets one at a time at startup.
+        
+        Args:
+            balances (dict or iterable): User ID -> balance pairs
+        """
+        items = dict(balances.items() if isinstance(balances, dict) else balances)
+        keys = sorted((-balance, user_id) for user_id, balance in items.items())
+        
+        head = _Node(None, self.MAX_LEVELS)
+        last = [head] * self.MAX_LEVELS
+        last_position = [0] * self.MAX_LEVELS
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, self._random_levels())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+        for level in range(self.MAX_LEVELS):
+            last[level].width[level] = len(keys) + 1 - last_position[level]
+        
+        with self._lock:
+            self._head = head
+            self._balances = items
+    
+    def update_many(self, balances):
+        """
+        Set several balances
+        
+        Args:
+            balances (dict or iterable): User ID -> balance pairs
+        """
+        items = balances.items() if isinstance(balances, dict) else balances
+        for user_id, balance in items:
+            self.update(user_id, balance)
+    
+    def remove(self, user_id):
+        """
+        Drop a user from the leaderboard
+        
+        Args:
+            user_id (str): User ID
+        """
+        with self._lock:
+            old = self._balances.pop(user_id, None)
+            if old is not None:
+                self._remove((-old, user_id))
+    
+    def top(self, limit=10, offset=0):
+        """
+        Get the richest users
+        
+        Args:
+            limit (int): Number of entries
+            offset (int): Entries to skip (for paging)
+            
+        Returns:
+            list: Entries with rank, userId and balance
+        """
+        with self._lock:
+            return self._entries(max(offset, 0), max(limit, 0))
+    
+    def rank(self, user_id):
+        """
+        Get a user's 1-based rank
+        
+        Args:
+            user_id (str): User ID
+            
+        Returns:
+            int: Rank, or None if the user has no balance
+        """
+        with self._lock:
+            balance = self._balances.get(user_id)
+            if balance is None:
+                return None
+            return self._position((-balance, user_id)) + 1
+    
+    def around(self, user_id, radius=5):
+        """
+        Get the users ranked just above and below a user
+        
+        Args:
+            user_id (str): User ID
+            radius (int): Entries on each side
+            
+        Returns:
+            list: Entries with rank, userId and balance, including the user
+        """
+        with self._lock:
+            balance = self._balances.get(user_id)
+            if balance is None:
+                return []
+            position = self._position((-balance, user_id))
+            start = max(position - radius, 0)
+            return self._entries(start, position - start + radius + 1)
+    
+    def get_stats(self):
+        """
+        Get leaderboard statistics
+        
+        Returns:
+            dict: Size and update count
+        """
+        return {
+            "players": len(self._balances),
+            "updates": self.updates
+        }
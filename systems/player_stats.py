@@ -0,0 +1,140 @@
+"""
+GUST Bot Enhanced - Player Stats
+===============================
+Per-server kill, death and session counts from live console events
+"""
+
+import threading
+
+from utils.console_events import console_events
+
+STAT_NAMES = ('kills', 'deaths', 'joins', 'leaves')
+
+class _PlayerRecord:
+    """Counters of one player on one server"""
+    
+    __slots__ = STAT_NAMES + ('online',)
+    
+    def __init__(self):
+        self.kills = 0
+        self.deaths = 0
+        self.joins = 0
+        self.leaves = 0
+        self.online = False
+
+class PlayerStats:
+    """
+    Kill, death and session tallies per server and player name
+    
+    Fed by the console event bus (kill, join and leave events), so the
+    counts come straight from the fields the console rules captured and
+    no console line is parsed a second time. Callbacks run on the
+    WebSocket loop and only bump counters under a lock.
+    """
+    
+    def __init__(self, events=None):
+        """
+        Initialize player stats and subscribe to console events
+        
+        Args:
+            events (ConsoleEventBus): Event bus to subscribe to
+        """
+        self._lock = threading.Lock()
+        self._servers = {}
+        self.events_seen = 0
+        (events or console_events).subscribe(self._on_event, kinds=('kill', 'join', 'leave'))
+    
+    def _player(self, server_id, name):
+        """Get (or create) a player's record (lock must be held)"""
+        players = self._servers.get(server_id)
+        if players is None:
+            players = self._servers[server_id] = {}
+        record = players.get(name)
+        if record is None:
+            record = players[name] = _PlayerRecord()
+        return record
+    
+    def _on_event(self, event):
+        """
+        Count a kill, join or leave
+        
+        Args:
+            event (ConsoleEvent): Event parsed from the live console
+        """
+        server_id = str(event.server_id).split('_')[0]
+        with self._lock:
+            self.events_seen += 1
+            if event.kind == 'kill':
+                if event.victim:
+                    self._player(server_id, event.victim).deaths += 1
+                if event.killer and event.killer != event.victim:
+                    self._player(server_id, event.killer).kills += 1
+            elif event.player:
+                record = self._player(server_id, event.player)
+                if event.kind == 'join':
+                    record.joins += 1
+                    record.online = True
+                else:
+                    record.leaves += 1
+                    record.online = False
+    
+    @staticmethod
+    def _entry(name, record):
+        """Convert a record to an API dict"""
+        entry = {'player': name, 'online': record.online}
+        for stat in STAT_NAMES:
+            entry[stat] = getattr(record, stat)
+        return entry
+    
+    def get_player(self, server_id, name):
+        """
+        Get one player's counters
+        
+        Args:
+            server_id: Server ID
+            name (str): Player name as shown in the console
+            
+        Returns:
+            dict: Counters, or None if the player was never seen
+        """
+        with self._lock:
+            record = self._servers.get(str(server_id).split('_')[0], {}).get(name)
+            return self._entry(name, record) if record else None
+    
+    def top(self, server_id, stat='kills', limit=10):
+        """
+        Get the players with the highest count of a stat
+        
+        Args:
+            server_id: Server ID
+            stat (str): One of kills, deaths, joins, leaves
+            limit (int): Number of players
+            
+        Returns:
+            list: Player counter dicts, highest first
+            
+        Raises:
+            ValueError: If stat is not a known counter
+        """
+        if stat not in STAT_NAMES:
+            raise ValueError(f"Unknown stat: {stat}")
+        
+        with self._lock:
+            players = list(self._servers.get(str(server_id).split('_')[0], {}).items())
+            ranked = sorted(players, key=lambda item: (-getattr(item[1], stat), item[0]))[:max(limit, 0)]
+            return [self._entry(name, record) for name, record in ranked]
+    
+    def get_stats(self):
+        """
+        Get player stats bookkeeping
+        
+        Returns:
+            dict: Servers, tracked players and events counted
+        """
+        with self._lock:
+            return {
+                "servers": len(self._servers),
+                "players": sum(len(players) for players in self._servers.values()),
+                "online": sum(record.online for players in self._servers.values() for record in players.values()),
+                "events_seen": self.events_seen
+            }
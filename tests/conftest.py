@@ -0,0 +1,220 @@
+"""
+GUST Bot Enhanced - Test Configuration
+=====================================
+Make the project modules importable and provide an in-memory MongoDB
+"""
+
+import os
+import sys
+import copy
+import threading
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stand-ins for the pymongo request classes, patched into systems.economy
+FakeUpdateOne = namedtuple('FakeUpdateOne', ['filter', 'update', 'upsert'])
+FakeReplaceOne = namedtuple('FakeReplaceOne', ['filter', 'replacement', 'upsert'])
+FakeReturnDocument = SimpleNamespace(BEFORE=False, AFTER=True)
+
+def _matches(document, query):
+    """Check a document against the subset of query syntax the economy uses"""
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == '$gte' and not (value is not None and value >= operand):
+                    return False
+                if operator == '$ne' and (operand in value if isinstance(value, list) else value == operand):
+                    return False
+                if operator == '$in' and value not in operand:
+                    return False
+        elif isinstance(value, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+def _apply(document, update, inserted=False):
+    """Apply $inc, $set, $push, $pull and $setOnInsert to a document"""
+    for key, amount in update.get('$inc', {}).items():
+        document[key] = document.get(key, 0) + amount
+    document.update(update.get('$set', {}))
+    for key, item in update.get('$push', {}).items():
+        document.setdefault(key, []).append(item)
+    for key, item in update.get('$pull', {}).items():
+        document[key] = [existing for existing in document.get(key, []) if existing != item]
+    if inserted:
+        for key, value in update.get('$setOnInsert', {}).items():
+            document.setdefault(key, value)
+
+def _project(document, projection):
+    """Return a copy of a document limited to a projection"""
+    if document is None or not projection:
+        return copy.deepcopy(document)
+    included = {key for key, wanted in projection.items() if wanted and key != '_id'}
+    result = {key: copy.deepcopy(value) for key, value in document.items() if key in included}
+    if projection.get('_id', True) and '_id' in document:
+        result['_id'] = document['_id']
+    return result
+
+class FakeCollection:
+    """In-memory MongoDB collection (the database lock makes every call atomic)"""
+    
+    def __init__(self, database):
+        self.database = database
+        self.documents = []
+        self.bulk_write_failures = 0
+        self.bulk_writes = 0
+    
+    def _insert(self, document):
+        if '_id' in document and any(existing.get('_id') == document['_id'] for existing in self.documents):
+            from systems import economy
+            raise economy.DuplicateKeyError(f"duplicate _id {document['_id']!r}")
+        document.setdefault('_id', f"oid{len(self.documents)}-{id(document)}")
+        self.documents.append(copy.deepcopy(document))
+    
+    def _upsert(self, query, update):
+        document = {key: value for key, value in query.items() if not isinstance(value, dict)}
+        _apply(document, update, inserted=True)
+        self._insert(document)
+        return self.documents[-1]
+    
+    def find(self, query=None, projection=None):
+        with self.database.lock:
+            return [_project(document, projection) for document in self.documents if _matches(document, query or {})]
+    
+    def find_one(self, query=None, projection=None):
+        found = self.find(query, projection)
+        return found[0] if found else None
+    
+    def insert_one(self, document, session=None):
+        with self.database.lock:
+            self._insert(document)
+    
+    def delete_one(self, query):
+        with self.database.lock:
+            for index, document in enumerate(self.documents):
+                if _matches(document, query):
+                    del self.documents[index]
+                    return
+    
+    def update_one(self, query, update, upsert=False):
+        with self.database.lock:
+            for document in self.documents:
+                if _matches(document, query):
+                    _apply(document, update)
+                    return SimpleNamespace(matched_count=1, modified_count=1)
+            if upsert:
+                self._upsert(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0)
+    
+    def update_many(self, query, update):
+        with self.database.lock:
+            for document in self.documents:
+                if _matches(document, query):
+                    _apply(document, update)
+    
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False, session=None):
+        with self.database.lock:
+            for document in self.documents:
+                if _matches(document, query):
+                    before = copy.deepcopy(document)
+                    _apply(document, update)
+                    return _project(document if return_document else before, projection)
+            if upsert:
+                return _project(self._upsert(query, update), projection) if return_document else None
+            return None
+    
+    def bulk_write(self, operations, ordered=True):
+        with self.database.lock:
+            self.bulk_writes += 1
+            if self.bulk_write_failures:
+                self.bulk_write_failures -= 1
+                raise ConnectionError("bulk_write failed")
+            for operation in operations:
+                if isinstance(operation, FakeReplaceOne):
+                    self.documents = [document for document in self.documents
+                                      if not _matches(document, operation.filter)]
+                    self.documents.append(copy.deepcopy(operation.replacement))
+                else:
+                    self.update_one(operation.filter, operation.update, operation.upsert)
+
+class FakeSession:
+    """Session whose transaction restores every collection if the callback raises"""
+    
+    def __init__(self, database):
+        self.database = database
+        self.transactions = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def with_transaction(self, callback):
+        with self.database.lock:
+            snapshot = {name: copy.deepcopy(collection.documents)
+                        for name, collection in self.database.collections.items()}
+        try:
+            result = callback(self)
+        except BaseException:
+            with self.database.lock:
+                for name, collection in self.database.collections.items():
+                    collection.documents = snapshot.get(name, [])
+            raise
+        self.transactions += 1
+        return result
+
+class FakeDatabase:
+    """In-memory MongoDB database; replica_set enables session transactions"""
+    
+    def __init__(self, replica_set=False):
+        self.lock = threading.RLock()
+        self.collections = {}
+        self.sessions = []
+        hello = {'setName': 'rs0'} if replica_set else {}
+        self.client = SimpleNamespace(
+            admin=SimpleNamespace(command=lambda name: hello),
+            start_session=self._start_session
+        )
+    
+    def _start_session(self):
+        session = FakeSession(self)
+        self.sessions.append(session)
+        return session
+    
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self)
+            return self.collections[name]
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+@pytest.fixture
+def economy_module(monkeypatch):
+    """systems.economy with the pymongo request classes replaced by the fakes"""
+    from systems import economy
+    monkeypatch.setattr(economy, 'UpdateOne', FakeUpdateOne)
+    monkeypatch.setattr(economy, 'ReplaceOne', FakeReplaceOne)
+    monkeypatch.setattr(economy, 'ReturnDocument', FakeReturnDocument)
+    return economy
+
+@pytest.fixture
+def mongo():
+    """Standalone in-memory MongoDB (no transactions)"""
+    return FakeDatabase()
+
+@pytest.fixture
+def replica_set():
+    """In-memory MongoDB that supports session transactions"""
+    return FakeDatabase(replica_set=True)
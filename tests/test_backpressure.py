@@ -0,0 +1,94 @@
+"""
+GUST Bot Enhanced - Consumer Queue Tests
+=======================================
+Overflow policies checked against a naive list model
+"""
+
+import random
+import asyncio
+
+import pytest
+
+from websocket.backpressure import ConsumerQueue, OVERFLOW_POLICIES
+
+DROPPABLE = ('save', 'player')
+TYPES = ('save', 'player', 'kill', 'chat')
+
+class ListModel:
+    """The overflow policies written as plain list operations"""
+    
+    def __init__(self, maxsize, policy):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = []
+        self.dropped = []
+    
+    def put(self, message):
+        if len(self.queue) >= self.maxsize:
+            if self.policy == 'drop_newest':
+                self.dropped.append(message)
+                return
+            if self.policy == 'drop_by_type':
+                victim = next((queued for queued in self.queue if queued['type'] in DROPPABLE), None)
+                if victim is None and message['type'] in DROPPABLE:
+                    self.dropped.append(message)
+                    return
+                if victim is not None:
+                    self.queue.remove(victim)
+                    self.dropped.append(victim)
+                    self.queue.append(message)
+                    return
+            self.dropped.append(self.queue.pop(0))
+        self.queue.append(message)
+    
+    def get(self):
+        return self.queue.pop(0)
+
+def _run(maxsize, policy, get_rate, seed):
+    """Replay one random put/get sequence on the queue and the model"""
+    rng = random.Random(seed)
+    queue = ConsumerQueue(maxsize, policy, DROPPABLE)
+    model = ListModel(maxsize, policy)
+    dropped = []
+    count_drop = queue._count_drop
+    queue._count_drop = lambda message: (dropped.append(message), count_drop(message))
+    compactions = []
+    compact = queue._compact
+    queue._compact = lambda: (compactions.append(len(queue._shed)), compact())
+    
+    async def replay():
+        for index in range(600):
+            if rng.random() < get_rate:
+                if model.queue:
+                    assert await queue.get() is model.get()
+            else:
+                message = {'type': rng.choice(TYPES), 'index': index}
+                queue.put(message)
+                model.put(message)
+            assert len(queue) == len(model.queue)
+        
+        while model.queue:
+            assert await queue.get() is model.get()
+    
+    asyncio.run(replay())
+    
+    assert dropped == model.dropped
+    assert queue.get_stats()['dropped'] == len(model.dropped)
+    expected_by_type = {}
+    for message in model.dropped:
+        expected_by_type[message['type']] = expected_by_type.get(message['type'], 0) + 1
+    assert queue.get_stats()['dropped_by_type'] == expected_by_type
+    return compactions
+
+@pytest.mark.parametrize('policy', OVERFLOW_POLICIES)
+@pytest.mark.parametrize('get_rate', [0.05, 0.3, 0.6])
+def test_queue_matches_list_model(policy, get_rate):
+    for seed in range(40):
+        _run(7, policy, get_rate, seed)
+
+def test_drop_by_type_compacts_shed_messages():
+    # Few gets: shed messages pile up in the main queue until compaction
+    compactions = []
+    for seed in range(40):
+        compactions += _run(5, 'drop_by_type', 0.02, seed)
+    assert compactions
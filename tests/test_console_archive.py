@@ -0,0 +1,68 @@
+"""
+GUST Bot Enhanced - Console Archive Tests
+========================================
+Sequence ordering of archived console history across restarts
+"""
+
+from datetime import datetime
+
+from utils.console_archive import ConsoleArchive
+from utils.message_buffer import MessageSequence
+
+def _message(sequence, text):
+    """Build a stamped console message"""
+    return {
+        'message': text,
+        'type': 'chat',
+        'server_id': '123',
+        'timestamp': datetime.now().isoformat(),
+        'seq': sequence.next()
+    }
+
+def _start(base_dir):
+    """Start a 'process': a fresh archive and a sequence seeded the way app.py does"""
+    archive = ConsoleArchive(base_dir=base_dir, block_size=1000)
+    sequence = MessageSequence()
+    sequence.advance(archive.last_seq())
+    return archive, sequence
+
+def test_last_seq_of_empty_archive(tmp_path):
+    archive = ConsoleArchive(base_dir=str(tmp_path), block_size=1000)
+    assert archive.last_seq() == 0
+
+def test_messages_after_restart_are_queryable(tmp_path):
+    archive, sequence = _start(str(tmp_path))
+    for index in range(4):
+        archive.append(_message(sequence, f"old {index}"))
+    archive.flush()
+    
+    # Restart: the new process must not reuse sequence numbers already on disk
+    archive, sequence = _start(str(tmp_path))
+    assert archive.last_seq() == 4
+    archive.append(_message(sequence, "new 0"))
+    
+    # Still unwritten (read from memory) ...
+    texts = [message['message'] for message in archive.query('123')]
+    assert texts == ['old 0', 'old 1', 'old 2', 'old 3', 'new 0']
+    
+    # ... and after it reached disk, without duplicates
+    archive.flush()
+    texts = [message['message'] for message in archive.query('123')]
+    assert texts == ['old 0', 'old 1', 'old 2', 'old 3', 'new 0']
+
+def test_after_seq_cursor_survives_restart(tmp_path):
+    archive, sequence = _start(str(tmp_path))
+    for index in range(4):
+        archive.append(_message(sequence, f"old {index}"))
+    archive.flush()
+    
+    archive, sequence = _start(str(tmp_path))
+    archive.append(_message(sequence, "new 0"))
+    archive.append(_message(sequence, "new 1"))
+    
+    texts = [message['message'] for message in archive.query('123', after_seq=2)]
+    assert texts == ['old 2', 'old 3', 'new 0', 'new 1']
+    
+    archive.flush()
+    texts = [message['message'] for message in archive.query('123', after_seq=4)]
+    assert texts == ['new 0', 'new 1']
@@ -0,0 +1,160 @@
+"""
+GUST Bot Enhanced - Coin Transfer Tests
+======================================
+Direct MongoDB transfers: session transactions and crash recovery
+"""
+
+import threading
+
+import pytest
+
+class Crash(BaseException):
+    """Process death: not caught by the engine's error handling"""
+
+def _wallets(db, **balances):
+    for user_id, balance in balances.items():
+        db.economy.insert_one({'userId': user_id, 'balance': balance})
+
+def _balance(db, user_id):
+    return db.economy.find_one({'userId': user_id})['balance']
+
+def _fail_on_call(collection, method, call, error):
+    """Make the nth call of a collection method raise (until _restore)"""
+    original = getattr(collection, method)
+    calls = []
+    
+    def failing(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == call:
+            raise error
+        return original(*args, **kwargs)
+    
+    setattr(collection, method, failing)
+
+def _restore(collection, method):
+    delattr(collection, method)
+
+def _assert_clean(db, economy):
+    assert db[economy.Config.ECONOMY_PENDING_TRANSFERS].find() == []
+    assert all(not wallet.get('pendingTransfers') for wallet in db.economy.find())
+
+def test_two_phase_transfer_moves_coins_and_logs_once(economy_module, mongo):
+    _wallets(mongo, alice=100, bob=5)
+    engine = economy_module.TransferEngine(mongo, {})
+    
+    result = engine.transfer('alice', 'bob', 40, ('transactions', {'type': 'transfer', 'amount': 40}))
+    
+    assert result == {'success': True, 'senderNewBalance': 60, 'receiverNewBalance': 45}
+    assert len(mongo.transactions.find()) == 1
+    assert mongo.sessions == []
+    _assert_clean(mongo, economy_module)
+
+def test_two_phase_transfer_rejects_overdraft(economy_module, mongo):
+    _wallets(mongo, alice=10)
+    engine = economy_module.TransferEngine(mongo, {})
+    
+    assert engine.transfer('alice', 'bob', 40)['error'] == 'Insufficient balance'
+    assert _balance(mongo, 'alice') == 10
+    _assert_clean(mongo, economy_module)
+
+def test_crash_after_debit_is_completed_at_startup(economy_module, mongo):
+    _wallets(mongo, alice=100, bob=5)
+    engine = economy_module.TransferEngine(mongo, {})
+    # Second find_one_and_update on economy is the credit
+    _fail_on_call(mongo.economy, 'find_one_and_update', 2, Crash())
+    
+    with pytest.raises(Crash):
+        engine.transfer('alice', 'bob', 40, ('transactions', {'type': 'transfer', 'amount': 40}))
+    _restore(mongo.economy, 'find_one_and_update')
+    assert _balance(mongo, 'alice') == 60
+    assert _balance(mongo, 'bob') == 5
+    
+    restarted = economy_module.TransferEngine(mongo, {})
+    assert restarted.recover_transfers() == 1
+    assert _balance(mongo, 'alice') == 60
+    assert _balance(mongo, 'bob') == 45
+    assert len(mongo.transactions.find()) == 1
+    _assert_clean(mongo, economy_module)
+    
+    # Running recovery again changes nothing
+    assert restarted.recover_transfers() == 0
+    assert _balance(mongo, 'bob') == 45
+
+def test_crash_after_credit_is_not_applied_twice(economy_module, mongo):
+    _wallets(mongo, alice=100, bob=5)
+    engine = economy_module.TransferEngine(mongo, {})
+    _fail_on_call(mongo.transactions, 'insert_one', 1, Crash())
+    
+    with pytest.raises(Crash):
+        engine.transfer('alice', 'bob', 40, ('transactions', {'type': 'transfer', 'amount': 40}))
+    _restore(mongo.transactions, 'insert_one')
+    
+    economy_module.TransferEngine(mongo, {}).recover_transfers()
+    assert (_balance(mongo, 'alice'), _balance(mongo, 'bob')) == (60, 45)
+    assert len(mongo.transactions.find()) == 1
+    _assert_clean(mongo, economy_module)
+
+def test_crash_before_debit_is_dropped_at_startup(economy_module, mongo):
+    _wallets(mongo, alice=100, bob=5)
+    engine = economy_module.TransferEngine(mongo, {})
+    _fail_on_call(mongo.economy, 'find_one_and_update', 1, Crash())
+    
+    with pytest.raises(Crash):
+        engine.transfer('alice', 'bob', 40)
+    _restore(mongo.economy, 'find_one_and_update')
+    
+    assert economy_module.TransferEngine(mongo, {}).recover_transfers() == 0
+    assert (_balance(mongo, 'alice'), _balance(mongo, 'bob')) == (100, 5)
+    _assert_clean(mongo, economy_module)
+
+def test_failed_credit_refunds_sender(economy_module, mongo):
+    _wallets(mongo, alice=100, bob=5)
+    engine = economy_module.TransferEngine(mongo, {})
+    _fail_on_call(mongo.economy, 'find_one_and_update', 2, ConnectionError("network"))
+    
+    assert engine.transfer('alice', 'bob', 40) == {'success': False, 'error': 'Transfer failed'}
+    assert (_balance(mongo, 'alice'), _balance(mongo, 'bob')) == (100, 5)
+    assert engine.refunds == 1
+    _assert_clean(mongo, economy_module)
+
+def test_concurrent_two_phase_transfers_never_overdraw(economy_module, mongo):
+    _wallets(mongo, alice=1000, bob=0, carol=0)
+    engine = economy_module.TransferEngine(mongo, {})
+    
+    def send(to_user):
+        for _ in range(100):
+            engine.transfer('alice', to_user, 7)
+    
+    threads = [threading.Thread(target=send, args=(user,)) for user in ('bob', 'carol') * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    total = _balance(mongo, 'alice') + _balance(mongo, 'bob') + _balance(mongo, 'carol')
+    assert total == 1000
+    assert _balance(mongo, 'alice') >= 0
+    assert engine.transfers == 1000 // 7
+    _assert_clean(mongo, economy_module)
+
+def test_transaction_transfer_commits_together(economy_module, replica_set):
+    _wallets(replica_set, alice=100, bob=5)
+    engine = economy_module.TransferEngine(replica_set, {})
+    
+    result = engine.transfer('alice', 'bob', 40, ('transactions', {'type': 'transfer', 'amount': 40}))
+    
+    assert result['success']
+    assert (_balance(replica_set, 'alice'), _balance(replica_set, 'bob')) == (60, 45)
+    assert replica_set.sessions[0].transactions == 1
+    assert replica_set[economy_module.Config.ECONOMY_PENDING_TRANSFERS].find() == []
+
+def test_transaction_transfer_rolls_back_on_failure(economy_module, replica_set):
+    _wallets(replica_set, alice=100, bob=5)
+    engine = economy_module.TransferEngine(replica_set, {})
+    _fail_on_call(replica_set.transactions, 'insert_one', 1, ConnectionError("network"))
+    
+    result = engine.transfer('alice', 'bob', 40, ('transactions', {'type': 'transfer', 'amount': 40}))
+    
+    assert result == {'success': False, 'error': 'Transfer failed'}
+    assert (_balance(replica_set, 'alice'), _balance(replica_set, 'bob')) == (100, 5)
+    assert replica_set.transactions.find() == []
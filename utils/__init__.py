@@ -4,9 +4,22 @@ GUST Bot Enhanced - Utilities Package
 Utility functions and helper classes for GUST Bot
 """
 
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, HierarchicalRateLimiter, CALLER_PRIORITIES
+from .gportal_client import GPortalGraphQLClient
+from .command_dispatcher import CommandDispatcher, CommandTicket
+from .console_stream import ConsoleStreamBroadcaster, ConsoleStreamSubscriber
+from .message_buffer import MessageSequence, message_sequence, SequencedMessageBuffer, IndexedMessageBuffer
+from .runtime import AsyncRuntime, runtime
+from .scheduler import TimerScheduler, Timer, scheduler
+from .console_rules import ConsoleRuleEngine, ConsoleRule, ConsoleMatch, console_rules
+from .console_events import (
+    ConsoleEventBus, ConsoleEvent, KillEvent, JoinEvent, LeaveEvent, ChatEvent, SaveEvent, console_events
+)
+from .console_archive import ConsoleArchive, console_archive
+from .search_index import SearchIndex, search_index
 from .helpers import (
-    load_token, refresh_token, save_token, classify_message, 
+    TokenCache, token_cache, load_token, refresh_token, save_token,
+    MessageClassifier, message_classifier, classify_message, classify_many, 
     get_type_icon, format_console_message, validate_server_id, 
     validate_region, format_command, create_server_data,
     get_countdown_announcements, escape_html, safe_int, safe_float,
@@ -14,9 +27,16 @@ from .helpers import (
 )
 
 __all__ = [
-    'RateLimiter',
-    'load_token', 'refresh_token', 'save_token',
-    'classify_message', 'get_type_icon', 'format_console_message',
+    'RateLimiter', 'HierarchicalRateLimiter', 'CALLER_PRIORITIES', 'GPortalGraphQLClient', 'CommandDispatcher', 'CommandTicket',
+    'ConsoleStreamBroadcaster', 'ConsoleStreamSubscriber',
+    'MessageSequence', 'message_sequence', 'SequencedMessageBuffer', 'IndexedMessageBuffer',
+    'AsyncRuntime', 'runtime', 'TimerScheduler', 'Timer', 'scheduler',
+    'ConsoleRuleEngine', 'ConsoleRule', 'ConsoleMatch', 'console_rules',
+    'ConsoleEventBus', 'ConsoleEvent', 'KillEvent', 'JoinEvent', 'LeaveEvent', 'ChatEvent', 'SaveEvent', 'console_events',
+    'ConsoleArchive', 'console_archive', 'SearchIndex', 'search_index',
+    'TokenCache', 'token_cache', 'load_token', 'refresh_token', 'save_token',
+    'MessageClassifier', 'message_classifier', 'classify_message', 'classify_many',
+    'get_type_icon', 'format_console_message',
     'validate_server_id', 'validate_region', 'format_command',
     'create_server_data', 'get_countdown_announcements',
     'escape_html', 'safe_int', 'safe_float',
@@ -0,0 +1,394 @@
+"""
+GUST Bot Enhanced - Command Dispatcher
+=====================================
+Asynchronous console command dispatch with per-server queues
+"""
+
+import time
+import uuid
+import heapq
+import queue
+import itertools
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+from config import Config
+from utils.helpers import validate_server_id
+from utils.rate_limiter import CALLER_PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+class CommandTicket:
+    """Handle for a queued console command"""
+    
+    def __init__(self, command, server_id, region, caller_class='interactive'):
+        """
+        Initialize command ticket
+        
+        Args:
+            command (str): Console command
+            server_id: Target server ID
+            region (str): Server region
+            caller_class (str): interactive, koth or bulk
+        """
+        self.command_id = uuid.uuid4().hex
+        self.command = command
+        self.server_id = server_id
+        self.region = region
+        self.caller_class = caller_class
+        self.priority = CALLER_PRIORITIES.get(caller_class, max(CALLER_PRIORITIES.values()))
+        self.status = 'queued'
+        self.error = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+    
+    def is_done(self):
+        """Check whether the command has finished (sent, failed or rejected)"""
+        return self.status in ('sent', 'failed', 'rejected')
+    
+    def to_dict(self):
+        """
+        Get serializable ticket information
+        
+        Returns:
+            dict: Ticket status data
+        """
+        return {
+            "command_id": self.command_id,
+            "command": self.command,
+            "server_id": str(self.server_id),
+            "region": self.region,
+            "caller_class": self.caller_class,
+            "status": self.status,
+            "error": self.error,
+            "queued_at": datetime.fromtimestamp(self.queued_at).isoformat(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            "queue_time_ms": round(((self.started_at or time.time()) - self.queued_at) * 1000, 1)
+        }
+
+class CommandDispatcher:
+    """
+    Routes console commands through per-server priority queues
+    
+    A bounded pool of workers drains the queues. Each server is owned
+    by at most one worker at a time, so commands to a server keep their
+    order (FIFO within a caller class, interactive ahead of automation)
+    and a slow server can only ever tie up a single worker.
+    
+    When a batch sender is configured, a worker waits a short window and
+    then coalesces everything queued for its server, plus whatever other
+    servers are waiting, into one request.
+    """
+    
+    def __init__(self, send_func, batch_send_func=None, max_workers=None, max_queue_per_server=None,
+                 history_size=None, batch_window=None, batch_max=None):
+        """
+        Initialize command dispatcher
+        
+        Args:
+            send_func: Blocking callable(command, server_id, region, caller_class) -> bool
+            batch_send_func: Optional blocking callable(list of (command, server_id, region), caller_class)
+                -> list of bool
+            max_workers (int): Number of worker threads
+            max_queue_per_server (int): Maximum pending commands per server
+            history_size (int): Number of finished tickets kept for status lookups
+            batch_window (float): Seconds to wait for more commands before sending a batch
+            batch_max (int): Maximum commands per batch
+        """
+        self.send_func = send_func
+        self.batch_send_func = batch_send_func
+        self.batch_window = Config.COMMAND_BATCH_WINDOW if batch_window is None else batch_window
+        self.batch_max = batch_max or Config.COMMAND_BATCH_MAX
+        self.max_workers = max_workers or Config.COMMAND_DISPATCH_WORKERS
+        self.max_queue_per_server = max_queue_per_server or Config.COMMAND_QUEUE_MAX_PER_SERVER
+        self.history_size = history_size or Config.COMMAND_HISTORY_SIZE
+        
+        self._lock = threading.Lock()
+        self._server_queues = {}
+        self._scheduled = set()
+        self._ready = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._tickets = OrderedDict()
+        self._workers = []
+        self.running = False
+        
+        self.commands_sent = 0
+        self.commands_failed = 0
+        self.commands_rejected = 0
+        self.batches_sent = 0
+    
+    def start(self):
+        """Start the worker pool"""
+        if self.running:
+            return
+        
+        self.running = True
+        for i in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"command-dispatch-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        
+        logger.info(f"📮 Command dispatcher started with {self.max_workers} workers")
+    
+    def stop(self):
+        """Stop the worker pool (pending commands are left unsent)"""
+        if not self.running:
+            return
+        
+        self.running = False
+        for _ in self._workers:
+            self._ready.put((-1, next(self._seq), None))
+        self._workers = []
+        
+        logger.info("🛑 Command dispatcher stopped")
+    
+    def submit(self, command, server_id, region, caller_class='interactive'):
+        """
+        Queue a console command without waiting for it to be sent
+        
+        Args:
+            command (str): Console command
+            server_id: Target server ID
+            region (str): Server region
+            caller_class (str): interactive, koth or bulk
+            
+        Returns:
+            CommandTicket: Ticket with command ID and future (resolves to bool)
+        """
+        ticket = CommandTicket(command, server_id, region, caller_class)
+        is_valid, clean_id = validate_server_id(server_id)
+        key = str(clean_id) if is_valid else str(server_id)
+        
+        with self._lock:
+            self._remember(ticket)
+            
+            server_queue = self._server_queues.setdefault(key, [])
+            if len(server_queue) >= self.max_queue_per_server:
+                self.commands_rejected += 1
+                self._finish(ticket, 'rejected', False, 'Server command queue is full')
+                logger.warning(f"⚠️ Command queue full for server {key}, rejected: {command}")
+                return ticket
+            
+            heapq.heappush(server_queue, (ticket.priority, next(self._seq), ticket))
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._schedule(key)
+        
+        return ticket
+    
+    def _remember(self, ticket):
+        """Store ticket for status lookups, evicting the oldest finished ones"""
+        self._tickets[ticket.command_id] = ticket
+        while len(self._tickets) > self.history_size:
+            oldest_id, oldest = next(iter(self._tickets.items()))
+            if not oldest.is_done():
+                break
+            del self._tickets[oldest_id]
+    
+    def _schedule(self, key):
+        """Put a server on the ready queue at its best pending priority (lock must be held)"""
+        priority = self._server_queues[key][0][0]
+        self._ready.put((priority, next(self._seq), key))
+    
+    def _finish(self, ticket, status, result, error=None):
+        """Resolve a ticket"""
+        ticket.status = status
+        ticket.error = error
+        ticket.finished_at = time.time()
+        if not ticket.future.done():
+            ticket.future.set_result(result)
+    
+    def _worker_loop(self):
+        """Drain ready server queues"""
+        while self.running:
+            _, _, key = self._ready.get()
+            if key is None:
+                break
+            
+            if self.batch_send_func and self.batch_max > 1:
+                keys, tickets = self._collect_batch(key)
+            else:
+                keys = [key]
+                with self._lock:
+                    server_queue = self._server_queues.get(key)
+                    tickets = [heapq.heappop(server_queue)[2]] if server_queue else []
+            
+            if len(tickets) == 1:
+                self._execute(tickets[0])
+            elif tickets:
+                self._execute_batch(tickets)
+            
+            with self._lock:
+                for owned_key in keys:
+                    server_queue = self._server_queues.get(owned_key)
+                    if server_queue:
+                        # Re-queue behind other servers so every server gets a turn
+                        self._schedule(owned_key)
+                    else:
+                        self._server_queues.pop(owned_key, None)
+                        self._scheduled.discard(owned_key)
+    
+    def _collect_batch(self, key):
+        """
+        Collect commands for one batch request
+        
+        Args:
+            key (str): Server key owned by this worker
+            
+        Returns:
+            tuple: (owned server keys, tickets in send order)
+        """
+        with self._lock:
+            pending = len(self._server_queues.get(key, ()))
+        
+        if self.batch_window > 0 and pending < self.batch_max:
+            time.sleep(self.batch_window)
+        
+        keys = [key]
+        tickets = []
+        
+        with self._lock:
+            self._drain_into(key, tickets)
+        
+        # Coalesce other servers that are waiting for a worker
+        while len(tickets) < self.batch_max:
+            try:
+                item = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            
+            other_key = item[2]
+            if other_key is None:
+                # Stop sentinel - hand it back for the next idle worker
+                self._ready.put(item)
+                break
+            
+            keys.append(other_key)
+            with self._lock:
+                self._drain_into(other_key, tickets)
+        
+        return keys, tickets
+    
+    def _drain_into(self, key, tickets):
+        """Move queued tickets for a server into a batch (lock must be held)"""
+        server_queue = self._server_queues.get(key)
+        while server_queue and len(tickets) < self.batch_max:
+            tickets.append(heapq.heappop(server_queue)[2])
+    
+    def _execute(self, ticket):
+        """Send a single command and resolve its ticket"""
+        ticket.status = 'sending'
+        ticket.started_at = time.time()
+        
+        try:
+            success = bool(self.send_func(ticket.command, ticket.server_id, ticket.region, ticket.caller_class))
+            error = None if success else 'Command was not accepted by G-Portal'
+        except Exception as e:
+            logger.error(f"❌ Dispatch error for command {ticket.command_id}: {e}")
+            success = False
+            error = str(e)
+        
+        with self._lock:
+            if success:
+                self.commands_sent += 1
+            else:
+                self.commands_failed += 1
+        
+        self._finish(ticket, 'sent' if success else 'failed', success, error)
+    
+    def _execute_batch(self, tickets):
+        """Send several commands in one request and resolve each ticket"""
+        started_at = time.time()
+        for ticket in tickets:
+            ticket.status = 'sending'
+            ticket.started_at = started_at
+        
+        # The batch is admitted at the priority of its most urgent command
+        caller_class = min(tickets, key=lambda ticket: ticket.priority).caller_class
+        
+        try:
+            results = self.batch_send_func(
+                [(ticket.command, ticket.server_id, ticket.region) for ticket in tickets],
+                caller_class
+            )
+            error = None
+        except Exception as e:
+            logger.error(f"❌ Dispatch error for batch of {len(tickets)} commands: {e}")
+            results = [False] * len(tickets)
+            error = str(e)
+        
+        with self._lock:
+            self.batches_sent += 1
+            for ticket, success in zip(tickets, results):
+                if success:
+                    self.commands_sent += 1
+                else:
+                    self.commands_failed += 1
+        
+        for ticket, success in zip(tickets, results):
+            success = bool(success)
+            if success:
+                self._finish(ticket, 'sent', True)
+            else:
+                self._finish(ticket, 'failed', False, error or 'Command was not accepted by G-Portal')
+    
+    def get_ticket(self, command_id):
+        """
+        Get a ticket by command ID
+        
+        Args:
+            command_id (str): Command ID returned by submit()
+            
+        Returns:
+            CommandTicket or None: Ticket if still in history
+        """
+        with self._lock:
+            return self._tickets.get(command_id)
+    
+    def get_status(self, command_id):
+        """
+        Get status of a queued command
+        
+        Args:
+            command_id (str): Command ID returned by submit()
+            
+        Returns:
+            dict or None: Ticket status data
+        """
+        ticket = self.get_ticket(command_id)
+        return ticket.to_dict() if ticket else None
+    
+    def get_stats(self):
+        """
+        Get dispatcher statistics
+        
+        Returns:
+            dict: Worker, queue depth and outcome counters
+        """
+        with self._lock:
+            queue_depths = {key: len(q) for key, q in self._server_queues.items()}
+            return {
+                "running": self.running,
+                "workers": self.max_workers,
+                "max_queue_per_server": self.max_queue_per_server,
+                "pending_commands": sum(queue_depths.values()),
+                "queue_depths": queue_depths,
+                "commands_sent": self.commands_sent,
+                "commands_failed": self.commands_failed,
+                "commands_rejected": self.commands_rejected,
+                "batching_enabled": bool(self.batch_send_func) and self.batch_max > 1,
+                "batch_window_ms": round(self.batch_window * 1000, 1),
+                "batch_max": self.batch_max,
+                "batches_sent": self.batches_sent,
+                "tracked_tickets": len(self._tickets)
+            }
@@ -0,0 +1,489 @@
+"""
+GUST Bot Enhanced - Console Archive
+==================================
+Append-only, compressed on-disk history of classified console messages
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import shutil
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from config import Config
+from utils.runtime import runtime
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_NAME = re.compile(r'^seg-(\d+)\.jsonl\.gz$')
+_SERVER_ID = re.compile(r'^[A-Za-z0-9-]+$')
+
+def server_key(server_id):
+    """
+    Get the archive directory name of a server
+    
+    Args:
+        server_id: Server ID (test suffixes after '_' are ignored)
+        
+    Returns:
+        str: Plain server ID
+        
+    Raises:
+        ValueError: If the ID is not a plain server ID
+    """
+    key = str(server_id).split('_')[0]
+    if not _SERVER_ID.match(key):
+        raise ValueError(f"Invalid server ID: {str(server_id)[:40]!r}")
+    return key
+
+def _message_time(message):
+    """Get a message's timestamp as epoch seconds"""
+    try:
+        return datetime.fromisoformat(message['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+def _day(timestamp):
+    """Get the archive day directory name of an epoch time"""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+
+class _SegmentWriter:
+    """Open segment of one server and day"""
+    
+    __slots__ = ('day', 'data_path', 'index_path', 'size')
+    
+    def __init__(self, day, data_path, index_path):
+        self.day = day
+        self.data_path = data_path
+        self.index_path = index_path
+        self.size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+
+class ConsoleArchive:
+    """
+    Console history in per-server, per-day segment files
+    
+    Messages are buffered per server and written in blocks: each block is
+    one gzip member appended to the current segment, and one line in the
+    segment's .idx file records its byte range, time range, sequence range
+    and message types. A gzip file of concatenated members is still a
+    valid gzip file, so segments can be read with standard tools. Queries
+    use the sparse index to decompress only the blocks that can match, and
+    stream results, so hours of history are searchable without holding
+    them in memory. Segments roll over by size and by day.
+    
+    append() runs on the WebSocket loop and only adds to a list under the
+    lock; full blocks are compressed and written by one drain task on the
+    I/O executor, in the order they filled up.
+    """
+    
+    def __init__(self, base_dir=None, block_size=None, segment_size=None):
+        """
+        Initialize console archive
+        
+        Args:
+            base_dir (str): Archive root directory
+            block_size (int): Messages per compressed block
+            segment_size (int): Compressed bytes before rolling a segment
+        """
+        self.base_dir = base_dir or Config.CONSOLE_ARCHIVE_DIR
+        self.block_size = block_size or Config.CONSOLE_ARCHIVE_BLOCK_SIZE
+        self.segment_size = segment_size or Config.CONSOLE_ARCHIVE_SEGMENT_SIZE
+        self._lock = threading.Lock()  # pending records, write queue, index cache
+        self._io_lock = threading.Lock()  # segment files and writers
+        self._pending = {}
+        self._queue = deque()
+        self._draining = False
+        self._writers = {}
+        self._index_cache = {}
+        
+        self.archived = 0
+        self.blocks_written = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+    
+    # Writing
+    
+    def append(self, message):
+        """
+        Add a classified message to the archive
+        
+        Args:
+            message: Console message (dict or ConsoleMessage) with 'server_id' and 'timestamp'
+        """
+        try:
+            server_id = server_key(message.get('server_id', 'unknown'))
+        except ValueError as e:
+            self.write_errors += 1
+            logger.error(f"❌ Console message not archived: {e}")
+            return
+        
+        record = (_message_time(message), message.get('seq', 0), message.get('type'),
+                  json.dumps(dict(message), separators=(',', ':')))
+        
+        with self._lock:
+            pending = self._pending.get(server_id)
+            if pending is None:
+                pending = self._pending[server_id] = []
+            pending.append(record)
+            self.archived += 1
+            if len(pending) < self.block_size:
+                return
+            self._pending[server_id] = []
+            self._queue.append((server_id, pending))
+            if self._draining:
+                return
+            self._draining = True
+        
+        runtime.submit(runtime.run_blocking(self._drain))
+    
+    def _drain(self):
+        """Write queued blocks until the queue is empty (I/O executor)"""
+        while self._write_next(task=True):
+            pass
+    
+    def _write_next(self, task=False):
+        """
+        Write the oldest queued block
+        
+        Taken and written under the I/O lock, so blocks reach disk in
+        queue order whichever thread writes them.
+        
+        Args:
+            task (bool): Called by the drain task (clears its flag when done)
+            
+        Returns:
+            bool: False if the queue was empty
+        """
+        with self._io_lock:
+            with self._lock:
+                if not self._queue:
+                    if task:
+                        self._draining = False
+                    return False
+                server_id, records = self._queue.popleft()
+            self._write_records(server_id, records)
+            return True
+    
+    def _write_records(self, server_id, records):
+        """Write records as one block per day they span (I/O lock held)"""
+        start = 0
+        day = _day(records[0][0])
+        for index in range(1, len(records) + 1):
+            next_day = _day(records[index][0]) if index < len(records) else None
+            if next_day != day:
+                try:
+                    writer = self._writer_for(server_id, day)
+                except OSError as e:
+                    self.write_errors += 1
+                    logger.error(f"❌ Console archive unavailable for server {server_id}: {e}")
+                else:
+                    self._write_block(writer, records[start:index])
+                start, day = index, next_day
+    
+    def _writer_for(self, server_id, day):
+        """Get the open segment for a server, rolling it by day and size (I/O lock held)"""
+        writer = self._writers.get(server_id)
+        if writer is not None and writer.day == day and writer.size < self.segment_size:
+            return writer
+        
+        day_dir = os.path.join(self.base_dir, server_id, day)
+        os.makedirs(day_dir, exist_ok=True)
+        
+        # Always start a new segment so a torn tail from a crash is never extended
+        numbers = [int(match.group(1)) for match in map(_SEGMENT_NAME.match, os.listdir(day_dir)) if match]
+        name = f"seg-{max(numbers, default=0) + 1:05d}"
+        writer = _SegmentWriter(day,
+                                os.path.join(day_dir, name + '.jsonl.gz'),
+                                os.path.join(day_dir, name + '.idx'))
+        self._writers[server_id] = writer
+        return writer
+    
+    def _write_block(self, writer, records):
+        """Compress records into one block and index it (I/O lock held)"""
+        payload = ''.join(record[3] + '\n' for record in records).encode('utf-8')
+        block = gzip.compress(payload, compresslevel=6)
+        
+        entry = {
+            "offset": writer.size,
+            "length": len(block),
+            "count": len(records),
+            "t0": min(record[0] for record in records),
+            "t1": max(record[0] for record in records),
+            "s0": min(record[1] for record in records),
+            "s1": max(record[1] for record in records),
+            "types": sorted({record[2] for record in records if record[2]})
+        }
+        
+        try:
+            # Data first: a block without an index line is simply never read
+            with open(writer.data_path, 'ab') as f:
+                f.write(block)
+            with open(writer.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        except OSError as e:
+            self.write_errors += 1
+            logger.error(f"❌ Console archive write failed for {writer.data_path}: {e}")
+            return
+        
+        writer.size += len(block)
+        self.blocks_written += 1
+        self.bytes_written += len(block)
+    
+    def flush(self):
+        """Write every queued and partially filled block to disk (blocking)"""
+        with self._lock:
+            for server_id, pending in self._pending.items():
+                if pending:
+                    self._queue.append((server_id, pending))
+            self._pending = {}
+        
+        while self._write_next():
+            pass
+    
+    def prune(self, retention_days=None):
+        """
+        Delete day directories older than the retention period
+        
+        Args:
+            retention_days (int): Days of history to keep
+            
+        Returns:
+            int: Number of day directories removed
+        """
+        retention_days = retention_days or Config.CONSOLE_ARCHIVE_RETENTION_DAYS
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        removed = 0
+        
+        for server_id in self._list_dir(self.base_dir):
+            server_dir = os.path.join(self.base_dir, server_id)
+            for day in self._list_dir(server_dir):
+                if day < cutoff:
+                    shutil.rmtree(os.path.join(server_dir, day), ignore_errors=True)
+                    removed += 1
+        
+        if removed:
+            with self._lock:
+                self._index_cache.clear()
+            logger.info(f"🧹 Pruned {removed} console archive day(s) older than {cutoff}")
+        return removed
+    
+    # Reading
+    
+    def last_seq(self):
+        """
+        Get the highest sequence number on disk
+        
+        The message sequence restarts with the process, so it is seeded
+        from this at startup; seq then keeps increasing across restarts
+        and afterSeq cursors and query de-duplication stay valid.
+        
+        Returns:
+            int: Highest archived sequence number, 0 if none
+        """
+        highest = 0
+        for _, _, index_path in self.segments():
+            for entry in self._load_index(index_path):
+                highest = max(highest, entry.get('s1', 0))
+        return highest
+    
+    @staticmethod
+    def _list_dir(path):
+        """List a directory, empty if missing"""
+        try:
+            return sorted(os.listdir(path))
+        except OSError:
+            return []
+    
+    def _load_index(self, index_path):
+        """Read a segment's sparse index, cached until the file grows"""
+        try:
+            size = os.path.getsize(index_path)
+        except OSError:
+            return []
+        
+        with self._lock:
+            cached = self._index_cache.get(index_path)
+        if cached and cached[0] == size:
+            return cached[1]
+        
+        entries = []
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        
+        with self._lock:
+            self._index_cache[index_path] = (size, entries)
+        return entries
+    
+    def segments(self, server_id=None, start=None, end=None):
+        """
+        List archive segments, oldest first per server
+        
+        Args:
+            server_id: Server ID, None for all servers
+            start (float): Skip days before this epoch time
+            end (float): Skip days after this epoch time
+            
+        Yields:
+            tuple: (server ID, data path, index path)
+            
+        Raises:
+            ValueError: If server_id is not a plain server ID
+        """
+        servers = [server_key(server_id)] if server_id else self._list_dir(self.base_dir)
+        first_day = datetime.fromtimestamp(start).strftime('%Y-%m-%d') if start else None
+        last_day = datetime.fromtimestamp(end).strftime('%Y-%m-%d') if end else None
+        
+        for server in servers:
+            server_dir = os.path.join(self.base_dir, server)
+            for day in self._list_dir(server_dir):
+                if (first_day and day < first_day) or (last_day and day > last_day):
+                    continue
+                day_dir = os.path.join(server_dir, day)
+                names = sorted(name for name in self._list_dir(day_dir) if _SEGMENT_NAME.match(name))
+                for name in names:
+                    base = name[:-len('.jsonl.gz')]
+                    yield server, os.path.join(day_dir, name), os.path.join(day_dir, base + '.idx')
+    
+    def blocks(self, index_path):
+        """
+        Get the sparse index entries of a segment
+        
+        Args:
+            index_path (str): Segment .idx path
+            
+        Returns:
+            list: Block entries (offset, length, count, t0, t1, s0, s1, types)
+        """
+        return self._load_index(index_path)
+    
+    @staticmethod
+    def read_block(data_path, offset, length):
+        """
+        Decompress one block of a segment
+        
+        Args:
+            data_path (str): Segment data path
+            offset (int): Block byte offset
+            length (int): Block byte length
+            
+        Returns:
+            list: JSON lines of the block
+        """
+        with open(data_path, 'rb') as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length)).decode('utf-8').splitlines()
+    
+    def query(self, server_id=None, start=None, end=None, message_type=None, contains=None, after_seq=None):
+        """
+        Stream archived messages matching the filters, oldest first per server
+        
+        Args:
+            server_id: Server ID, None for all servers
+            start (float): Epoch seconds, inclusive
+            end (float): Epoch seconds, inclusive
+            message_type (str): Message type
+            contains (str): Case-insensitive substring of the message text
+            after_seq (int): Only messages with a higher sequence number
+            
+        Yields:
+            dict: Archived messages
+        """
+        # Messages not written yet are read from memory afterwards. The
+        # snapshot is taken first (no block is mid-write under the I/O
+        # lock), and copies that reached disk meanwhile are skipped by seq
+        servers = [server_key(server_id)] if server_id else None
+        with self._io_lock:
+            with self._lock:
+                unwritten = [
+                    (server, list(records))
+                    for server, records in list(self._queue) + list(self._pending.items())
+                    if records and (servers is None or server in servers)
+                ]
+        
+        needle = contains.lower() if contains else None
+        
+        def matches(message):
+            if message_type and message.get('type') != message_type:
+                return False
+            if needle and needle not in str(message.get('message', '')).lower():
+                return False
+            if after_seq is not None and message.get('seq', 0) <= after_seq:
+                return False
+            if start is not None or end is not None:
+                timestamp = _message_time(message)
+                if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                    return False
+            return True
+        
+        last_seq = {}
+        for server, data_path, index_path in self.segments(server_id, start, end):
+            entries = self._load_index(index_path)
+            if entries:
+                last_seq[server] = max(last_seq.get(server, 0), max(entry['s1'] for entry in entries))
+            
+            blocks = [
+                entry for entry in entries
+                if (start is None or entry['t1'] >= start)
+                and (end is None or entry['t0'] <= end)
+                and (after_seq is None or entry['s1'] > after_seq)
+                and (not message_type or message_type in entry['types'])
+            ]
+            if not blocks:
+                continue
+            
+            with open(data_path, 'rb') as f:
+                for entry in blocks:
+                    f.seek(entry['offset'])
+                    lines = gzip.decompress(f.read(entry['length'])).decode('utf-8').splitlines()
+                    
+                    for line in lines:
+                        if needle and needle not in line.lower():
+                            continue
+                        message = json.loads(line)
+                        if matches(message):
+                            yield message
+        
+        for server, records in unwritten:
+            for _, seq, _, line in records:
+                if seq and seq <= last_seq.get(server, 0):
+                    continue
+                if needle and needle not in line.lower():
+                    continue
+                message = json.loads(line)
+                if matches(message):
+                    yield message
+    
+    def get_stats(self):
+        """
+        Get archive statistics
+        
+        Returns:
+            dict: Write counters and open segments
+        """
+        with self._lock:
+            pending = sum(len(records) for records in self._pending.values())
+            queued = sum(len(records) for _, records in self._queue)
+            open_segments = {server: writer.data_path for server, writer in self._writers.items()}
+        
+        return {
+            "enabled": Config.CONSOLE_ARCHIVE_ENABLED,
+            "base_dir": self.base_dir,
+            "archived": self.archived,
+            "pending": pending,
+            "queued": queued,
+            "blocks_written": self.blocks_written,
+            "bytes_written": self.bytes_written,
+            "write_errors": self.write_errors,
+            "open_segments": open_segments
+        }
+
+console_archive = ConsoleArchive()
@@ -0,0 +1,327 @@
+"""
+GUST Bot Enhanced - Console Events
+=================================
+Typed event records extracted from live console messages
+"""
+
+import logging
+import threading
+from collections import deque
+from collections.abc import Mapping
+
+from config import Config
+from utils.console_rules import console_rules
+
+logger = logging.getLogger(__name__)
+
+class ConsoleEvent:
+    """
+    Base for typed console events
+    
+    Records use __slots__, so each one holds only its own fields instead
+    of a per-instance dict, and subscribers read attributes rather than
+    re-parsing the console line.
+    """
+    
+    __slots__ = ('seq', 'server_id', 'timestamp')
+    
+    kind = None
+    fields = ()
+    
+    def __init__(self, seq, server_id, timestamp, **fields):
+        """
+        Initialize event record
+        
+        Args:
+            seq (int): Sequence number of the source console message
+            server_id: Server ID the line came from
+            timestamp (str): ISO time the line was received
+            **fields: Event fields (unknown names are ignored)
+        """
+        self.seq = seq
+        self.server_id = server_id
+        self.timestamp = timestamp
+        for name in self.fields:
+            setattr(self, name, fields.get(name))
+    
+    def field_values(self):
+        """
+        Get the event's own fields
+        
+        Returns:
+            dict: Field name -> value
+        """
+        return {name: getattr(self, name) for name in self.fields}
+    
+    def to_dict(self):
+        """
+        Convert the event to a JSON-serializable dict
+        
+        Returns:
+            dict: Event data
+        """
+        data = {'kind': self.kind, 'seq': self.seq, 'server_id': self.server_id, 'timestamp': self.timestamp}
+        data.update(self.field_values())
+        return data
+    
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}(server_id={self.server_id!r}, {values})"
+
+class KillEvent(ConsoleEvent):
+    """A player was killed (killer is None for environmental deaths)"""
+    
+    __slots__ = ('victim', 'victim_id', 'killer', 'killer_id', 'cause')
+    
+    kind = 'kill'
+    fields = __slots__
+
+class JoinEvent(ConsoleEvent):
+    """A player joined the server"""
+    
+    __slots__ = ('player', 'player_id', 'steam_id')
+    
+    kind = 'join'
+    fields = __slots__
+
+class LeaveEvent(ConsoleEvent):
+    """A player left the server"""
+    
+    __slots__ = ('player', 'steam_id', 'address', 'reason')
+    
+    kind = 'leave'
+    fields = __slots__
+
+class ChatEvent(ConsoleEvent):
+    """A player chat line"""
+    
+    __slots__ = ('player', 'player_id', 'text')
+    
+    kind = 'chat'
+    fields = __slots__
+
+class SaveEvent(ConsoleEvent):
+    """The server saved the world"""
+    
+    __slots__ = ()
+    
+    kind = 'save'
+    fields = ()
+
+EVENT_TYPES = {event_class.kind: event_class for event_class in (KillEvent, JoinEvent, LeaveEvent, ChatEvent, SaveEvent)}
+
+class ConsoleMessage(Mapping):
+    """
+    Compact record of one classified live console line
+    
+    The live buffers and consumer queues hold these instead of dicts: a
+    slotted record is a fraction of the size of an eleven-key dict, and
+    the fields the rule captured are kept only on the typed event (the
+    same object the event bus history holds), not in a second dict per
+    message. The record reads like the dict it replaces (get, [], in,
+    iteration), so dict(message) gives the JSON form used by the API,
+    the archive and the SSE stream.
+    """
+    
+    __slots__ = ('timestamp', 'server_id', 'region', 'message', 'stream', 'channel',
+                 'type', 'rule', 'source', 'seq', 'event')
+    
+    KEYS = ('timestamp', 'server_id', 'region', 'message', 'stream', 'channel',
+            'type', 'rule', 'fields', 'source', 'seq')
+    
+    def __init__(self, timestamp, server_id, region, message, stream, channel,
+                 message_type, rule=None, source='websocket_live', event=None):
+        """
+        Initialize console message record
+        
+        Args:
+            timestamp (str): ISO time the line was received
+            server_id: Server ID the line came from
+            region (str): Server region
+            message (str): Console line
+            stream (str): G-Portal stream name
+            channel (str): G-Portal channel name
+            message_type (str): Classified type
+            rule (str): Name of the rule that matched
+            source (str): Message source
+            event (ConsoleEvent): Typed event extracted from the line
+        """
+        self.timestamp = timestamp
+        self.server_id = server_id
+        self.region = region
+        self.message = message
+        self.stream = stream
+        self.channel = channel
+        self.type = message_type
+        self.rule = rule
+        self.source = source
+        self.event = event
+    
+    def __getitem__(self, key):
+        if key == 'fields':
+            return self.event.field_values() if self.event is not None else {}
+        if key == 'event' or key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def __setitem__(self, key, value):
+        if key == 'event' or key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+        # Stamping the message stamps its event
+        if key == 'seq' and self.event is not None:
+            self.event.seq = value
+    
+    def __iter__(self):
+        for key in self.KEYS:
+            if key != 'seq' or hasattr(self, 'seq'):
+                yield key
+    
+    def __len__(self):
+        return len(self.KEYS) - (not hasattr(self, 'seq'))
+    
+    def __repr__(self):
+        return f"ConsoleMessage(seq={getattr(self, 'seq', None)!r}, type={self.type!r}, message={self.message[:60]!r})"
+
+class ConsoleEventBus:
+    """
+    Extracts typed events from live console messages and fans them out
+    
+    The console rule that classified a message names the event it
+    produces ("event": "kill" in the rules file), so extraction reuses the
+    fields the rules pass already captured. Subscribers (KOTH, player
+    stats) register for the event kinds they care about and are called
+    synchronously on the WebSocket loop, so they must not block.
+    """
+    
+    def __init__(self, history_size=None):
+        """
+        Initialize event bus
+        
+        Args:
+            history_size (int): Number of recent events kept for the API
+        """
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=history_size or Config.CONSOLE_EVENT_HISTORY)
+        self.counts = {kind: 0 for kind in EVENT_TYPES}
+        self.subscriber_errors = 0
+    
+    def subscribe(self, callback, kinds=None):
+        """
+        Register an event subscriber
+        
+        Args:
+            callback (callable): Called with each matching ConsoleEvent
+            kinds (iterable): Event kinds to receive, None for all
+            
+        Returns:
+            callable: The callback (pass it to unsubscribe)
+        """
+        kinds = frozenset(kinds) if kinds else None
+        with self._lock:
+            self._subscribers = self._subscribers + [(callback, kinds)]
+        return callback
+    
+    def unsubscribe(self, callback):
+        """
+        Remove an event subscriber
+        
+        Args:
+            callback (callable): Callback passed to subscribe
+        """
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] != callback]
+    
+    def extract(self, match, server_id, timestamp):
+        """
+        Build the typed event for a classified console line
+        
+        Args:
+            match (ConsoleMatch): Result of console_rules.match()
+            server_id: Server ID the line came from
+            timestamp (str): ISO time the line was received
+            
+        Returns:
+            ConsoleEvent or None: Event (seq is set when the message is
+                buffered), None if the rule produces none
+        """
+        rule = console_rules.get_rule(match.rule)
+        event_class = EVENT_TYPES.get(rule.event) if rule and rule.event else None
+        return event_class(None, server_id, timestamp, **match.fields) if event_class else None
+    
+    def publish(self, event):
+        """
+        Deliver an event to every subscriber for its kind
+        
+        Args:
+            event (ConsoleEvent): Event to deliver
+        """
+        self.counts[event.kind] = self.counts.get(event.kind, 0) + 1
+        self.recent.append(event)
+        
+        for callback, kinds in self._subscribers:
+            if kinds is not None and event.kind not in kinds:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                self.subscriber_errors += 1
+                logger.error(f"❌ Console event subscriber error for {event.kind}: {e}")
+    
+    def process(self, message):
+        """
+        Publish the event extracted from a console message, if any
+        
+        Args:
+            message: ConsoleMessage (other messages carry no event)
+            
+        Returns:
+            ConsoleEvent or None: Published event
+        """
+        event = message.event if isinstance(message, ConsoleMessage) else None
+        if event is not None:
+            self.publish(event)
+        return event
+    
+    def get_recent(self, limit=50, kind=None, server_id=None):
+        """
+        Get recent events, newest first
+        
+        Args:
+            limit (int): Maximum number of events
+            kind (str): Filter by event kind, None for all
+            server_id: Filter by server ID, None for all
+            
+        Returns:
+            list: Event dicts
+        """
+        events = []
+        for event in reversed(list(self.recent)):
+            if kind and event.kind != kind:
+                continue
+            if server_id and str(event.server_id) != str(server_id):
+                continue
+            events.append(event.to_dict())
+            if len(events) >= limit:
+                break
+        return events
+    
+    def get_stats(self):
+        """
+        Get event bus statistics
+        
+        Returns:
+            dict: Event counts by kind and subscriber info
+        """
+        return {
+            "counts": dict(self.counts),
+            "subscribers": len(self._subscribers),
+            "subscriber_errors": self.subscriber_errors,
+            "recent": len(self.recent)
+        }
+
+console_events = ConsoleEventBus()
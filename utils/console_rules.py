@@ -0,0 +1,457 @@
+"""
+GUST Bot Enhanced - Console Rules
+================================
+Data-driven console message classification and field extraction
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+# The regex parser is private; without it regex rules rely on their
+# explicit 'keywords' (rules without any are tried on every line)
+try:
+    import re._parser as sre_parse
+    from re._constants import LITERAL, SUBPATTERN, BRANCH, SRE_FLAG_IGNORECASE as SRE_IGNORECASE
+except ImportError:
+    try:  # Python < 3.11
+        import sre_parse
+        from sre_constants import LITERAL, SUBPATTERN, BRANCH, SRE_FLAG_IGNORECASE as SRE_IGNORECASE
+    except ImportError:
+        sre_parse = None
+
+from config import Config
+from utils.helpers import CONSOLE_MESSAGE_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+ConsoleRule = namedtuple('ConsoleRule', ['name', 'type', 'priority', 'pattern', 'notify', 'event'])
+ConsoleMatch = namedtuple('ConsoleMatch', ['type', 'rule', 'fields'])
+
+MIN_KEYWORD_LENGTH = 2  # shorter literals are too common to narrow anything down
+
+def _required_literals(items, case_sensitive):
+    """
+    Find literals one of which every match of a parsed pattern contains
+    
+    Args:
+        items: Parsed (sub)pattern from sre_parse
+        case_sensitive (bool): Whether the engine matches case-sensitively
+        
+    Returns:
+        list: Alternative literals (the best choice found), or None
+    """
+    best = None
+    
+    def consider(candidate):
+        nonlocal best
+        if candidate and min(map(len, candidate)) >= MIN_KEYWORD_LENGTH:
+            if best is None or min(map(len, candidate)) > min(map(len, best)):
+                best = candidate
+    
+    run = []
+    for op, argument in list(items) + [(None, None)]:
+        if op is LITERAL:
+            run.append(chr(argument))
+            continue
+        consider([''.join(run)])
+        run = []
+        
+        if op is SUBPATTERN:
+            _, add_flags, _, pattern = argument
+            if case_sensitive and add_flags & SRE_IGNORECASE:
+                continue
+            consider(_required_literals(pattern, case_sensitive))
+        elif op is BRANCH:
+            alternatives = []
+            for branch in argument[1]:
+                literals = _required_literals(branch, case_sensitive)
+                if literals is None:
+                    alternatives = None
+                    break
+                alternatives.extend(literals)
+            consider(alternatives)
+    
+    return best
+
+def rule_keywords(definition, pattern, flags):
+    """
+    Get the literals that must occur in a line for a rule to match
+    
+    'contains' rules use their patterns; 'regex' rules use their
+    'keywords' if given, otherwise a literal derived from the regex
+    (e.g. " was killed by ") when the private regex parser is usable.
+    Used only as a prefilter, so a rule without keywords is simply
+    tried on every line.
+    
+    Args:
+        definition (dict): Rule definition
+        pattern (str): Rule regex
+        flags (int): Regex flags of the rule set
+        
+    Returns:
+        list: Keywords, or None if every line is a candidate
+    """
+    case_sensitive = not flags & re.IGNORECASE
+    if definition.get('keywords'):
+        keywords = list(definition['keywords'])
+    elif definition.get('contains'):
+        keywords = list(definition['contains'])
+    elif sre_parse is None:
+        return None
+    else:
+        try:
+            parsed = sre_parse.parse(pattern, flags)
+            if case_sensitive and parsed.state.flags & SRE_IGNORECASE:
+                return None
+            keywords = _required_literals(parsed, case_sensitive)
+        except Exception:  # re.error, or parser internals that changed shape
+            return None
+    
+    if not keywords or not all(keywords):
+        return None
+    return keywords if case_sensitive else [keyword.lower() for keyword in keywords]
+
+_CompiledRules = namedtuple('_CompiledRules', ['searches', 'prefilter', 'candidates', 'always', 'lower'])
+
+# Typed-event rules, ahead of the keyword types that would otherwise claim
+# these lines (e.g. "auth" for a player named VIPanda). Mirrored in the
+# rules file; kept here so KOTH and stats still get kill, join and leave
+# events when that file is missing
+STRUCTURED_RULES = [
+    {
+        "name": "chat_line",
+        "type": "chat",
+        "priority": 15,
+        "event": "chat",
+        "keywords": ["[chat]"],
+        "regex": r"\[chat\]\s*(?P<player>[^\[\]:]+?)\s*(?:\[(?P<player_id>\d+)\])?\s*:\s*(?P<text>.*)"
+    },
+    {
+        "name": "player_killed",
+        "type": "kill",
+        "priority": 16,
+        "event": "kill",
+        "keywords": [" was killed by "],
+        "regex": r"(?P<victim>[^\[\]]{1,32}?)\[(?P<victim_id>\d+)\] was killed by "
+                 r"(?P<killer>[^\[\]]{1,32}?)\[(?P<killer_id>\d+)\]"
+    },
+    {
+        "name": "player_died",
+        "type": "kill",
+        "priority": 17,
+        "event": "kill",
+        "keywords": [" died ("],
+        "regex": r"(?P<victim>[^\[\]]{1,32}?)\[(?P<victim_id>\d+)\] died \((?P<cause>[^)]+)\)"
+    },
+    {
+        "name": "player_joined",
+        "type": "player",
+        "priority": 18,
+        "event": "join",
+        "keywords": ["] joined"],
+        "regex": r"(?P<player>[^\[\]]{1,32}?)\[(?P<player_id>\d+)(?:/(?P<steam_id>\d+))?\] joined"
+    },
+    {
+        "name": "player_disconnected",
+        "type": "player",
+        "priority": 19,
+        "event": "leave",
+        "keywords": [" disconnecting: "],
+        "regex": r"(?P<address>\d{1,3}(?:\.\d{1,3}){3}:\d{1,5})/(?P<steam_id>\d+)/"
+                 r"(?P<player>.{1,32}?) disconnecting: (?P<reason>.*)"
+    }
+]
+
+def default_rules():
+    """
+    Build the built-in rules: typed-event rules, then the classifier types
+    
+    Returns:
+        list: Rule definitions (same shape as the rules file)
+    """
+    return [dict(rule) for rule in STRUCTURED_RULES] + [
+        {
+            "name": message_type,
+            "type": message_type,
+            "priority": (index + 1) * 10,
+            "contains": patterns,
+            "event": "save" if message_type == "save" else None
+        }
+        for index, (message_type, patterns) in enumerate(CONSOLE_MESSAGE_PATTERNS)
+    ]
+
+class ConsoleRuleEngine:
+    """
+    Console rules loaded from a JSON file and compiled into one matcher
+    
+    Each rule names a message type, a priority and either literal
+    'contains' patterns or a 'regex' whose named groups become extracted
+    fields (player, killer, victim...), and may name the typed console
+    event it produces. Every rule has literal keywords that a matching
+    line must contain, so one scan of the line with a combined keyword
+    regex picks the candidate rules, and only those run their own
+    precompiled search, in priority order. Matching stays linear in the
+    line length however many rules there are. The file is re-read when
+    it changes, and per-rule match counts show which rules are hot.
+    """
+    
+    def __init__(self, rules_file=None, reload_interval=None, cache_size=None):
+        """
+        Initialize rule engine
+        
+        Args:
+            rules_file (str): Path to the JSON rules file
+            reload_interval (float): Seconds between file change checks
+            cache_size (int): Number of recent lines to cache
+        """
+        self.rules_file = rules_file or Config.CONSOLE_RULES_FILE
+        self.reload_interval = reload_interval if reload_interval is not None else Config.CONSOLE_RULES_RELOAD_INTERVAL
+        self.cache_size = cache_size or Config.CONSOLE_CLASSIFIER_CACHE_SIZE
+        self.default_type = "system"
+        
+        self._lock = threading.Lock()
+        self._state = None
+        self._signature = None
+        self._last_check = 0.0
+        
+        self.match_counts = {}
+        self.unmatched = 0
+        self.reloads = 0
+        self.last_error = None
+        self.loaded_at = None
+        self.source = None
+        
+        self.reload()
+    
+    def _file_signature(self):
+        """Get (mtime, size) of the rules file, None if missing"""
+        try:
+            stat = os.stat(self.rules_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def _read_rules(self):
+        """
+        Read rule definitions from the rules file
+        
+        Returns:
+            tuple: (rules list, case_sensitive flag, source description)
+        """
+        if self._signature is None:
+            return default_rules(), False, "built-in"
+        
+        with open(self.rules_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        if isinstance(data, list):
+            return data, False, self.rules_file
+        return data.get('rules', []), bool(data.get('case_sensitive', False)), self.rules_file
+    
+    def _compile(self, definitions, case_sensitive):
+        """
+        Compile rule definitions into the shared matcher
+        
+        Args:
+            definitions (list): Rule definitions
+            case_sensitive (bool): Match case-sensitively
+            
+        Returns:
+            tuple: (compiled matcher, rules in priority order)
+        """
+        flags = re.DOTALL | (0 if case_sensitive else re.IGNORECASE)
+        rules = []
+        searches = []
+        keyword_rules = {}
+        always = []
+        
+        ordered = sorted(enumerate(definitions), key=lambda item: (item[1].get('priority', 100), item[0]))
+        for index, (_, definition) in enumerate(ordered):
+            name = definition.get('name') or f"rule_{index}"
+            if definition.get('regex'):
+                pattern = definition['regex']
+            elif definition.get('contains'):
+                pattern = '|'.join(re.escape(text) for text in definition['contains'])
+            else:
+                raise ValueError(f"Rule '{name}' needs 'regex' or 'contains'")
+            
+            try:
+                searches.append(re.compile(pattern, flags).search)
+            except re.error as e:
+                raise ValueError(f"Rule '{name}' has an invalid regex: {e}")
+            
+            keywords = rule_keywords(definition, pattern, flags)
+            if keywords is None:
+                always.append(index)
+            else:
+                for keyword in keywords:
+                    keyword_rules.setdefault(keyword, set()).add(index)
+            
+            rules.append(ConsoleRule(
+                name=name,
+                type=definition.get('type', self.default_type),
+                priority=definition.get('priority', 100),
+                pattern=definition.get('regex') or definition.get('contains'),
+                notify=definition.get('notify'),
+                event=definition.get('event')
+            ))
+        
+        # A keyword found inside a longer one is not reported separately by
+        # the scan, so each keyword also selects the rules of its substrings
+        candidates = {
+            keyword: frozenset().union(*(
+                keyword_rules[other] for other in keyword_rules if other in keyword
+            ))
+            for keyword in keyword_rules
+        }
+        
+        # Zero-width lookahead so overlapping keywords are all reported
+        ordered_keywords = sorted(keyword_rules, key=len, reverse=True)
+        prefilter = re.compile(
+            '(?=(' + '|'.join(re.escape(keyword) for keyword in ordered_keywords) + '))', re.DOTALL
+        ) if ordered_keywords else None
+        
+        matcher = _CompiledRules(searches, prefilter, candidates, frozenset(always), not case_sensitive)
+        return matcher, rules
+    
+    def reload(self):
+        """
+        Load and compile the rules file, keeping the current rules on error
+        
+        Returns:
+            bool: True if the rules were (re)loaded
+        """
+        with self._lock:
+            self._signature = self._file_signature()
+            self._last_check = time.monotonic()
+            
+            try:
+                definitions, case_sensitive, source = self._read_rules()
+                matcher, rules = self._compile(definitions, case_sensitive)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"❌ Console rules not loaded from {self.rules_file}: {e}")
+                if self._state is None:
+                    matcher, rules = self._compile(default_rules(), False)
+                    self._state = (matcher, rules, {rule.name: rule for rule in rules}, self._build_cache(matcher, rules))
+                    self.source = "built-in"
+                return False
+            
+            self._state = (matcher, rules, {rule.name: rule for rule in rules}, self._build_cache(matcher, rules))
+            self.match_counts = {rule.name: self.match_counts.get(rule.name, 0) for rule in rules}
+            self.last_error = None
+            self.loaded_at = time.time()
+            self.source = source
+            self.reloads += 1
+        
+        logger.info(f"📜 Loaded {len(rules)} console rules from {source}")
+        return True
+    
+    def _build_cache(self, matcher, rules):
+        """Build the cached matcher for one compiled rule set"""
+        searches, prefilter, candidates, always, lower = matcher
+        
+        def match(message):
+            selected = set(always)
+            if prefilter is not None:
+                text = message.lower() if lower else message
+                for keyword in prefilter.findall(text):
+                    selected.update(candidates[keyword])
+            
+            for index in sorted(selected):
+                found = searches[index](message)
+                if found:
+                    fields = {key: value.strip() for key, value in found.groupdict().items() if value is not None}
+                    rule = rules[index]
+                    return ConsoleMatch(rule.type, rule.name, fields)
+            return None
+        
+        return lru_cache(maxsize=self.cache_size)(match)
+    
+    def _maybe_reload(self):
+        """Reload the rules if the file changed since the last check"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        
+        self._last_check = now
+        if self._file_signature() != self._signature:
+            self.reload()
+    
+    def match(self, message):
+        """
+        Classify a console message and extract its fields
+        
+        Args:
+            message (str): Console message text
+            
+        Returns:
+            ConsoleMatch: (type, rule name or None, fields dict)
+        """
+        self._maybe_reload()
+        
+        result = self._state[3](message) if message else None
+        if result is None:
+            self.unmatched += 1
+            return ConsoleMatch(self.default_type, None, {})
+        
+        self.match_counts[result.rule] = self.match_counts.get(result.rule, 0) + 1
+        return result
+    
+    def get_rule(self, name):
+        """
+        Get a loaded rule by name
+        
+        Args:
+            name (str): Rule name
+            
+        Returns:
+            ConsoleRule or None: Rule
+        """
+        return self._state[2].get(name) if name else None
+    
+    def get_stats(self):
+        """
+        Get per-rule match statistics
+        
+        Returns:
+            dict: Rules ordered by matches, reload and cache info
+        """
+        _, rules, _, cached = self._state
+        info = cached.cache_info()
+        
+        return {
+            "source": self.source,
+            "rules_file": self.rules_file,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "unmatched": self.unmatched,
+            "rules": sorted(
+                [
+                    {
+                        "name": rule.name,
+                        "type": rule.type,
+                        "priority": rule.priority,
+                        "matches": self.match_counts.get(rule.name, 0)
+                    }
+                    for rule in rules
+                ],
+                key=lambda item: item["matches"],
+                reverse=True
+            ),
+            "cache": {
+                "hits": info.hits,
+                "misses": info.misses,
+                "size": info.currsize,
+                "max_size": info.maxsize
+            }
+        }
+
+console_rules = ConsoleRuleEngine()
@@ -0,0 +1,191 @@
+"""
+GUST Bot Enhanced - Console Stream
+=================================
+Fan-out of live console messages to Server-Sent Events clients
+"""
+
+import json
+import queue
+import logging
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ConsoleStreamSubscriber:
+    """
+    One connected browser with its filters and a bounded message queue
+    
+    When the browser falls behind, the oldest queued message is dropped
+    and counted, so a slow client can never grow memory or hold up the
+    publisher.
+    """
+    
+    def __init__(self, server_ids=None, message_types=None, max_queue=None):
+        """
+        Initialize stream subscriber
+        
+        Args:
+            server_ids (iterable): Server IDs to receive, None for all
+            message_types (iterable): Message types to receive, None for all
+            max_queue (int): Maximum queued messages before dropping
+        """
+        self.server_ids = set(str(sid) for sid in server_ids) if server_ids else None
+        self.message_types = set(message_types) if message_types else None
+        self.queue = queue.Queue(maxsize=max_queue or Config.CONSOLE_STREAM_QUEUE_SIZE)
+        self.delivered = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+    
+    def matches(self, message):
+        """
+        Check a message against this subscriber's filters
+        
+        Args:
+            message (dict): Console message
+            
+        Returns:
+            bool: True if the subscriber wants the message
+        """
+        if self.server_ids is not None and str(message.get("server_id")) not in self.server_ids:
+            return False
+        if self.message_types is not None and message.get("type") not in self.message_types:
+            return False
+        return True
+    
+    def offer(self, payload):
+        """
+        Queue a serialized message, dropping the oldest one if full
+        
+        Args:
+            payload (str): JSON-encoded message
+        """
+        while True:
+            try:
+                self.queue.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    self._unreported_drops += 1
+                except queue.Empty:
+                    pass
+    
+    def next_payload(self, timeout):
+        """
+        Wait for the next message
+        
+        Args:
+            timeout (float): Seconds to wait
+            
+        Returns:
+            str or None: JSON-encoded message, None on timeout
+        """
+        try:
+            payload = self.queue.get(timeout=timeout)
+            self.delivered += 1
+            return payload
+        except queue.Empty:
+            return None
+    
+    def take_drops(self):
+        """
+        Get and reset the number of drops not yet reported to the client
+        
+        Returns:
+            int: Messages dropped since the last call
+        """
+        drops, self._unreported_drops = self._unreported_drops, 0
+        return drops
+
+class ConsoleStreamBroadcaster:
+    """
+    Pushes each live console message once to every matching subscriber
+    
+    Messages are serialized a single time per publish and handed to the
+    per-client queues, so browsers no longer have to poll and re-sort the
+    server buffers to see new output.
+    """
+    
+    def __init__(self, max_clients=None):
+        """
+        Initialize broadcaster
+        
+        Args:
+            max_clients (int): Maximum concurrent stream clients
+        """
+        self.max_clients = max_clients or Config.CONSOLE_STREAM_MAX_CLIENTS
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+    
+    def subscribe(self, server_ids=None, message_types=None):
+        """
+        Register a new stream client
+        
+        Args:
+            server_ids (iterable): Server IDs to receive, None for all
+            message_types (iterable): Message types to receive, None for all
+            
+        Returns:
+            ConsoleStreamSubscriber or None: Subscriber, None if at capacity
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscriber = ConsoleStreamSubscriber(server_ids, message_types)
+            self._subscribers.add(subscriber)
+        
+        logger.info(f"📺 Console stream client connected ({len(self._subscribers)} active)")
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        """
+        Remove a stream client
+        
+        Args:
+            subscriber (ConsoleStreamSubscriber): Subscriber to remove
+        """
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        
+        logger.info(f"📺 Console stream client disconnected ({len(self._subscribers)} active)")
+    
+    def publish(self, message):
+        """
+        Deliver a message to every subscriber whose filters match
+        
+        Args:
+            message: Classified console message (dict or ConsoleMessage)
+        """
+        with self._lock:
+            subscribers = [sub for sub in self._subscribers if sub.matches(message)]
+        self.published += 1
+        
+        if not subscribers:
+            return
+        
+        payload = json.dumps(dict(message))
+        for subscriber in subscribers:
+            subscriber.offer(payload)
+    
+    def get_stats(self):
+        """
+        Get broadcaster statistics
+        
+        Returns:
+            dict: Client count, queue depths and delivery counters
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        
+        return {
+            "clients": len(subscribers),
+            "max_clients": self.max_clients,
+            "published": self.published,
+            "delivered": sum(sub.delivered for sub in subscribers),
+            "dropped": sum(sub.dropped for sub in subscribers),
+            "queue_depths": [sub.queue.qsize() for sub in subscribers]
+        }
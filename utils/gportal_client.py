@@ -0,0 +1,259 @@
+"""
+GUST Bot Enhanced - G-Portal GraphQL Client
+==========================================
+Shared, connection-pooled HTTP client for G-Portal GraphQL traffic
+"""
+
+import time
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class GPortalGraphQLClient:
+    """
+    Keep-alive HTTP client for the G-Portal GraphQL endpoint
+    
+    One instance is shared by every caller (console commands, pings,
+    item gives, kicks) so TCP connections and TLS sessions are reused
+    instead of being negotiated again for each command.
+    """
+    
+    def __init__(self, endpoint=None, pool_connections=None, pool_maxsize=None,
+                 max_retries=None, backoff_factor=None, connect_timeout=None, read_timeout=None):
+        """
+        Initialize GraphQL client
+        
+        Args:
+            endpoint (str): GraphQL endpoint URL
+            pool_connections (int): Number of per-host pools to keep
+            pool_maxsize (int): Maximum keep-alive connections per host
+            max_retries (int): Retries for failed connection attempts
+            backoff_factor (float): Backoff factor between retries
+            connect_timeout (float): Connect timeout in seconds
+            read_timeout (float): Read timeout in seconds
+        """
+        self.endpoint = endpoint or Config.GPORTAL_API_ENDPOINT
+        self.pool_connections = pool_connections or Config.GRAPHQL_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or Config.GRAPHQL_POOL_MAXSIZE
+        self.max_retries = Config.GRAPHQL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_factor = Config.GRAPHQL_RETRY_BACKOFF if backoff_factor is None else backoff_factor
+        self.timeout = (
+            connect_timeout or Config.GRAPHQL_CONNECT_TIMEOUT,
+            read_timeout or Config.GRAPHQL_READ_TIMEOUT
+        )
+        
+        # Only connection failures are retried - a mutation that reached the
+        # server must never be replayed, or a giveall could run twice
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=0,
+            backoff_factor=self.backoff_factor,
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        
+        self.adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+            pool_block=False
+        )
+        
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "User-Agent": "GUST-Bot/1.0"
+        })
+        
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.request_errors = 0
+        self.total_request_time = 0.0
+    
+    def post(self, payload, token, timeout=None):
+        """
+        POST a GraphQL payload over a pooled connection
+        
+        Args:
+            payload (dict): GraphQL request body
+            token (str): G-Portal access token
+            timeout: Optional (connect, read) timeout override
+            
+        Returns:
+            requests.Response: Raw HTTP response
+        """
+        headers = {"Authorization": f"Bearer {token}"}
+        start = time.perf_counter()
+        
+        try:
+            response = self.session.post(
+                self.endpoint,
+                json=payload,
+                headers=headers,
+                timeout=timeout or self.timeout
+            )
+        except Exception:
+            with self._stats_lock:
+                self.request_errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.requests_sent += 1
+                self.total_request_time += elapsed
+        
+        return response
+    
+    def build_console_payload(self, messages):
+        """
+        Build a sendConsoleMessage payload for one or more commands
+        
+        Several commands are sent as one document with aliased mutation
+        fields (m0, m1, ...). Mutation fields run serially in document
+        order, so commands for the same server keep their order.
+        
+        Args:
+            messages (list): (server_id, region, command) tuples
+            
+        Returns:
+            dict: GraphQL request body
+        """
+        if len(messages) == 1:
+            server_id, region, command = messages[0]
+            return {
+                "operationName": "sendConsoleMessage",
+                "variables": {
+                    "sid": server_id,
+                    "region": region,
+                    "message": command
+                },
+                "query": """mutation sendConsoleMessage($sid: Int!, $region: REGION!, $message: String!) {
+              sendConsoleMessage(rsid: {id: $sid, region: $region}, message: $message) {
+                ok
+                __typename
+              }
+            }"""
+            }
+        
+        variables = {}
+        definitions = []
+        fields = []
+        
+        for i, (server_id, region, command) in enumerate(messages):
+            variables[f"sid{i}"] = server_id
+            variables[f"region{i}"] = region
+            variables[f"message{i}"] = command
+            definitions.append(f"$sid{i}: Int!, $region{i}: REGION!, $message{i}: String!")
+            fields.append(
+                f"m{i}: sendConsoleMessage(rsid: {{id: $sid{i}, region: $region{i}}}, "
+                f"message: $message{i}) {{ ok __typename }}"
+            )
+        
+        query = (
+            f"mutation sendConsoleMessages({', '.join(definitions)}) {{\n  "
+            + "\n  ".join(fields)
+            + "\n}"
+        )
+        
+        return {
+            "operationName": "sendConsoleMessages",
+            "variables": variables,
+            "query": query
+        }
+    
+    def parse_console_results(self, data, count):
+        """
+        Split sendConsoleMessage results back per command
+        
+        Args:
+            data (dict): Parsed GraphQL response
+            count (int): Number of commands in the request
+            
+        Returns:
+            list: ok flag for each command, in request order
+        """
+        results = (data or {}).get('data') or {}
+        
+        if count == 1:
+            result = results.get('sendConsoleMessage') or {}
+            return [bool(result.get('ok', False))]
+        
+        return [bool((results.get(f"m{i}") or {}).get('ok', False)) for i in range(count)]
+    
+    def get_pool_stats(self):
+        """
+        Get connection pool reuse counters
+        
+        A pool hit is a request served on an already open keep-alive
+        connection, a miss is a request that had to open a new one.
+        
+        Returns:
+            dict: Pool statistics per host and in total
+        """
+        pools = {}
+        total_requests = 0
+        total_connections = 0
+        
+        pool_manager = self.adapter.poolmanager
+        if pool_manager is not None:
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is None:
+                    continue
+                
+                requests_made = getattr(pool, 'num_requests', 0)
+                connections_made = getattr(pool, 'num_connections', 0)
+                total_requests += requests_made
+                total_connections += connections_made
+                
+                pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    "requests": requests_made,
+                    "connections_opened": connections_made,
+                    "idle_connections": pool.pool.qsize() if pool.pool else 0
+                }
+        
+        return {
+            "pool_hits": max(0, total_requests - total_connections),
+            "pool_misses": total_connections,
+            "pools": pools
+        }
+    
+    def get_stats(self):
+        """
+        Get client statistics
+        
+        Returns:
+            dict: Request counters, latency and pool reuse information
+        """
+        with self._stats_lock:
+            requests_sent = self.requests_sent
+            request_errors = self.request_errors
+            total_time = self.total_request_time
+        
+        stats = {
+            "endpoint": self.endpoint,
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "max_retries": self.max_retries,
+            "timeout": list(self.timeout),
+            "requests_sent": requests_sent,
+            "request_errors": request_errors,
+            "average_latency_ms": round(total_time / requests_sent * 1000, 2) if requests_sent else 0.0
+        }
+        stats.update(self.get_pool_stats())
+        return stats
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
@@ -4,15 +4,272 @@ GUST Bot Enhanced - Helper Functions
 Common utility functions used across the application
 """
 
+import re
 import json
 import time
 import os
+import asyncio
 import logging
+import threading
 from datetime import datetime
+from functools import lru_cache
 from config import Config
+from utils.runtime import runtime
 
 logger = logging.getLogger(__name__)
 
+class TokenCache:
+    """
+    Process-wide cache of the G-Portal session file
+    
+    The parsed file is kept in memory and only re-read when its mtime
+    changes. Refreshes are single-flight: while one caller is talking to
+    the auth server, concurrent callers wait for and share its result
+    instead of each POSTing and rewriting the file.
+    """
+    
+    def __init__(self, token_file=None):
+        """
+        Initialize token cache
+        
+        Args:
+            token_file (str): Path to session file (defaults to Config.TOKEN_FILE)
+        """
+        self.token_file = token_file or Config.TOKEN_FILE
+        self._lock = threading.Lock()
+        self._data = None
+        self._signature = None
+        self._inflight = None
+        self._refresher = None
+        
+        self.file_reads = 0
+        self.refresh_requests = 0
+        self.refresh_waiters = 0
+    
+    def _file_signature(self):
+        """Get (mtime, size) of the session file, None if missing"""
+        try:
+            stat = os.stat(self.token_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def get_data(self):
+        """
+        Get parsed session data, re-reading the file only if it changed
+        
+        Returns:
+            dict or None: Session data
+        """
+        signature = self._file_signature()
+        
+        with self._lock:
+            if signature is None:
+                self._data = None
+                self._signature = None
+                return None
+            
+            if signature != self._signature:
+                try:
+                    with open(self.token_file, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                    self._signature = signature
+                    self.file_reads += 1
+                except Exception as e:
+                    logger.error(f"Error loading token: {e}")
+                    self._data = None
+                    self._signature = None
+            
+            return self._data
+    
+    def store(self, data):
+        """
+        Write session data to disk and cache it
+        
+        Args:
+            data (dict): Session data
+        """
+        with open(self.token_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        
+        with self._lock:
+            self._data = data
+            self._signature = self._file_signature()
+    
+    def invalidate(self):
+        """Drop cached data so the next access re-reads the file"""
+        with self._lock:
+            self._data = None
+            self._signature = None
+    
+    def get_token(self):
+        """
+        Get a valid access token, refreshing it if it is about to expire
+        
+        Returns:
+            str: Valid access token or empty string if unavailable
+        """
+        data = self.get_data()
+        if not data:
+            return ''
+        
+        if data.get('access_token_exp', 0) - time.time() > 30:
+            return data.get('access_token', '')
+        
+        # Token expired, try to refresh
+        if self.refresh():
+            data = self.get_data() or {}
+            return data.get('access_token', '')
+        return ''
+    
+    def refresh(self):
+        """
+        Refresh the access token, sharing one in-flight request between callers
+        
+        Returns:
+            bool: True if refresh successful, False otherwise
+        """
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                inflight = self._inflight = {'done': threading.Event(), 'result': False}
+                leader = True
+            else:
+                self.refresh_waiters += 1
+                leader = False
+        
+        if not leader:
+            inflight['done'].wait(timeout=30)
+            return inflight['result']
+        
+        try:
+            inflight['result'] = self._request_refresh()
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight['done'].set()
+        
+        return inflight['result']
+    
+    def _request_refresh(self):
+        """Exchange the refresh token for a new access token"""
+        import requests
+        
+        tokens = self.get_data()
+        if not tokens or 'refresh_token' not in tokens:
+            return False
+        
+        tokens = dict(tokens)
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': tokens['refresh_token'],
+            'client_id': 'website'
+        }
+        
+        try:
+            self.refresh_requests += 1
+            response = requests.post(
+                Config.GPORTAL_AUTH_URL,
+                data=data,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                new_tokens = response.json()
+                current_time = time.time()
+                
+                tokens.update({
+                    'access_token': new_tokens['access_token'],
+                    'refresh_token': new_tokens.get('refresh_token', tokens['refresh_token']),
+                    'access_token_exp': int(current_time + new_tokens.get('expires_in', 300)),
+                    'timestamp': datetime.now().isoformat()
+                })
+                if 'refresh_expires_in' in new_tokens:
+                    tokens['refresh_token_exp'] = int(current_time + new_tokens['refresh_expires_in'])
+                
+                self.store(tokens)
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Refresh error: {e}")
+            return False
+    
+    def start_refresher(self, lead_time=None):
+        """
+        Start the background task that refreshes the token before it expires
+        
+        Args:
+            lead_time (int): Seconds before expiry to refresh
+        """
+        if self._refresher and not self._refresher.done():
+            return
+        
+        lead_time = lead_time or Config.TOKEN_REFRESH_LEAD_TIME
+        self._refresher = runtime.submit(self._refresh_loop(lead_time))
+        logger.info("🔐 Token refresher started")
+    
+    def stop_refresher(self):
+        """Stop the background refresher"""
+        if self._refresher:
+            self._refresher.cancel()
+    
+    def next_refresh_delay(self, lead_time):
+        """
+        Refresh now if the token is close to expiry and get the next check delay
+        
+        Args:
+            lead_time (int): Seconds before expiry to refresh
+            
+        Returns:
+            float: Seconds until the next check
+        """
+        data = self.get_data()
+        if not data or 'refresh_token' not in data:
+            return 30
+        
+        seconds_left = data.get('access_token_exp', 0) - time.time()
+        if seconds_left > lead_time:
+            return min(seconds_left - lead_time, 300)
+        
+        if data.get('refresh_token_exp') and data['refresh_token_exp'] <= time.time():
+            # Refresh token expired too - nothing to do until the next login
+            return 60
+        
+        if self.refresh():
+            logger.info("🔄 G-Portal token refreshed proactively")
+            return 1
+        return 30
+    
+    async def _refresh_loop(self, lead_time):
+        """Refresh the token ahead of expiry until cancelled"""
+        while True:
+            try:
+                delay = await runtime.run_blocking(self.next_refresh_delay, lead_time)
+            except Exception as e:
+                logger.error(f"❌ Token refresher error: {e}")
+                delay = 30
+            await asyncio.sleep(delay)
+    
+    def get_stats(self):
+        """
+        Get token cache statistics
+        
+        Returns:
+            dict: Cache and refresh counters
+        """
+        data = self._data or {}
+        return {
+            "cached": bool(self._data),
+            "token_expires_in": int(data.get('access_token_exp', 0) - time.time()) if data else None,
+            "file_reads": self.file_reads,
+            "refresh_requests": self.refresh_requests,
+            "refresh_waiters": self.refresh_waiters,
+            "refresher_running": bool(self._refresher and not self._refresher.done())
+        }
+
+token_cache = TokenCache()
+
 def load_token():
     """
     Load and refresh G-Portal token if needed
@@ -21,23 +278,7 @@ def load_token():
         str: Valid access token or empty string if unavailable
     """
     try:
-        with open(Config.TOKEN_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            current_time = time.time()
-            token_exp = data.get('access_token_exp', 0)
-            
-            if token_exp - current_time > 30:
-                return data.get('access_token', '')
-            else:
-                # Token expired, try to refresh
-                if refresh_token():
-                    with open(Config.TOKEN_FILE, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        return data.get('access_token', '')
-                return ''
-    except FileNotFoundError:
-        return ''
+        return token_cache.get_token()
     except Exception as e:
         logger.error(f"Error loading token: {e}")
         return ''
@@ -49,50 +290,7 @@ def refresh_token():
     Returns:
         bool: True if refresh successful, False otherwise
     """
-    import requests
-    
-    try:
-        with open(Config.TOKEN_FILE, 'r', encoding='utf-8') as f:
-            tokens = json.load(f)
-    except:
-        return False
-    
-    if 'refresh_token' not in tokens:
-        return False
-    
-    data = {
-        'grant_type': 'refresh_token',
-        'refresh_token': tokens['refresh_token'],
-        'client_id': 'website'
-    }
-    
-    try:
-        response = requests.post(
-            Config.GPORTAL_AUTH_URL,
-            data=data,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            new_tokens = response.json()
-            current_time = time.time()
-            
-            tokens.update({
-                'access_token': new_tokens['access_token'],
-                'refresh_token': new_tokens.get('refresh_token', tokens['refresh_token']),
-                'access_token_exp': int(current_time + new_tokens.get('expires_in', 300)),
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            with open(Config.TOKEN_FILE, 'w', encoding='utf-8') as f:
-                json.dump(tokens, f, indent=2)
-            
-            return True
-        return False
-    except Exception as e:
-        logger.error(f"Refresh error: {e}")
-        return False
+    return token_cache.refresh()
 
 def save_token(tokens, username):
     """
@@ -117,49 +315,168 @@ def save_token(tokens, username):
             'username': username
         }
         
-        with open(Config.TOKEN_FILE, 'w', encoding='utf-8') as f:
-            json.dump(session_data, f, indent=2)
+        token_cache.store(session_data)
         
         return True
     except Exception as e:
         logger.error(f"Error saving token: {e}")
         return False
 
+# Console message types in priority order - the first type with a
+# matching pattern wins
+CONSOLE_MESSAGE_PATTERNS = [
+    ("save", ["[save]", "saving", "saved", "save to", "beginning save"]),
+    ("chat", ["[chat]", "global.say", "player chat", "say "]),
+    ("auth", ["vip", "admin", "moderator", "owner", "auth"]),
+    ("kill", ["[kill]", "killed", "died", "death", "suicide"]),
+    ("error", ["error", "exception", "failed", "fail", "crash"]),
+    ("warning", ["warning", "warn", "alert"]),
+    ("command", ["executing console", "command", "executed"]),
+    ("player", ["player", "connected", "disconnected", "joined", "left"]),
+    ("server", ["server", "startup", "shutdown", "restart"])
+]
+
+class MessageClassifier:
+    """
+    Single-pass console message classifier
+    
+    All patterns are compiled into one alternation, ordered by type
+    priority, and the lowercased message is scanned once. Because regex
+    matches don't overlap, a higher-priority pattern can only be missed
+    when it starts inside another match; the few pattern pairs where that
+    is possible are worked out up front and re-checked explicitly, so the
+    result always equals checking every type in order. Repeated lines
+    (saves, heartbeats) are served from an LRU cache.
+    """
+    
+    def __init__(self, categories=None, cache_size=None, default_type="system"):
+        """
+        Initialize classifier
+        
+        Args:
+            categories (list): (type, patterns) pairs in priority order
+            cache_size (int): Number of recent lines to cache
+            default_type (str): Type for messages matching no pattern
+        """
+        categories = categories or CONSOLE_MESSAGE_PATTERNS
+        self.types = [message_type for message_type, _ in categories]
+        self.default_type = default_type
+        
+        # Lowest priority wins if a pattern is listed under several types
+        self._priority = {}
+        for priority, (_, patterns) in enumerate(categories):
+            for pattern in patterns:
+                self._priority.setdefault(pattern.lower(), priority)
+        
+        # Same-start ties go to the higher-priority (then longer) pattern
+        ordered = sorted(self._priority, key=lambda p: (self._priority[p], -len(p)))
+        self._regex = re.compile('|'.join(re.escape(pattern) for pattern in ordered))
+        
+        # Higher-priority patterns that can start inside a match of each pattern
+        self._shadowed = {}
+        for pattern, priority in self._priority.items():
+            shadowed = tuple(
+                other for other, other_priority in self._priority.items()
+                if other_priority < priority and any(
+                    pattern[offset:].startswith(other) or other.startswith(pattern[offset:])
+                    for offset in range(1, len(pattern))
+                )
+            )
+            if shadowed:
+                self._shadowed[pattern] = shadowed
+        
+        self._classify_cached = lru_cache(maxsize=cache_size or Config.CONSOLE_CLASSIFIER_CACHE_SIZE)(self._classify)
+    
+    def _classify(self, message):
+        """Classify a message without the cache"""
+        message_lower = message.lower()
+        found = self._regex.findall(message_lower)
+        if not found:
+            return self.default_type
+        
+        priority = self._priority
+        best = min(map(priority.__getitem__, found))
+        if best:
+            for match in found:
+                for other in self._shadowed.get(match, ()):
+                    if priority[other] < best and other in message_lower:
+                        best = priority[other]
+        
+        return self.types[best]
+    
+    def classify(self, message):
+        """
+        Classify console message type based on content
+        
+        Args:
+            message (str): Console message text
+            
+        Returns:
+            str: Message type classification
+        """
+        if not message:
+            return self.default_type
+        return self._classify_cached(message)
+    
+    def classify_many(self, messages):
+        """
+        Classify a batch of console messages
+        
+        Args:
+            messages (iterable): Console message texts
+            
+        Returns:
+            list: Message type for each message, in order
+        """
+        classify = self.classify
+        return [classify(message) for message in messages]
+    
+    def cache_info(self):
+        """
+        Get LRU cache statistics
+        
+        Returns:
+            dict: Cache hits, misses and size
+        """
+        info = self._classify_cached.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+
+message_classifier = MessageClassifier()
+
 def classify_message(message):
     """
     Classify console message type based on content
     
+    Delegates to the console rule engine, so the live console, the legacy
+    client and message formatting all give a line the same type.
+    
     Args:
         message (str): Console message text
         
     Returns:
         str: Message type classification
     """
-    if not message:
-        return "system"
-        
-    message_lower = message.lower()
-    
-    if any(pattern in message_lower for pattern in ["[save]", "saving", "saved", "save to", "beginning save"]):
-        return "save"
-    elif any(pattern in message_lower for pattern in ["[chat]", "global.say", "player chat", "say "]):
-        return "chat"
-    elif any(pattern in message_lower for pattern in ["vip", "admin", "moderator", "owner", "auth"]):
-        return "auth"
-    elif any(pattern in message_lower for pattern in ["[kill]", "killed", "died", "death", "suicide"]):
-        return "kill"
-    elif any(pattern in message_lower for pattern in ["error", "exception", "failed", "fail", "crash"]):
-        return "error"
-    elif any(pattern in message_lower for pattern in ["warning", "warn", "alert"]):
-        return "warning"
-    elif any(pattern in message_lower for pattern in ["executing console", "command", "executed"]):
-        return "command"
-    elif any(pattern in message_lower for pattern in ["player", "connected", "disconnected", "joined", "left"]):
-        return "player"
-    elif any(pattern in message_lower for pattern in ["server", "startup", "shutdown", "restart"]):
-        return "server"
-    else:
-        return "system"
+    from utils.console_rules import console_rules  # console_rules imports this module
+    return console_rules.match(message).type
+
+def classify_many(messages):
+    """
+    Classify a batch of console messages
+    
+    Args:
+        messages (iterable): Console message texts
+        
+    Returns:
+        list: Message type for each message, in order
+    """
+    from utils.console_rules import console_rules
+    match = console_rules.match
+    return [match(message).type for message in messages]
 
 def get_type_icon(message_type):
     """
@@ -200,7 +517,7 @@ def format_console_message(message_data):
         "timestamp": message_data.get("timestamp", datetime.now().isoformat()),
         "server_id": message_data.get("server_id", ""),
         "message": message_data.get("message", ""),
-        "type": classify_message(message_data.get("message", "")),
+        "type": message_data.get("type") or classify_message(message_data.get("message", "")),
         "source": message_data.get("source", "unknown"),
         "formatted_time": datetime.fromisoformat(
             message_data.get("timestamp", datetime.now().isoformat()).replace('Z', '+00:00')
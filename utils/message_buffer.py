@@ -0,0 +1,356 @@
+"""
+GUST Bot Enhanced - Console Message Buffers
+==========================================
+Sequenced ring buffers for console messages
+"""
+
+import threading
+from collections import deque
+
+from config import Config
+
+class MessageSequence:
+    """
+    Process-wide, monotonically increasing console message counter
+    
+    Several buffers stamp from the same sequence, so a number can be
+    handed out before a lower one has reached its buffer. Buffers publish
+    each number once the message is appended, and readers that merge
+    buffers only trust messages up to the published watermark - every
+    number at or below it is already readable, so a cursor taken from
+    it never skips a message that was still being appended elsewhere.
+    """
+    
+    def __init__(self):
+        """Initialize message sequence"""
+        self._value = 0
+        self._in_flight = set()
+        self._lock = threading.Lock()
+    
+    def next(self, pending=False):
+        """
+        Allocate the next sequence number
+        
+        Args:
+            pending (bool): Hold the watermark below it until publish()
+            
+        Returns:
+            int: New sequence number
+        """
+        with self._lock:
+            self._value += 1
+            if pending:
+                self._in_flight.add(self._value)
+            return self._value
+    
+    def advance(self, value):
+        """
+        Continue numbering after a value handed out by an earlier run
+        
+        Args:
+            value (int): Highest number already in use
+        """
+        with self._lock:
+            self._value = max(self._value, value)
+    
+    def publish(self, seq):
+        """
+        Mark a pending sequence number as readable
+        
+        Args:
+            seq (int): Number returned by next(pending=True)
+        """
+        with self._lock:
+            self._in_flight.discard(seq)
+    
+    @property
+    def current(self):
+        """Latest sequence number handed out"""
+        return self._value
+    
+    @property
+    def published(self):
+        """Highest sequence number with every number up to it readable"""
+        with self._lock:
+            return min(self._in_flight) - 1 if self._in_flight else self._value
+
+message_sequence = MessageSequence()
+
+class SequencedMessageBuffer(deque):
+    """
+    Bounded console buffer that stamps every message with a sequence number
+    
+    Messages are stamped under the buffer lock as they are appended, so
+    sequence numbers increase in buffer order and readers can fetch only
+    what arrived after a cursor by walking back from the newest entry.
+    """
+    
+    def __init__(self, iterable=(), maxlen=None, sequence=None):
+        """
+        Initialize sequenced buffer
+        
+        Args:
+            iterable: Initial messages (not re-stamped)
+            maxlen (int): Maximum number of messages kept
+            sequence (MessageSequence): Sequence to stamp from
+        """
+        super().__init__(iterable, maxlen or Config.CONSOLE_MESSAGE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self.sequence = sequence or message_sequence
+        self._appended = len(self)
+    
+    def append(self, message):
+        """
+        Stamp and append a message
+        
+        Args:
+            message (dict): Console message (keeps an existing 'seq')
+        """
+        with self._lock:
+            pending = 'seq' not in message
+            if pending:
+                message['seq'] = self.sequence.next(pending=True)
+            try:
+                super().append(message)
+                self._appended += 1
+            finally:
+                if pending:
+                    self.sequence.publish(message['seq'])
+    
+    def snapshot(self):
+        """
+        Get a consistent copy of the buffer
+        
+        Returns:
+            list: Messages, oldest first
+        """
+        with self._lock:
+            return list(super().__iter__())
+    
+    def since(self, seq, message_type=None, limit=None):
+        """
+        Get messages newer than a cursor, touching only the new entries
+        
+        Args:
+            seq (int): Cursor - only messages with a higher sequence are returned
+            message_type (str): Filter by message type, None for all
+            limit (int): Maximum number of messages (oldest first)
+            
+        Returns:
+            list: Messages newer than the cursor, oldest first
+        """
+        newer = []
+        with self._lock:
+            for message in reversed(self):
+                if message.get('seq', 0) <= seq:
+                    break
+                if message_type and message_type != 'all' and message.get('type') != message_type:
+                    continue
+                newer.append(message)
+        
+        newer.reverse()
+        return newer[:limit] if limit else newer
+    
+    def iter_newest(self, message_type=None, chunk_size=64):
+        """
+        Lazily iterate messages from newest to oldest
+        
+        Args:
+            message_type (str): Filter by message type, None for all
+            chunk_size (int): Messages read per lock acquisition
+            
+        Yields:
+            dict: Messages, newest first
+        """
+        for message in self._iter_ring(self, lambda: self._appended, chunk_size):
+            if message_type and message_type != 'all' and message.get('type') != message_type:
+                continue
+            yield message
+    
+    def _iter_ring(self, ring, appended, chunk_size):
+        """
+        Lazily iterate a ring guarded by the buffer lock, newest first
+        
+        Entries are addressed by their absolute append position and read
+        in small chunks under the lock, so appends from other threads
+        neither break the iteration nor make it return a message twice,
+        and a consumer that stops early never copies the rest.
+        
+        Args:
+            ring (deque): Ring to walk
+            appended (callable): Returns how many messages the ring has ever held
+            chunk_size (int): Messages read per lock acquisition
+            
+        Yields:
+            dict: Messages, newest first
+        """
+        with self._lock:
+            position = appended() - 1
+        
+        while position >= 0:
+            with self._lock:
+                first_kept = appended() - len(ring)
+                chunk = []
+                stop = max(position - chunk_size, first_kept - 1)
+                for absolute in range(position, stop, -1):
+                    chunk.append(ring[absolute - first_kept])
+            
+            if not chunk:
+                return
+            position -= len(chunk)
+            
+            yield from chunk
+    
+    def latest_seq(self):
+        """
+        Get the sequence number of the newest message
+        
+        Returns:
+            int: Newest sequence number, 0 if empty
+        """
+        with self._lock:
+            return self[-1].get('seq', 0) if len(self) else 0
+
+class _TypeRing:
+    """Messages of one type, in arrival order"""
+    
+    __slots__ = ('messages', 'appended')
+    
+    def __init__(self):
+        self.messages = deque()
+        self.appended = 0
+
+class IndexedMessageBuffer(SequencedMessageBuffer):
+    """
+    Sequenced buffer with a secondary sub-ring per message type
+    
+    Every message is kept in the main ring and in the sub-ring for its
+    type. When the main ring evicts its oldest message, that message is
+    also the oldest of its sub-ring, so the sub-rings always hold exactly
+    the buffered messages of their type and a type-filtered read such as
+    "last 50 chats" only touches chat messages, however large the buffer.
+    """
+    
+    def __init__(self, iterable=(), maxlen=None, sequence=None):
+        """
+        Initialize indexed buffer
+        
+        Args:
+            iterable: Initial messages (not re-stamped)
+            maxlen (int): Maximum number of messages kept
+            sequence (MessageSequence): Sequence to stamp from
+        """
+        super().__init__(iterable, maxlen, sequence)
+        self._by_type = {}
+        for message in super().__iter__():
+            self._type_ring(message.get('type')).messages.append(message)
+        for ring in self._by_type.values():
+            ring.appended = len(ring.messages)
+    
+    def _type_ring(self, message_type):
+        """Get (or create) the sub-ring for a type (lock must be held)"""
+        ring = self._by_type.get(message_type)
+        if ring is None:
+            ring = self._by_type[message_type] = _TypeRing()
+        return ring
+    
+    def append(self, message):
+        """
+        Stamp and append a message to the main ring and its type's sub-ring
+        
+        Args:
+            message (dict): Console message (keeps an existing 'seq')
+        """
+        with self._lock:
+            pending = 'seq' not in message
+            if pending:
+                message['seq'] = self.sequence.next(pending=True)
+            try:
+                self._append_indexed(message)
+            finally:
+                if pending:
+                    self.sequence.publish(message['seq'])
+    
+    def _append_indexed(self, message):
+        """Append to the main ring and the type's sub-ring (lock must be held)"""
+        if self.maxlen is not None and len(self) == self.maxlen:
+            evicted = self[0]
+            evicted_ring = self._by_type.get(evicted.get('type'))
+            if evicted_ring and evicted_ring.messages and evicted_ring.messages[0] is evicted:
+                evicted_ring.messages.popleft()
+        
+        deque.append(self, message)
+        self._appended += 1
+        
+        ring = self._type_ring(message.get('type'))
+        ring.messages.append(message)
+        ring.appended += 1
+    
+    def clear(self):
+        """Remove all messages and sub-rings"""
+        with self._lock:
+            deque.clear(self)
+            self._by_type.clear()
+    
+    def iter_newest(self, message_type=None, chunk_size=64):
+        """
+        Lazily iterate messages from newest to oldest
+        
+        Args:
+            message_type (str): Only walk this type's sub-ring, None for all
+            chunk_size (int): Messages read per lock acquisition
+            
+        Yields:
+            dict: Messages, newest first
+        """
+        if not message_type or message_type == 'all':
+            yield from super().iter_newest(None, chunk_size)
+            return
+        
+        with self._lock:
+            ring = self._by_type.get(message_type)
+        if ring is None:
+            return
+        
+        yield from self._iter_ring(ring.messages, lambda: ring.appended, chunk_size)
+    
+    def since(self, seq, message_type=None, limit=None):
+        """
+        Get messages newer than a cursor, touching only the new entries
+        
+        Args:
+            seq (int): Cursor - only messages with a higher sequence are returned
+            message_type (str): Only walk this type's sub-ring, None for all
+            limit (int): Maximum number of messages (oldest first)
+            
+        Returns:
+            list: Messages newer than the cursor, oldest first
+        """
+        if not message_type or message_type == 'all':
+            return super().since(seq, None, limit)
+        
+        newer = []
+        with self._lock:
+            ring = self._by_type.get(message_type)
+            if ring is not None:
+                for message in reversed(ring.messages):
+                    if message.get('seq', 0) <= seq:
+                        break
+                    newer.append(message)
+        
+        newer.reverse()
+        return newer[:limit] if limit else newer
+    
+    def count_by_type(self):
+        """
+        Get the number of buffered messages of each type
+        
+        Returns:
+            dict: Message type -> count
+        """
+        with self._lock:
+            return {
+                message_type: len(ring.messages)
+                for message_type, ring in self._by_type.items()
+                if ring.messages
+            }
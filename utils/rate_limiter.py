@@ -1,14 +1,27 @@
 """
 GUST Bot Enhanced - Rate Limiter
 ===============================
-Simple rate limiter implementation for G-Portal API
+Thread-safe token bucket rate limiter for G-Portal API
 """
 
 import time
+import heapq
+import asyncio
+import itertools
+import threading
 from collections import defaultdict
 
+from config import Config
+
 class RateLimiter:
-    """Simple rate limiter implementation for G-Portal API"""
+    """
+    Token bucket rate limiter for G-Portal API
+    
+    Each key owns a bucket holding up to max_calls tokens that refills
+    at max_calls / time_window tokens per second. Every check is O(1)
+    and all state is guarded by one lock, so Flask request threads, KOTH
+    threads and the WebSocket loop can share a single instance.
+    """
     
     def __init__(self, max_calls=5, time_window=1):
         """
@@ -20,7 +33,52 @@ class RateLimiter:
         """
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = defaultdict(list)
+        self.rate = max_calls / float(time_window)
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def _get_bucket(self, key, now):
+        """
+        Get the refilled bucket for a key (lock must be held)
+        
+        Args:
+            key (str): Identifier for rate limiting
+            now (float): Current monotonic time
+            
+        Returns:
+            list: [tokens, last_refill_time]
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.max_calls), now]
+            self._buckets[key] = bucket
+            return bucket
+        
+        elapsed = now - bucket[1]
+        if elapsed > 0:
+            bucket[0] = min(float(self.max_calls), bucket[0] + elapsed * self.rate)
+            bucket[1] = now
+        return bucket
+    
+    def _reserve(self, key, tokens=1):
+        """
+        Take tokens now, borrowing against future refills if needed
+        
+        Borrowing keeps waiters in arrival order: each reservation pushes
+        the bucket further into debt and gets the exact delay after which
+        its token has been refilled.
+        
+        Args:
+            key (str): Identifier for rate limiting
+            tokens (int): Number of tokens to take
+            
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            bucket = self._get_bucket(key, time.monotonic())
+            bucket[0] -= tokens
+            return max(0.0, -bucket[0] / self.rate)
     
     def is_allowed(self, key="default"):
         """
@@ -30,29 +88,64 @@ class RateLimiter:
             key (str): Identifier for rate limiting (e.g., user ID, API endpoint)
             
         Returns:
-            bool: True if call is allowed, False otherwise
+            bool: True if call is allowed (a token was taken), False otherwise
+        """
+        with self._lock:
+            bucket = self._get_bucket(key, time.monotonic())
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            return False
+    
+    def wait_if_needed(self, key="default"):
         """
-        now = time.time()
+        Block until a call is allowed, sleeping exactly until the next token
         
-        # Remove old calls outside the time window
-        self.calls[key] = [call_time for call_time in self.calls[key] 
-                          if now - call_time < self.time_window]
+        Args:
+            key (str): Identifier for rate limiting
+        """
+        delay = self._reserve(key)
+        if delay > 0:
+            time.sleep(delay)
+    
+    async def acquire(self, key="default"):
+        """
+        Wait for a call slot without blocking the event loop
         
-        # Check if we can make a new call
-        if len(self.calls[key]) < self.max_calls:
-            self.calls[key].append(now)
-            return True
-        return False
+        Args:
+            key (str): Identifier for rate limiting
+        """
+        delay = self._reserve(key)
+        if delay > 0:
+            await asyncio.sleep(delay)
     
-    def wait_if_needed(self, key="default"):
+    def get_wait_time(self, key="default", tokens=1):
+        """
+        Get time until the given number of tokens is available
+        
+        Args:
+            key (str): Identifier for rate limiting
+            tokens (int): Number of tokens needed
+            
+        Returns:
+            float: Seconds until the tokens are available (0 if available now)
         """
-        Wait if necessary to respect rate limits
+        with self._lock:
+            bucket = self._get_bucket(key, time.monotonic())
+            return max(0.0, (tokens - bucket[0]) / self.rate)
+    
+    def get_tokens(self, key="default"):
+        """
+        Get current (fractional) token count for a key
         
         Args:
             key (str): Identifier for rate limiting
+            
+        Returns:
+            float: Tokens available, negative while callers are waiting
         """
-        while not self.is_allowed(key):
-            time.sleep(0.1)
+        with self._lock:
+            return self._get_bucket(key, time.monotonic())[0]
     
     def get_remaining_calls(self, key="default"):
         """
@@ -62,15 +155,9 @@ class RateLimiter:
             key (str): Identifier for rate limiting
             
         Returns:
-            int: Number of remaining calls in current window
+            int: Number of calls that can be made right now
         """
-        now = time.time()
-        
-        # Remove old calls outside the time window
-        self.calls[key] = [call_time for call_time in self.calls[key] 
-                          if now - call_time < self.time_window]
-        
-        return max(0, self.max_calls - len(self.calls[key]))
+        return max(0, int(self.get_tokens(key)))
     
     def get_reset_time(self, key="default"):
         """
@@ -80,16 +167,12 @@ class RateLimiter:
             key (str): Identifier for rate limiting
             
         Returns:
-            float: Seconds until rate limit resets
+            float: Seconds until the bucket is full again
         """
-        if key not in self.calls or not self.calls[key]:
+        if key not in self._buckets:
             return 0.0
         
-        now = time.time()
-        oldest_call = min(self.calls[key])
-        reset_time = oldest_call + self.time_window - now
-        
-        return max(0.0, reset_time)
+        return max(0.0, (self.max_calls - self.get_tokens(key)) / self.rate)
     
     def clear_key(self, key):
         """
@@ -98,12 +181,13 @@ class RateLimiter:
         Args:
             key (str): Key to clear
         """
-        if key in self.calls:
-            del self.calls[key]
+        with self._lock:
+            self._buckets.pop(key, None)
     
     def clear_all(self):
         """Clear all rate limiting history"""
-        self.calls.clear()
+        with self._lock:
+            self._buckets.clear()
     
     def get_status(self, key="default"):
         """
@@ -115,11 +199,189 @@ class RateLimiter:
         Returns:
             dict: Status information including remaining calls, reset time, etc.
         """
+        remaining_calls = self.get_remaining_calls(key)
         return {
             "key": key,
             "max_calls": self.max_calls,
             "time_window": self.time_window,
-            "remaining_calls": self.get_remaining_calls(key),
+            "remaining_calls": remaining_calls,
             "reset_time": self.get_reset_time(key),
-            "is_allowed": self.get_remaining_calls(key) > 0
+            "is_allowed": remaining_calls > 0
         }
+
+# Caller classes in admission order - lower values are admitted first
+CALLER_PRIORITIES = {
+    'interactive': 0,
+    'koth': 1,
+    'bulk': 2
+}
+
+class HierarchicalRateLimiter:
+    """
+    Layered rate limiter for G-Portal API traffic
+    
+    A call must fit the global account budget, the budget of every
+    server it touches and the budget of its caller class. When callers
+    compete for the global budget, the one with the better priority
+    (interactive before KOTH automation before bulk) goes first, while a
+    caller held back only by its own server or class budget never
+    blocks anyone else.
+    """
+    
+    def __init__(self, global_limit=None, server_limit=None, class_limits=None):
+        """
+        Initialize hierarchical rate limiter
+        
+        Args:
+            global_limit (tuple): (max_calls, time_window) for the whole account
+            server_limit (tuple): (max_calls, time_window) for each server
+            class_limits (dict): Caller class -> (max_calls, time_window)
+        """
+        global_limit = global_limit or (Config.RATE_LIMIT_MAX_CALLS, Config.RATE_LIMIT_TIME_WINDOW)
+        server_limit = server_limit or (Config.RATE_LIMIT_SERVER_MAX_CALLS, Config.RATE_LIMIT_SERVER_TIME_WINDOW)
+        class_limits = class_limits or Config.RATE_LIMIT_CLASS_LIMITS
+        
+        self.global_limiter = RateLimiter(*global_limit)
+        self.server_limiter = RateLimiter(*server_limit)
+        self.class_limiters = {name: RateLimiter(*limit) for name, limit in class_limits.items()}
+        
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        
+        self.admitted = defaultdict(int)
+        self.timed_out = defaultdict(int)
+        self.total_wait = defaultdict(float)
+    
+    def _class_limiter(self, caller_class):
+        """Get the limiter for a caller class (unknown classes count as bulk)"""
+        return self.class_limiters.get(caller_class) or self.class_limiters.get('bulk')
+    
+    def _local_wait(self, entry):
+        """Seconds until the server and class budgets of a waiter allow it"""
+        _, _, server_keys, caller_class = entry
+        waits = [self.server_limiter.get_wait_time(key) for key in server_keys]
+        
+        class_limiter = self._class_limiter(caller_class)
+        if class_limiter:
+            waits.append(class_limiter.get_wait_time(caller_class))
+        
+        return max(waits) if waits else 0.0
+    
+    def _admission_wait(self, entry):
+        """
+        Seconds until a waiter may be admitted (condition must be held)
+        
+        Returns:
+            float: 0 if the waiter can go now
+        """
+        local_wait = self._local_wait(entry)
+        global_wait = self.global_limiter.get_wait_time('global')
+        
+        # Yield the global budget to better-placed waiters that are ready
+        for other in self._waiters:
+            if other is not entry and other[:2] < entry[:2] and self._local_wait(other) == 0:
+                return max(local_wait, global_wait, 1.0 / self.global_limiter.rate)
+        
+        return max(local_wait, global_wait)
+    
+    def wait_if_needed(self, server_ids=None, caller_class='interactive', timeout=None):
+        """
+        Block until a call fits every budget, then take one token from each
+        
+        Args:
+            server_ids: Server ID or iterable of server IDs the call touches
+            caller_class (str): interactive, koth or bulk
+            timeout (float): Maximum seconds to wait, None to wait forever
+            
+        Returns:
+            bool: True if admitted, False if the timeout expired
+        """
+        if server_ids is None:
+            server_keys = ()
+        elif isinstance(server_ids, (str, int)):
+            server_keys = (str(server_ids),)
+        else:
+            server_keys = tuple(sorted(set(str(sid) for sid in server_ids)))
+        
+        priority = CALLER_PRIORITIES.get(caller_class, max(CALLER_PRIORITIES.values()))
+        entry = (priority, next(self._seq), server_keys, caller_class)
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = self._admission_wait(entry)
+                    if wait <= 0:
+                        self.global_limiter._reserve('global')
+                        for key in server_keys:
+                            self.server_limiter._reserve(key)
+                        class_limiter = self._class_limiter(caller_class)
+                        if class_limiter:
+                            class_limiter._reserve(caller_class)
+                        
+                        self.admitted[caller_class] += 1
+                        self.total_wait[caller_class] += time.monotonic() - start
+                        return True
+                    
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timed_out[caller_class] += 1
+                            return False
+                        wait = min(wait, remaining)
+                    
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+    
+    def _level_status(self, limiter, key):
+        """Get utilization data for one bucket"""
+        tokens = limiter.get_tokens(key)
+        return {
+            "max_calls": limiter.max_calls,
+            "time_window": limiter.time_window,
+            "tokens": round(tokens, 2),
+            "utilization": round(min(1.0, 1 - max(tokens, 0.0) / limiter.max_calls), 3)
+        }
+    
+    def get_stats(self):
+        """
+        Get live utilization per level
+        
+        Returns:
+            dict: Global, per-server and per-class budgets plus admission counters
+        """
+        with self._cond:
+            waiting = defaultdict(int)
+            for _, _, _, caller_class in self._waiters:
+                waiting[caller_class] += 1
+            
+            classes = {}
+            for name, limiter in self.class_limiters.items():
+                status = self._level_status(limiter, name)
+                admitted = self.admitted.get(name, 0)
+                status.update({
+                    "priority": CALLER_PRIORITIES.get(name),
+                    "waiting": waiting.get(name, 0),
+                    "admitted": admitted,
+                    "timed_out": self.timed_out.get(name, 0),
+                    "average_wait_ms": round(self.total_wait[name] / admitted * 1000, 1) if admitted else 0.0
+                })
+                classes[name] = status
+            
+            servers = {
+                key: self._level_status(self.server_limiter, key)
+                for key in list(self.server_limiter._buckets.keys())
+            }
+            
+            return {
+                "global": self._level_status(self.global_limiter, 'global'),
+                "servers": servers,
+                "classes": classes,
+                "waiting": len(self._waiters)
+            }
@@ -0,0 +1,212 @@
+"""
+GUST Bot Enhanced - Async Runtime
+================================
+One shared asyncio event loop for background timers, WebSocket work and
+blocking I/O
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class AsyncRuntime:
+    """
+    Shared asyncio event loop running in a single background thread
+    
+    Subsystems hand work to the runtime instead of starting threads of
+    their own: coroutines (WebSocket connections, KOTH sequences) run on
+    the loop, timers are loop callbacks, and blocking calls (HTTP, token
+    refresh) go to one bounded executor. Thread count therefore stays
+    flat however many servers, events and commands are in flight. All
+    submit helpers are safe to call from any thread.
+    """
+    
+    def __init__(self, max_workers=None):
+        """
+        Initialize runtime
+        
+        Args:
+            max_workers (int): Threads in the executor for blocking calls
+        """
+        self.max_workers = max_workers or Config.RUNTIME_MAX_WORKERS
+        self.loop = None
+        self.executor = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._periodic = {}
+        
+        self.submitted = 0
+        self.blocking_calls = 0
+    
+    @property
+    def running(self):
+        """True while the loop thread is alive"""
+        return bool(self._thread and self._thread.is_alive())
+    
+    def start(self):
+        """Start the loop thread (no-op if already running)"""
+        with self._lock:
+            if self.running:
+                return
+            
+            self._ready.clear()
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="runtime-io")
+            self._thread = threading.Thread(target=self._run_loop, name="async-runtime", daemon=True)
+            self._thread.start()
+        
+        self._ready.wait()
+        logger.info(f"🚀 Async runtime started ({self.max_workers} I/O workers)")
+    
+    def _run_loop(self):
+        """Run the event loop until stopped"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.set_default_executor(self.executor)
+        self._ready.set()
+        
+        try:
+            self.loop.run_forever()
+        except Exception as e:
+            logger.error(f"❌ Async runtime loop error: {e}")
+        finally:
+            self.loop.close()
+    
+    def _require_loop(self):
+        """Start the runtime on first use and return its loop"""
+        if not self.running:
+            self.start()
+        return self.loop
+    
+    def submit(self, coro):
+        """
+        Run a coroutine on the runtime loop
+        
+        Args:
+            coro: Coroutine object
+            
+        Returns:
+            concurrent.futures.Future: Result of the coroutine
+        """
+        loop = self._require_loop()
+        self.submitted += 1
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+    
+    def call_soon(self, func, *args):
+        """
+        Run a quick, non-blocking callable on the runtime loop
+        
+        Args:
+            func (callable): Callable to run
+            *args: Positional arguments
+        """
+        self._require_loop().call_soon_threadsafe(func, *args)
+    
+    def call_later(self, delay, func, *args):
+        """
+        Run a quick, non-blocking callable on the loop after a delay
+        
+        Args:
+            delay (float): Seconds to wait
+            func (callable): Callable to run
+            *args: Positional arguments
+        """
+        loop = self._require_loop()
+        loop.call_soon_threadsafe(loop.call_later, delay, func, *args)
+    
+    async def run_blocking(self, func, *args):
+        """
+        Await a blocking callable on the shared I/O executor
+        
+        Args:
+            func (callable): Blocking callable (HTTP request, file I/O...)
+            *args: Positional arguments
+            
+        Returns:
+            Result of func
+        """
+        self.blocking_calls += 1
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+    
+    def every(self, interval, func, name=None):
+        """
+        Run a blocking callable periodically on the I/O executor
+        
+        Args:
+            interval (float): Seconds between runs
+            func (callable): Blocking callable, called without arguments
+            name (str): Job name (replaces an existing job of that name)
+            
+        Returns:
+            concurrent.futures.Future: Handle of the periodic job
+        """
+        name = name or getattr(func, '__name__', 'job')
+        self.cancel(name)
+        
+        async def periodic():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.run_blocking(func)
+                except Exception as e:
+                    logger.error(f"❌ Periodic job {name} failed: {e}")
+        
+        future = self.submit(periodic())
+        self._periodic[name] = future
+        return future
+    
+    def cancel(self, name):
+        """
+        Cancel a periodic job
+        
+        Args:
+            name (str): Job name
+        """
+        future = self._periodic.pop(name, None)
+        if future is not None:
+            future.cancel()
+    
+    def stop(self):
+        """Cancel periodic jobs and stop the loop and executor"""
+        for name in list(self._periodic):
+            self.cancel(name)
+        
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        
+        logger.info("🛑 Async runtime stopped")
+    
+    def get_stats(self):
+        """
+        Get runtime statistics
+        
+        Returns:
+            dict: Loop state, task and job counts
+        """
+        tasks = 0
+        if self.running and self.loop:
+            try:
+                tasks = len(asyncio.all_tasks(self.loop))
+            except RuntimeError:
+                pass
+        
+        return {
+            "running": self.running,
+            "tasks": tasks,
+            "periodic_jobs": sorted(self._periodic),
+            "io_workers": self.max_workers,
+            "submitted": self.submitted,
+            "blocking_calls": self.blocking_calls,
+            "threads": threading.active_count()
+        }
+
+runtime = AsyncRuntime()
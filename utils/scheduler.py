@@ -0,0 +1,207 @@
+"""
+GUST Bot Enhanced - Timer Scheduler
+==================================
+Heap-based timer scheduler driven by one task on the shared runtime
+"""
+
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+import time
+
+from utils.runtime import runtime
+
+logger = logging.getLogger(__name__)
+
+class Timer:
+    """One scheduled callback"""
+    
+    __slots__ = ('when', 'callback', 'args', 'group', 'cancelled')
+    
+    def __init__(self, when, callback, args, group):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.group = group
+        self.cancelled = False
+    
+    def cancel(self):
+        """Cancel the timer (it is skipped when it comes due)"""
+        self.cancelled = True
+
+class TimerScheduler:
+    """
+    Min-heap of timers fired by a single driver task
+    
+    Timers are keyed by absolute time.monotonic() deadlines, so a timeline
+    computed up front never drifts the way chained sleeps do, and timers
+    with the same deadline fire in the order they were scheduled. The
+    driver sleeps until the earliest deadline and is woken early when a
+    sooner timer arrives, so one task serves any number of events.
+    Callbacks run on the runtime loop and must not block.
+    """
+    
+    def __init__(self):
+        """Initialize timer scheduler"""
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._wakeup = None
+        self._driver = None
+        
+        self.fired = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.max_lag = 0.0
+    
+    def schedule_at(self, when, callback, *args, group=None):
+        """
+        Schedule a callback at an absolute monotonic time
+        
+        Args:
+            when (float): time.monotonic() deadline
+            callback (callable): Callable to run
+            *args: Positional arguments
+            group: Optional key for cancelling related timers together
+            
+        Returns:
+            Timer: Handle that can be cancelled
+        """
+        timer = Timer(when, callback, args, group)
+        with self._lock:
+            heapq.heappush(self._heap, (when, next(self._counter), timer))
+            if group is not None:
+                self._groups.setdefault(group, set()).add(timer)
+            first = self._heap[0][2] is timer
+        
+        self._ensure_driver()
+        if first:
+            runtime.call_soon(self._wake)
+        return timer
+    
+    def schedule(self, delay, callback, *args, group=None):
+        """
+        Schedule a callback after a delay
+        
+        Args:
+            delay (float): Seconds from now
+            callback (callable): Callable to run
+            *args: Positional arguments
+            group: Optional key for cancelling related timers together
+            
+        Returns:
+            Timer: Handle that can be cancelled
+        """
+        return self.schedule_at(time.monotonic() + delay, callback, *args, group=group)
+    
+    def cancel_group(self, group):
+        """
+        Cancel every pending timer of a group
+        
+        Args:
+            group: Group key passed to schedule
+            
+        Returns:
+            int: Number of timers cancelled
+        """
+        with self._lock:
+            timers = self._groups.pop(group, ())
+        for timer in timers:
+            timer.cancel()
+        self.cancelled += len(timers)
+        return len(timers)
+    
+    def pending(self, group=None):
+        """
+        Count pending timers
+        
+        Args:
+            group: Only count this group, None for all
+            
+        Returns:
+            int: Pending, uncancelled timers
+        """
+        with self._lock:
+            if group is not None:
+                return len(self._groups.get(group, ()))
+            return sum(1 for _, _, timer in self._heap if not timer.cancelled)
+    
+    def _ensure_driver(self):
+        """Start the driver task if it is not running"""
+        with self._lock:
+            if self._driver is not None and not self._driver.done():
+                return
+            self._driver = runtime.submit(self._drive())
+    
+    def _wake(self):
+        """Wake the driver to re-check the earliest deadline (loop thread)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def _pop_due(self, now):
+        """Pop all timers due at or before now"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, timer = heapq.heappop(self._heap)
+                if timer.cancelled:
+                    continue
+                if timer.group is not None:
+                    members = self._groups.get(timer.group)
+                    if members is not None:
+                        members.discard(timer)
+                        if not members:
+                            del self._groups[timer.group]
+                due.append(timer)
+            next_when = self._heap[0][0] if self._heap else None
+        return due, next_when
+    
+    async def _drive(self):
+        """Fire timers as they come due"""
+        self._wakeup = asyncio.Event()
+        
+        while True:
+            now = time.monotonic()
+            due, next_when = self._pop_due(now)
+            
+            for timer in due:
+                lag = now - timer.when
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"❌ Timer callback error ({timer.group}): {e}")
+                self.fired += 1
+            
+            if due:
+                continue
+            
+            self._wakeup.clear()
+            timeout = None if next_when is None else max(next_when - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    def get_stats(self):
+        """
+        Get scheduler statistics
+        
+        Returns:
+            dict: Pending timers, groups and firing counters
+        """
+        return {
+            "pending": self.pending(),
+            "groups": len(self._groups),
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "max_lag_ms": round(self.max_lag * 1000, 2)
+        }
+
+scheduler = TimerScheduler()
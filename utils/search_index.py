@@ -0,0 +1,585 @@
+"""
+GUST Bot Enhanced - Search Index
+===============================
+Memory-mapped inverted index over the console archive and downloaded logs
+"""
+
+import os
+import re
+import math
+import mmap
+import json
+import heapq
+import struct
+import bisect
+import hashlib
+import logging
+import itertools
+import threading
+from array import array
+from datetime import datetime
+from functools import lru_cache
+
+from config import Config
+from utils.console_archive import console_archive
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'[a-z0-9_]{2,}')
+_TERM = struct.Struct('<QII')     # term hash, first posting, posting count
+_DOC = struct.Struct('<IQII')     # file ID, byte offset, byte length, line in block
+
+def tokenize(text):
+    """
+    Split text into lowercase index terms
+    
+    Args:
+        text (str): Text to tokenize
+        
+    Returns:
+        list: Terms of 2+ letters, digits or underscores
+    """
+    return _TOKEN.findall(str(text).lower())
+
+def term_hash(term):
+    """Stable 64-bit hash of a term (the same in every process)"""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _map(path):
+    """Memory-map a file read-only (empty files cannot be mapped)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+@lru_cache(maxsize=64)
+def _archive_block(data_path, offset, length):
+    """Recently read archive blocks (blocks are immutable once indexed)"""
+    return tuple(console_archive.read_block(data_path, offset, length))
+
+class _IndexSegment:
+    """
+    One immutable index segment
+    
+    Three files share a name: .terms holds fixed-width (hash, start,
+    count) records sorted by term hash, .post the uint32 doc IDs of each
+    term in ascending order, and .docs fixed-width (file ID, offset,
+    length, line) records. All three are memory-mapped, so lookups are a
+    binary search over the page cache rather than loading the index.
+    """
+    
+    def __init__(self, directory, name, files=None):
+        self.name = name
+        self.paths = [os.path.join(directory, name + suffix) for suffix in ('.terms', '.post', '.docs')]
+        self.terms, self.postings, self.docs = (_map(path) for path in self.paths)
+        self.term_count = len(self.terms) // _TERM.size
+        self.doc_count = len(self.docs) // _DOC.size
+        if files is None:
+            files = {_DOC.unpack_from(self.docs, doc_id * _DOC.size)[0] for doc_id in range(self.doc_count)}
+        self.files = frozenset(files)  # IDs of the source files its documents point into
+    
+    def lookup(self, hashed):
+        """
+        Find the postings of a term
+        
+        Args:
+            hashed (int): Term hash
+            
+        Returns:
+            memoryview: Ascending uint32 doc IDs, or None if absent
+        """
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            found, start, count = _TERM.unpack_from(self.terms, middle * _TERM.size)
+            if found < hashed:
+                low = middle + 1
+            elif found > hashed:
+                high = middle
+            else:
+                return self.posting_slice(start, count)
+        return None
+    
+    def posting_slice(self, start, count):
+        """Doc IDs [start, start + count) of the postings file"""
+        return memoryview(self.postings)[start * 4:(start + count) * 4].cast('I')
+    
+    def doc(self, doc_id):
+        """Get (file ID, offset, length, line) of a document"""
+        return _DOC.unpack_from(self.docs, doc_id * _DOC.size)
+    
+    def iter_terms(self, position):
+        """Yield (hash, segment position, start, count) in hash order for merging"""
+        for index in range(self.term_count):
+            hashed, start, count = _TERM.unpack_from(self.terms, index * _TERM.size)
+            yield hashed, position, start, count
+    
+    def size(self):
+        """Bytes on disk"""
+        return len(self.terms) + len(self.postings) + len(self.docs)
+
+class _SegmentBuilder:
+    """In-memory postings collected by one refresh before they are written"""
+    
+    def __init__(self):
+        self.postings = {}
+        self.docs = bytearray()
+        self.doc_count = 0
+        self.progress = {}
+        self.files = set()
+    
+    def add(self, file_id, offset, length, line, terms):
+        """Add one document (a console message or a log line)"""
+        doc_id = self.doc_count
+        for hashed in {term_hash(term) for term in terms}:
+            self.postings.setdefault(hashed, array('I')).append(doc_id)
+        self.docs += _DOC.pack(file_id, offset, length, line)
+        self.doc_count += 1
+        self.files.add(file_id)
+
+class SearchIndex:
+    """
+    Inverted index from player IDs, names and words to console lines
+    
+    Indexing is incremental: refresh() tails the console archive's block
+    index and any registered log files from where the last refresh
+    stopped, and writes the new documents as one immutable segment. A
+    search intersects the postings of every query term in each segment,
+    newest segment first, then re-reads the matching lines to confirm
+    them, so hash collisions never show up in results. Segments are
+    merged by size tier: once SEARCH_INDEX_MERGE_FACTOR adjacent segments
+    fall in the same tier they are merged, so each document is rewritten
+    only O(log n) times. Merges drop documents whose source files were
+    pruned, segments that only point into pruned files are dropped
+    outright, and file entries nothing points into leave the manifest.
+    The manifest records indexing progress, so a restart picks up exactly
+    where the last committed segment ended.
+    """
+    
+    def __init__(self, directory=None):
+        """
+        Initialize search index
+        
+        Args:
+            directory (str): Index directory
+        """
+        self.directory = directory or Config.SEARCH_INDEX_DIR
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loaded = False
+        self._files = {}  # file ID -> {path, source, server_id, indexed}
+        self._file_ids = {}
+        self._segments = []
+        self._next_segment = 1
+        self._next_file = 0
+        
+        self.documents_indexed = 0
+        self.merges = 0
+        self.searches = 0
+        self.last_refresh = None
+    
+    # Manifest
+    
+    def _ensure_loaded(self):
+        """Load the manifest and map its segments on first use"""
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            
+            manifest = {}
+            if os.path.exists(self.manifest_path):
+                try:
+                    with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.error(f"❌ Search index manifest unreadable, rebuilding: {e}")
+            
+            files = manifest.get('files', {})
+            if isinstance(files, list):
+                files = dict(enumerate(files))
+            self._files = {int(file_id): entry for file_id, entry in files.items()}
+            self._file_ids = {entry['path']: file_id for file_id, entry in self._files.items()}
+            self._next_file = manifest.get('next_file', max(self._files, default=-1) + 1)
+            self._next_segment = manifest.get('next_segment', 1)
+            for segment in manifest.get('segments', []):
+                name, files = (segment, None) if isinstance(segment, str) else (segment['name'], segment['files'])
+                try:
+                    self._segments.append(_IndexSegment(self.directory, name, files))
+                except OSError as e:
+                    logger.error(f"❌ Search index segment {name} missing: {e}")
+            
+            self._remove_unreferenced()
+            self._loaded = True
+        
+        logger.info(f"🔎 Search index loaded: {len(self._segments)} segment(s), {len(self._files)} file(s)")
+    
+    def _save_manifest(self):
+        """Write the manifest atomically (lock held)"""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "next_segment": self._next_segment,
+                "next_file": self._next_file,
+                "segments": [{"name": segment.name, "files": sorted(segment.files)} for segment in self._segments],
+                "files": self._files
+            }, f)
+        os.replace(temp_path, self.manifest_path)
+    
+    def _remove_unreferenced(self):
+        """Delete segment files left by a crash or an earlier merge (lock held)"""
+        live = {segment.name for segment in self._segments}
+        for filename in os.listdir(self.directory):
+            name, extension = os.path.splitext(filename)
+            if extension in ('.terms', '.post', '.docs') and name not in live:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass  # still mapped by a reader on some platforms; retried next start
+    
+    def _file_id(self, path, source, server_id):
+        """Get or register the ID of a source file (lock held)"""
+        file_id = self._file_ids.get(path)
+        if file_id is None:
+            file_id = self._next_file
+            self._next_file += 1
+            self._files[file_id] = {"path": path, "source": source, "server_id": str(server_id), "indexed": 0}
+            self._file_ids[path] = file_id
+        return file_id
+    
+    def _prune(self):
+        """
+        Forget deleted source files
+        
+        Segments whose documents all point into deleted files are dropped
+        without a rewrite, and file entries no segment points into any
+        more are removed from the manifest.
+        """
+        with self._lock:
+            gone = {file_id for file_id, entry in self._files.items() if not os.path.exists(entry['path'])}
+            if not gone:
+                return
+            
+            segments = [segment for segment in self._segments if not segment.files <= gone]
+            referenced = set().union(*(segment.files for segment in segments))
+            forgotten = gone - referenced
+            if len(segments) == len(self._segments) and not forgotten:
+                return
+            
+            dropped = len(self._segments) - len(segments)
+            self._segments = segments
+            for file_id in forgotten:
+                del self._file_ids[self._files.pop(file_id)['path']]
+            self._save_manifest()
+            self._remove_unreferenced()
+        
+        logger.info(f"🔎 Search index dropped {dropped} segment(s) and {len(forgotten)} deleted file(s)")
+    
+    def add_log_file(self, path, server_id):
+        """
+        Register a downloaded server log for indexing on the next refresh
+        
+        Args:
+            path (str): Raw log file path
+            server_id: Server the log belongs to
+        """
+        self._ensure_loaded()
+        with self._lock:
+            self._file_id(path, 'log', server_id)
+            self._save_manifest()
+    
+    # Indexing
+    
+    def refresh(self):
+        """
+        Index new console archive blocks and log lines
+        
+        Returns:
+            int: Documents indexed
+        """
+        self._ensure_loaded()
+        with self._refresh_lock:
+            self._prune()
+            builder = _SegmentBuilder()
+            total = 0
+            
+            for server_id, data_path, index_path in console_archive.segments():
+                with self._lock:
+                    file_id = self._file_id(data_path, 'console', server_id)
+                    indexed = self._files[file_id]['indexed']
+                
+                for entry in console_archive.blocks(index_path):
+                    if entry['offset'] < indexed:
+                        continue
+                    try:
+                        lines = console_archive.read_block(data_path, entry['offset'], entry['length'])
+                    except (OSError, EOFError) as e:
+                        logger.warning(f"⚠️ Skipping unreadable archive block in {data_path}: {e}")
+                        break
+                    
+                    for line_number, line in enumerate(lines):
+                        message = json.loads(line)
+                        builder.add(file_id, entry['offset'], entry['length'], line_number,
+                                    tokenize(message.get('message', '')))
+                    builder.progress[file_id] = entry['offset'] + entry['length']
+                    
+                    if builder.doc_count >= Config.SEARCH_INDEX_SEGMENT_DOCS:
+                        total += self._commit(builder)
+                        builder = _SegmentBuilder()
+            
+            with self._lock:
+                logs = [(file_id, entry['path'], entry['indexed']) for file_id, entry in self._files.items()
+                        if entry['source'] == 'log']
+            
+            for file_id, path, indexed in logs:
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                if size <= indexed:
+                    continue
+                
+                with open(path, 'rb') as f:
+                    f.seek(indexed)
+                    offset = indexed
+                    for raw in f:
+                        if raw.strip():
+                            builder.add(file_id, offset, len(raw), 0, tokenize(raw.decode('utf-8', 'replace')))
+                        offset += len(raw)
+                        builder.progress[file_id] = offset
+                        
+                        if builder.doc_count >= Config.SEARCH_INDEX_SEGMENT_DOCS:
+                            total += self._commit(builder)
+                            builder = _SegmentBuilder()
+            
+            total += self._commit(builder)
+            self._merge_tiers()
+            
+            self.last_refresh = datetime.now().isoformat()
+            return total
+    
+    def _commit(self, builder):
+        """Write a builder as a new segment and record indexing progress"""
+        if not builder.progress:
+            return 0
+        
+        segment = None
+        with self._lock:
+            name = f"idx-{self._next_segment:06d}"
+            self._next_segment += 1
+        
+        if builder.doc_count:
+            postings = array('I')
+            terms = bytearray()
+            for hashed in sorted(builder.postings):
+                ids = builder.postings[hashed]
+                terms += _TERM.pack(hashed, len(postings), len(ids))
+                postings.extend(ids)
+            
+            self._write_segment(name, terms, postings.tobytes(), builder.docs)
+            segment = _IndexSegment(self.directory, name, builder.files)
+        
+        with self._lock:
+            if segment is not None:
+                self._segments.append(segment)
+            for file_id, offset in builder.progress.items():
+                self._files[file_id]['indexed'] = offset
+            self._save_manifest()
+        
+        self.documents_indexed += builder.doc_count
+        return builder.doc_count
+    
+    def _write_segment(self, name, terms, postings, docs):
+        """Write the three files of a segment"""
+        for suffix, payload in (('.terms', terms), ('.post', postings), ('.docs', docs)):
+            with open(os.path.join(self.directory, name + suffix), 'wb') as f:
+                f.write(payload)
+    
+    def _merge_tiers(self):
+        """Merge runs of adjacent same-tier segments until none is long enough"""
+        factor = Config.SEARCH_INDEX_MERGE_FACTOR
+        while True:
+            with self._lock:
+                tiers = [int(math.log(max(segment.doc_count, 1), factor)) for segment in self._segments]
+            
+            # Oldest qualifying run first; adjacency keeps segments in age order
+            run = None
+            start = 0
+            for index in range(1, len(tiers) + 1):
+                if index == len(tiers) or tiers[index] != tiers[start]:
+                    if index - start >= factor:
+                        run = (start, index)
+                        break
+                    start = index
+            if run is None:
+                return
+            self._merge(*run)
+    
+    def _merge(self, start, end):
+        """
+        Merge segments [start, end) into one, dropping documents of deleted files
+        
+        Args:
+            start (int): First segment position
+            end (int): Position after the last segment
+        """
+        with self._lock:
+            segments = self._segments[start:end]
+            alive = {file_id for file_id, entry in self._files.items() if os.path.exists(entry['path'])}
+            name = f"idx-{self._next_segment:06d}"
+            self._next_segment += 1
+        
+        # Renumber documents, skipping those whose source file is gone
+        docs = bytearray()
+        remaps = []
+        next_id = 0
+        for segment in segments:
+            remap = array('i')
+            for doc_id in range(segment.doc_count):
+                record = segment.docs[doc_id * _DOC.size:(doc_id + 1) * _DOC.size]
+                if _DOC.unpack_from(record)[0] in alive:
+                    docs += record
+                    remap.append(next_id)
+                    next_id += 1
+                else:
+                    remap.append(-1)
+            remaps.append(remap)
+        
+        postings = array('I')
+        terms = bytearray()
+        streams = [segment.iter_terms(position) for position, segment in enumerate(segments)]
+        for hashed, group in itertools.groupby(heapq.merge(*streams), key=lambda term: term[0]):
+            first_posting = len(postings)
+            for _, position, first, count in group:
+                remap = remaps[position]
+                postings.extend(new_id for new_id in (remap[doc_id] for doc_id in
+                                 segments[position].posting_slice(first, count)) if new_id >= 0)
+            if len(postings) > first_posting:
+                terms += _TERM.pack(hashed, first_posting, len(postings) - first_posting)
+        
+        merged = []
+        if next_id:
+            files = set().union(*(segment.files for segment in segments)) & alive
+            self._write_segment(name, terms, postings.tobytes(), docs)
+            merged.append(_IndexSegment(self.directory, name, files))
+        
+        with self._lock:
+            self._segments[start:end] = merged
+            self._save_manifest()
+            self._remove_unreferenced()
+        
+        self.merges += 1
+        logger.info(f"🔎 Merged {len(segments)} search index segments ({next_id} documents kept)")
+    
+    # Searching
+    
+    def search(self, query, server_id=None, source=None, limit=100):
+        """
+        Find console messages and log lines containing every query term
+        
+        Args:
+            query (str): Player ID, name or words
+            server_id: Only this server
+            source (str): 'console' or 'log', None for both
+            limit (int): Maximum results
+            
+        Returns:
+            list: Matches, newest first
+        """
+        self._ensure_loaded()
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        
+        hashes = [term_hash(term) for term in terms]
+        server_id = str(server_id).split('_')[0] if server_id else None
+        with self._lock:
+            segments = list(self._segments)
+            files = dict(self._files)
+        self.searches += 1
+        
+        results = []
+        for segment in reversed(segments):
+            lists = []
+            for hashed in hashes:
+                found = segment.lookup(hashed)
+                if found is None:
+                    break
+                lists.append(found)
+            else:
+                lists.sort(key=len)
+                first, rest = lists[0], lists[1:]
+                for index in range(len(first) - 1, -1, -1):
+                    doc_id = first[index]
+                    if not all(_contains(postings, doc_id) for postings in rest):
+                        continue
+                    
+                    file_id, offset, length, line = segment.doc(doc_id)
+                    entry = files.get(file_id)
+                    if entry is None:
+                        continue
+                    if (source and entry['source'] != source) or (server_id and entry['server_id'] != server_id):
+                        continue
+                    
+                    result = self._load(entry, offset, length, line)
+                    if result is None or not terms.issubset(tokenize(result['message'])):
+                        continue
+                    
+                    results.append(result)
+                    if len(results) >= limit:
+                        return results
+        return results
+    
+    @staticmethod
+    def _load(entry, offset, length, line):
+        """Read a matched document back from its source file"""
+        try:
+            if entry['source'] == 'console':
+                message = json.loads(_archive_block(entry['path'], offset, length)[line])
+                message['source'] = 'console'
+                return message
+            
+            with open(entry['path'], 'rb') as f:
+                f.seek(offset)
+                text = f.read(length).decode('utf-8', 'replace').strip()
+            return {
+                "source": "log",
+                "server_id": entry['server_id'],
+                "file": os.path.basename(entry['path']),
+                "offset": offset,
+                "message": text
+            }
+        except (OSError, EOFError, IndexError, ValueError):
+            return None
+    
+    def get_stats(self):
+        """
+        Get index statistics
+        
+        Returns:
+            dict: Segment, document and file counts
+        """
+        self._ensure_loaded()
+        with self._lock:
+            segments = list(self._segments)
+            files = len(self._files)
+        
+        return {
+            "segments": len(segments),
+            "documents": sum(segment.doc_count for segment in segments),
+            "terms": sum(segment.term_count for segment in segments),
+            "bytes": sum(segment.size() for segment in segments),
+            "files": files,
+            "documents_indexed": self.documents_indexed,
+            "merges": self.merges,
+            "searches": self.searches,
+            "last_refresh": self.last_refresh
+        }
+
+def _contains(postings, doc_id):
+    """Binary search an ascending postings list"""
+    index = bisect.bisect_left(postings, doc_id)
+    return index < len(postings) and postings[index] == doc_id
+
+search_index = SearchIndex()
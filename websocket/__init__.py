@@ -13,9 +13,10 @@ from config import WEBSOCKETS_AVAILABLE
 if WEBSOCKETS_AVAILABLE:
     try:
         from .client import GPortalWebSocketClient
+        from .multiplexer import MultiplexedConnection, ServerSubscription
         from .manager import WebSocketManager
         
-        __all__ = ['GPortalWebSocketClient', 'WebSocketManager']
+        __all__ = ['GPortalWebSocketClient', 'MultiplexedConnection', 'ServerSubscription', 'WebSocketManager']
         
         # Package is fully functional
         PACKAGE_STATUS = "available"
@@ -0,0 +1,177 @@
+"""
+GUST Bot Enhanced - WebSocket Backpressure
+=========================================
+Bounded queue between the WebSocket receive loop and message consumers
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'drop_by_type')
+
+class ConsumerQueue:
+    """
+    Bounded per-server queue of messages waiting for the consumer callback
+    
+    The receive loop only ever calls put(), which never waits: when the
+    queue is full one message is shed according to the overflow policy,
+    so a slow consumer can delay delivery but never stall ws.recv().
+    
+    Policies:
+        drop_oldest: discard the oldest queued message
+        drop_newest: discard the incoming message
+        drop_by_type: discard the oldest queued message of a droppable
+            type (saves, joins...), keeping kills and chat; an incoming
+            droppable message is shed next, and only then the oldest
+    
+    Droppable messages are also kept in their own FIFO, so drop_by_type
+    finds its victim in O(1). The victim is only marked as shed and is
+    skipped when it reaches the front of the main queue; the queue is
+    compacted once shed entries outnumber the queue size.
+    """
+    
+    def __init__(self, maxsize=None, policy=None, droppable_types=None):
+        """
+        Initialize consumer queue
+        
+        Args:
+            maxsize (int): Maximum queued messages
+            policy (str): Overflow policy (see OVERFLOW_POLICIES)
+            droppable_types (iterable): Message types drop_by_type may shed
+        """
+        self.maxsize = maxsize or Config.WEBSOCKET_CONSUMER_QUEUE_SIZE
+        self.policy = policy or Config.WEBSOCKET_OVERFLOW_POLICY
+        if self.policy not in OVERFLOW_POLICIES:
+            logger.warning(f"⚠️ Unknown overflow policy '{self.policy}', using drop_oldest")
+            self.policy = 'drop_oldest'
+        self.droppable_types = frozenset(droppable_types if droppable_types is not None
+                                         else Config.WEBSOCKET_DROPPABLE_TYPES)
+        
+        self._queue = deque()
+        self._droppable = deque()  # queued droppable messages, oldest first
+        self._shed = set()  # ids of shed messages still in _queue
+        self._size = 0
+        self._ready = None  # created on the event loop by the first get()
+        
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.dropped_by_type = {}
+        self.peak_depth = 0
+    
+    def __len__(self):
+        return self._size
+    
+    def put(self, message):
+        """
+        Queue a message without waiting, shedding one if the queue is full
+        
+        Args:
+            message (dict): Processed console message
+        """
+        if self._size >= self.maxsize:
+            evicted = self._evict(message)
+            self._count_drop(evicted)
+            if evicted is message:
+                return
+        
+        self._queue.append(message)
+        if self.policy == 'drop_by_type' and message.get('type') in self.droppable_types:
+            self._droppable.append(message)
+        self._size += 1
+        self.enqueued += 1
+        if self._size > self.peak_depth:
+            self.peak_depth = self._size
+        if self._ready is not None:
+            self._ready.set()
+    
+    def _evict(self, incoming):
+        """
+        Pick the message to shed from a full queue
+        
+        Args:
+            incoming (dict): Message about to be queued
+            
+        Returns:
+            dict: Shed message (removed from the queue unless it is incoming)
+        """
+        if self.policy == 'drop_newest':
+            return incoming
+        
+        if self.policy == 'drop_by_type':
+            if self._droppable:
+                shed = self._droppable.popleft()
+                self._shed.add(id(shed))
+                self._size -= 1
+                if len(self._shed) > self.maxsize:
+                    self._compact()
+                return shed
+            if incoming.get('type') in self.droppable_types:
+                return incoming
+        
+        return self._pop_oldest()
+    
+    def _pop_oldest(self):
+        """Remove and return the oldest message that was not shed"""
+        queue = self._queue
+        while True:
+            message = queue.popleft()
+            if self._shed and id(message) in self._shed:
+                self._shed.discard(id(message))
+                continue
+            if self._droppable and self._droppable[0] is message:
+                self._droppable.popleft()
+            self._size -= 1
+            return message
+    
+    def _compact(self):
+        """Drop shed messages from the main queue"""
+        shed = self._shed
+        self._queue = deque(message for message in self._queue if id(message) not in shed)
+        shed.clear()
+    
+    def _count_drop(self, message):
+        """Count a shed message by type"""
+        self.dropped += 1
+        message_type = message.get('type')
+        self.dropped_by_type[message_type] = self.dropped_by_type.get(message_type, 0) + 1
+    
+    async def get(self):
+        """
+        Wait for the next queued message
+        
+        Returns:
+            dict: Oldest queued message
+        """
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        
+        while not self._size:
+            self._ready.clear()
+            await self._ready.wait()
+        
+        self.delivered += 1
+        return self._pop_oldest()
+    
+    def get_stats(self):
+        """
+        Get queue depth and drop counters
+        
+        Returns:
+            dict: Queue statistics
+        """
+        return {
+            "depth": self._size,
+            "peak_depth": self.peak_depth,
+            "max_size": self.maxsize,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "dropped_by_type": dict(self.dropped_by_type)
+        }
@@ -7,18 +7,111 @@ WebSocket client for G-Portal live console monitoring
 import json
 import time
 import asyncio
+import itertools
 import logging
 from datetime import datetime
-from collections import deque
 
 from config import Config, WEBSOCKETS_AVAILABLE
-from utils.helpers import classify_message
+from utils.console_rules import console_rules
+from utils.console_events import ConsoleMessage, console_events
+from utils.console_archive import console_archive
+from utils.message_buffer import IndexedMessageBuffer
+from .metrics import StreamCounters
+from .backpressure import ConsumerQueue
 
 if WEBSOCKETS_AVAILABLE:
     import websockets
 
 logger = logging.getLogger(__name__)
 
+class ConsoleAuthError(Exception):
+    """G-Portal rejected the token during the WebSocket handshake"""
+
+async def open_console_socket(token, label):
+    """
+    Open a G-Portal WebSocket and complete the graphql-ws handshake
+    
+    Args:
+        token (str): G-Portal authentication token
+        label (str): Connection description for log messages
+        
+    Returns:
+        WebSocket connection that has received connection_ack
+    """
+    uri = Config.WEBSOCKET_URI
+    
+    # Try different connection methods for compatibility
+    try:
+        # Method 1: Try with subprotocols parameter (most compatible)
+        ws = await websockets.connect(
+            uri,
+            subprotocols=["graphql-ws"],
+            ping_interval=Config.WEBSOCKET_PING_INTERVAL,
+            ping_timeout=Config.WEBSOCKET_PING_TIMEOUT
+        )
+        logger.info(f"✅ WebSocket connected using method 1 for {label}")
+        
+    except Exception as e1:
+        logger.warning(f"⚠️ Method 1 failed: {e1}")
+        try:
+            # Method 2: Basic connection without extra parameters
+            ws = await websockets.connect(uri)
+            logger.info(f"✅ WebSocket connected using method 2 for {label}")
+            
+        except Exception as e2:
+            logger.error(f"❌ All connection methods failed: {e1}, {e2}")
+            raise e2
+    
+    # Initialize connection with authentication
+    init_message = {
+        "type": "connection_init",
+        "payload": {
+            "authorization": f"Bearer {token}"
+        }
+    }
+    
+    await ws.send(json.dumps(init_message))
+    logger.debug("📤 Sent connection_init for %s", label)
+    
+    # Wait for connection acknowledgment
+    auth_error = None
+    timeout = Config.WEBSOCKET_CONNECTION_TIMEOUT
+    start_time = time.time()
+    
+    logger.debug("⏳ Waiting for connection acknowledgment for %s...", label)
+    
+    while (time.time() - start_time) < timeout:
+        try:
+            message = await asyncio.wait_for(ws.recv(), timeout=2.0)
+            data = json.loads(message)
+            logger.debug("📨 Received handshake frame for %s: %s", label, data)
+            
+            if data.get("type") == "connection_ack":
+                logger.info(f"✅ WebSocket connection acknowledged for {label}")
+                return ws
+            
+            if data.get("type") == "connection_error":
+                auth_error = ConsoleAuthError(f"Connection rejected: {data.get('payload')}")
+                break
+                
+        except asyncio.TimeoutError:
+            logger.debug("⏳ Still waiting for ack for %s...", label)
+            continue
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ JSON decode error: {e}")
+            continue
+        except Exception as e:
+            logger.error(f"❌ Error during connection ack: {e}")
+            break
+    
+    try:
+        await ws.close()
+    except Exception:
+        pass
+    if auth_error:
+        raise auth_error
+    raise Exception(f"Connection acknowledgment timeout after {timeout}s")
+
 class GPortalWebSocketClient:
     """WebSocket client for G-Portal live console monitoring"""
     
@@ -46,9 +139,14 @@ class GPortalWebSocketClient:
         self.ws = None
         self.connected = False
         self.running = False
+        self.stop_requested = False
+        self.last_error = None
         self.reconnect_attempts = 0
-        self.max_reconnect_attempts = 5
-        self.message_buffer = deque(maxlen=Config.CONSOLE_MESSAGE_BUFFER_SIZE)
+        self.max_reconnect_attempts = Config.WEBSOCKET_MAX_RECONNECT_ATTEMPTS
+        self.message_buffer = IndexedMessageBuffer(maxlen=Config.CONSOLE_MESSAGE_BUFFER_SIZE)
+        self.counters = StreamCounters()
+        self.consumer_queue = ConsumerQueue()
+        self._consumer_task = None
         
     async def connect(self):
         """
@@ -58,90 +156,32 @@ class GPortalWebSocketClient:
             bool: True if connection successful
         """
         try:
-            uri = Config.WEBSOCKET_URI
-            
             logger.info(f"🔄 Connecting to WebSocket for server {self.server_id} ({self.region})")
             
-            # Try different connection methods for compatibility
-            try:
-                # Method 1: Try with subprotocols parameter (most compatible)
-                self.ws = await websockets.connect(
-                    uri,
-                    subprotocols=["graphql-ws"],
-                    ping_interval=Config.WEBSOCKET_PING_INTERVAL,
-                    ping_timeout=Config.WEBSOCKET_PING_TIMEOUT
-                )
-                logger.info(f"✅ WebSocket connected using method 1 for server {self.server_id}")
-                
-            except Exception as e1:
-                logger.warning(f"⚠️ Method 1 failed: {e1}")
-                try:
-                    # Method 2: Basic connection without extra parameters
-                    self.ws = await websockets.connect(uri)
-                    logger.info(f"✅ WebSocket connected using method 2 for server {self.server_id}")
-                    
-                except Exception as e2:
-                    logger.error(f"❌ All connection methods failed: {e1}, {e2}")
-                    raise e2
-            
-            # Initialize connection with authentication
-            init_message = {
-                "type": "connection_init",
-                "payload": {
-                    "authorization": f"Bearer {self.token}"
-                }
-            }
-            
-            await self.ws.send(json.dumps(init_message))
-            logger.info(f"📤 Sent connection_init for server {self.server_id}")
+            self.ws = await open_console_socket(self.token, f"server {self.server_id}")
             
-            # Wait for connection acknowledgment
-            ack_received = False
-            timeout = Config.WEBSOCKET_CONNECTION_TIMEOUT
-            start_time = time.time()
-            
-            logger.info(f"⏳ Waiting for connection acknowledgment for server {self.server_id}...")
-            
-            while not ack_received and (time.time() - start_time) < timeout:
-                try:
-                    message = await asyncio.wait_for(self.ws.recv(), timeout=2.0)
-                    data = json.loads(message)
-                    logger.info(f"📨 Received message: {data}")
-                    
-                    if data.get("type") == "connection_ack":
-                        ack_received = True
-                        logger.info(f"✅ WebSocket connection acknowledged for server {self.server_id}")
-                        
-                        # Subscribe to console messages
-                        await self.subscribe_to_console()
-                        self.connected = True
-                        self.reconnect_attempts = 0
-                        break
-                        
-                except asyncio.TimeoutError:
-                    logger.debug(f"⏳ Still waiting for ack for server {self.server_id}...")
-                    continue
-                except json.JSONDecodeError as e:
-                    logger.error(f"❌ JSON decode error: {e}")
-                    continue
-                except Exception as e:
-                    logger.error(f"❌ Error during connection ack: {e}")
-                    break
+            # Subscribe to console messages
+            await self.subscribe_to_console()
+            self.connected = True
+            self.reconnect_attempts = 0
             
-            if not ack_received:
-                raise Exception(f"Connection acknowledgment timeout after {timeout}s")
-                
             return True
             
         except Exception as e:
             logger.error(f"❌ WebSocket connection failed for server {self.server_id}: {e}")
+            self.last_error = e
             self.connected = False
             return False
     
+    @property
+    def subscription_id(self):
+        """graphql-ws operation id of this server's console stream"""
+        return f"console_stream_{self.server_id}"
+    
     async def subscribe_to_console(self):
         """Subscribe to console messages stream"""
         subscription_payload = {
-            "id": f"console_stream_{self.server_id}",
+            "id": self.subscription_id,
             "type": "start",
             "payload": {
                 "variables": {
@@ -204,7 +244,7 @@ class GPortalWebSocketClient:
                     if self.ws and self._is_connection_open():
                         try:
                             await self.ws.ping()
-                            logger.debug(f"📡 Ping sent to server {self.server_id}")
+                            logger.debug("📡 Ping sent to server %s", self.server_id)
                         except Exception as ping_error:
                             logger.warning(f"⚠️ Ping failed for server {self.server_id}: {ping_error}")
                     continue
@@ -231,12 +271,23 @@ class GPortalWebSocketClient:
     async def process_message(self, message):
         """Process incoming WebSocket message"""
         try:
-            data = json.loads(message)
-            
+            await self.process_data(json.loads(message), len(message))
+        except json.JSONDecodeError:
+            logger.error(f"❌ Invalid JSON message from server {self.server_id}: {message[:100]}...")
+    
+    async def process_data(self, data, size=0):
+        """
+        Process a decoded graphql-ws message for this server
+        
+        Args:
+            data (dict): Decoded protocol message
+            size (int): Raw frame size in bytes (for stream counters)
+        """
+        try:
             # Handle different message types
             if data.get("type") == "data":
                 stream_id = data.get("id", "")
-                if f"console_stream_{self.server_id}" in stream_id:
+                if self.subscription_id in stream_id:
                     payload = data.get("payload", {})
                     console_data = payload.get("data", {})
                     
@@ -245,29 +296,31 @@ class GPortalWebSocketClient:
                         message_text = console_msg.get("message", "")
                         
                         if message_text:
-                            # Create structured message object
-                            processed_message = {
-                                "timestamp": datetime.now().isoformat(),
-                                "server_id": self.server_id,
-                                "region": self.region,
-                                "message": message_text,
-                                "stream": console_msg.get("stream", ""),
-                                "channel": console_msg.get("channel", ""),
-                                "type": classify_message(message_text),
-                                "source": "websocket_live"
-                            }
+                            # Classify and extract fields in one rules pass
+                            started = time.perf_counter()
+                            match = console_rules.match(message_text)
+                            self.counters.record(size, time.perf_counter() - started)
+                            
+                            # Compact record; captured fields live on its typed event
+                            timestamp = datetime.now().isoformat()
+                            processed_message = ConsoleMessage(
+                                timestamp, self.server_id, self.region, message_text,
+                                console_msg.get("stream", ""), console_msg.get("channel", ""),
+                                match.type, match.rule,
+                                event=console_events.extract(match, self.server_id, timestamp)
+                            )
                             
-                            # Add to buffer
+                            # Add to buffer (stamps the sequence number) and the on-disk archive
                             self.message_buffer.append(processed_message)
+                            if Config.CONSOLE_ARCHIVE_ENABLED:
+                                console_archive.append(processed_message)
                             
-                            # Call callback if provided
+                            # Hand off to the consumer task so a slow callback never stalls recv()
                             if self.message_callback:
-                                try:
-                                    await self.message_callback(processed_message)
-                                except Exception as callback_error:
-                                    logger.error(f"❌ Callback error for server {self.server_id}: {callback_error}")
+                                self.consumer_queue.put(processed_message)
+                                self._ensure_consumer()
                             
-                            logger.info(f"📨 Live console message from {self.server_id}: {message_text[:100]}...")
+                            self._log_message(message_text)
             
             elif data.get("type") == "error":
                 logger.error(f"❌ WebSocket error for server {self.server_id}: {data}")
@@ -275,23 +328,63 @@ class GPortalWebSocketClient:
             elif data.get("type") == "complete":
                 logger.info(f"✅ Subscription completed for server {self.server_id}")
                 
-        except json.JSONDecodeError:
-            logger.error(f"❌ Invalid JSON message from server {self.server_id}: {message[:100]}...")
         except Exception as e:
             logger.error(f"❌ Error processing message from server {self.server_id}: {e}")
     
+    def _ensure_consumer(self):
+        """Start the consumer task on the running loop if it is not running"""
+        if self._consumer_task is None or self._consumer_task.done():
+            self._consumer_task = asyncio.get_running_loop().create_task(self._consume())
+    
+    async def _consume(self):
+        """Deliver queued messages to the message callback, in order"""
+        while True:
+            message = await self.consumer_queue.get()
+            try:
+                await self.message_callback(message)
+            except Exception as callback_error:
+                logger.error(f"❌ Callback error for server {self.server_id}: {callback_error}")
+    
+    def stop_consumer(self):
+        """Stop the consumer task (queued messages are kept)"""
+        if self._consumer_task is not None and not self._consumer_task.done():
+            self._consumer_task.cancel()
+        self._consumer_task = None
+    
+    def _log_message(self, message_text):
+        """
+        Log a live console line according to WEBSOCKET_MESSAGE_LOG_MODE
+        
+        Busy servers produce many lines per second, so by default only a
+        periodic per-server summary is logged; the counters in
+        get_connection_info() carry the per-line detail.
+        
+        Args:
+            message_text (str): Console line
+        """
+        mode = Config.WEBSOCKET_MESSAGE_LOG_MODE
+        if mode == 'sampled':
+            count = self.counters.take_log_sample(Config.WEBSOCKET_MESSAGE_LOG_INTERVAL)
+            if count:
+                logger.info("📨 %d live console messages from %s since last sample, latest: %.100s",
+                            count, self.server_id, message_text)
+        elif mode == 'all':
+            logger.info("📨 Live console message from %s: %.100s", self.server_id, message_text)
+    
     async def disconnect(self):
         """Cleanly disconnect WebSocket"""
         logger.info(f"🔌 Disconnecting WebSocket for server {self.server_id}")
         
+        self.stop_requested = True
         self.running = False
         self.connected = False
+        self.stop_consumer()
         
         if self.ws and self._is_connection_open():
             try:
                 # Send stop message for subscription
                 stop_message = {
-                    "id": f"console_stream_{self.server_id}",
+                    "id": self.subscription_id,
                     "type": "stop"
                 }
                 await self.ws.send(json.dumps(stop_message))
@@ -303,28 +396,62 @@ class GPortalWebSocketClient:
             except Exception as e:
                 logger.warning(f"⚠️ Error during disconnect for server {self.server_id}: {e}")
     
-    def get_recent_messages(self, limit=50, message_type=None):
+    def record_gap(self, event, started_at=None):
+        """
+        Add a gap marker to the buffer around a lost connection
+        
+        Args:
+            event (str): 'start' when the stream dropped, 'end' when it resumed
+            started_at (str): ISO time the gap started (for 'end' markers)
+        """
+        now = datetime.now().isoformat()
+        if event == 'start':
+            text = "Live console stream interrupted - messages may be missing until it resumes"
+        else:
+            text = f"Live console stream resumed - messages since {started_at} may be missing"
+        
+        marker = {
+            "timestamp": now,
+            "server_id": self.server_id,
+            "region": self.region,
+            "message": text,
+            "stream": "",
+            "channel": "",
+            "type": "gap",
+            "source": "websocket_gap",
+            "gap": {
+                "event": event,
+                "started_at": started_at or now,
+                "ended_at": now if event == 'end' else None
+            }
+        }
+        self.message_buffer.append(marker)
+        if Config.CONSOLE_ARCHIVE_ENABLED:
+            console_archive.append(marker)
+    
+    def get_recent_messages(self, limit=50, message_type=None, since=None):
         """
         Get recent messages from buffer
         
         Args:
             limit (int): Maximum number of messages to return
             message_type (str): Filter by message type, None for all
+            since (int): Only return messages after this sequence number
+                (oldest first, up to limit)
             
         Returns:
             list: List of recent messages
         """
-        messages = list(self.message_buffer)
-        
-        # Filter by type if specified
-        if message_type and message_type != "all":
-            messages = [msg for msg in messages if msg.get("type") == message_type]
+        if since is not None:
+            return self.message_buffer.since(since, message_type, limit)
         
-        # Sort by timestamp (most recent last)
-        messages.sort(key=lambda x: x.get("timestamp", ""))
+        # Buffer is in arrival order - walk back from the newest entry
+        newest = self.message_buffer.iter_newest(message_type)
+        messages = list(itertools.islice(newest, limit)) if limit else list(newest)
         
-        # Return requested number of messages
-        return messages[-limit:] if limit else messages
+        # Most recent last
+        messages.reverse()
+        return messages
     
     def get_connection_info(self):
         """
@@ -341,5 +468,7 @@ class GPortalWebSocketClient:
             "is_test": self.is_test,
             "message_count": len(self.message_buffer),
             "reconnect_attempts": self.reconnect_attempts,
-            "max_reconnect_attempts": self.max_reconnect_attempts
+            "max_reconnect_attempts": self.max_reconnect_attempts,
+            "stream": self.counters.get_stats(),
+            "consumer_queue": self.consumer_queue.get_stats()
         }
@@ -4,13 +4,22 @@ GUST Bot Enhanced - WebSocket Manager
 Manages multiple WebSocket connections for live console monitoring
 """
 
+import heapq
+import random
 import asyncio
-import threading
+import itertools
 import logging
+from collections import ChainMap
 from datetime import datetime
 
-from config import WEBSOCKETS_AVAILABLE
-from .client import GPortalWebSocketClient
+from config import Config, WEBSOCKETS_AVAILABLE
+from utils.helpers import load_token, token_cache
+from utils.console_rules import console_rules
+from utils.console_events import console_events
+from utils.runtime import runtime
+from .client import GPortalWebSocketClient, ConsoleAuthError
+from .metrics import LogSampler
+from .multiplexer import MultiplexedConnection, ServerSubscription
 
 logger = logging.getLogger(__name__)
 
@@ -26,31 +35,22 @@ class WebSocketManager:
         """
         self.gust_bot = gust_bot
         self.connections = {}
+        self.multiplexed = {}
+        self.multiplex = Config.WEBSOCKET_MULTIPLEX
         self.loop = None
         self.running = False
+        self.notify_sampler = LogSampler()
         
     def start(self):
-        """Start the WebSocket manager in a separate thread"""
+        """Start the WebSocket manager on the shared async runtime"""
         if not self.running and WEBSOCKETS_AVAILABLE:
+            runtime.start()
+            self.loop = runtime.loop
             self.running = True
-            thread = threading.Thread(target=self._run_loop, daemon=True)
-            thread.start()
             logger.info("🚀 WebSocket manager started")
         elif not WEBSOCKETS_AVAILABLE:
             logger.warning("⚠️ WebSocket manager not started - websockets package not available")
     
-    def _run_loop(self):
-        """Run the asyncio event loop"""
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        
-        try:
-            self.loop.run_forever()
-        except Exception as e:
-            logger.error(f"❌ WebSocket manager loop error: {e}")
-        finally:
-            self.loop.close()
-    
     def add_connection(self, server_id, region, token):
         """
         Add a new WebSocket connection
@@ -80,6 +80,9 @@ class WebSocketManager:
                 self.loop
             )
         
+        if self.multiplex:
+            return self._add_subscription(storage_key, server_id, region, token)
+        
         # Create new connection
         client = GPortalWebSocketClient(
             server_id,  # Pass original server_id (may include _test)
@@ -98,30 +101,173 @@ class WebSocketManager:
         
         return future
     
+    def _add_subscription(self, storage_key, server_id, region, token):
+        """
+        Carry a server's console stream on the shared connection for its token
+        
+        Args:
+            storage_key (str): Connection storage key
+            server_id: Server ID (may include test suffix)
+            region (str): Server region
+            token (str): G-Portal authentication token
+            
+        Returns:
+            Future: Asyncio future for the subscription (or connection) task
+        """
+        connection = self.multiplexed.get(token)
+        is_new = connection is None or connection.closed
+        if is_new:
+            connection = MultiplexedConnection(token, self._message_callback)
+            self.multiplexed[token] = connection
+        
+        subscription = ServerSubscription(server_id, region, connection, self._message_callback)
+        self.connections[storage_key] = subscription
+        
+        if is_new:
+            # Register before connecting so the stream starts right after the handshake
+            connection.subscriptions[subscription.subscription_id] = subscription
+            return asyncio.run_coroutine_threadsafe(
+                self._connect_and_listen(connection),
+                self.loop
+            )
+        
+        return asyncio.run_coroutine_threadsafe(
+            connection.add_subscription(subscription),
+            self.loop
+        )
+    
+    def _release_multiplexed(self, connection):
+        """Close a shared connection once its last subscription is gone"""
+        if connection.subscriptions:
+            return
+        
+        for token, existing in list(self.multiplexed.items()):
+            if existing is connection:
+                del self.multiplexed[token]
+        
+        if self.loop and not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(connection.disconnect(), self.loop)
+    
     async def _connect_and_listen(self, client):
         """
-        Connect and start listening for a client
+        Connect and keep a client listening, reconnecting until it is removed
+        
+        Lost connections are retried with jittered exponential backoff. The
+        token is re-read (and refreshed after an auth rejection) before each
+        attempt, connect() re-subscribes the console streams, and gap markers
+        are written to the buffers so consumers can see where messages may
+        be missing.
         
         Args:
-            client: GPortalWebSocketClient instance
+            client: GPortalWebSocketClient or MultiplexedConnection instance
         """
+        label = f"server {client.server_id}" if hasattr(client, 'server_id') else "multiplexed connection"
+        gap_started = None
+        
         try:
-            if await client.connect():
-                await client.listen_for_messages()
-            else:
-                logger.error(f"❌ Failed to connect WebSocket for server {client.server_id}")
-        except Exception as e:
-            logger.error(f"❌ Error in connect_and_listen for server {client.server_id}: {e}")
+            while self.running and not client.stop_requested:
+                try:
+                    connected = await client.connect()
+                except Exception as e:
+                    logger.error(f"❌ Error in connect_and_listen for {label}: {e}")
+                    client.last_error = e
+                    connected = False
+                
+                if connected:
+                    if gap_started:
+                        client.record_gap('end', gap_started)
+                        logger.info(f"✅ Live console resumed for {label} after {client.reconnect_attempts} attempt(s)")
+                        gap_started = None
+                    client.reconnect_attempts = 0
+                    
+                    await client.listen_for_messages()
+                    
+                    if client.stop_requested or not self.running:
+                        break
+                    
+                    gap_started = datetime.now().isoformat()
+                    client.record_gap('start')
+                    logger.warning(f"⚠️ Live console lost for {label}, reconnecting")
+                else:
+                    logger.error(f"❌ Failed to connect WebSocket for {label}")
+                
+                client.reconnect_attempts += 1
+                if client.max_reconnect_attempts and client.reconnect_attempts > client.max_reconnect_attempts:
+                    logger.error(f"❌ Giving up on {label} after {client.max_reconnect_attempts} reconnect attempts")
+                    break
+                
+                delay = self._reconnect_delay(client.reconnect_attempts)
+                logger.info(f"🔄 Reconnecting {label} in {delay:.1f}s (attempt {client.reconnect_attempts})")
+                await asyncio.sleep(delay)
+                
+                if not client.stop_requested:
+                    await self._refresh_client_token(client)
+        finally:
             client.connected = False
+            client.closed = True
+    
+    def _reconnect_delay(self, attempt):
+        """
+        Get the backoff delay before a reconnect attempt
+        
+        Args:
+            attempt (int): Consecutive failed attempts so far (1-based)
+            
+        Returns:
+            float: Seconds to wait
+        """
+        ceiling = min(
+            Config.WEBSOCKET_RECONNECT_MAX_DELAY,
+            Config.WEBSOCKET_RECONNECT_BASE_DELAY * (2 ** min(attempt - 1, 16))
+        )
+        # Keep half the backoff and randomize the rest so servers don't reconnect in lockstep
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+    
+    async def _refresh_client_token(self, client):
+        """
+        Re-fetch the token before reconnecting, forcing a refresh after an auth rejection
+        
+        Args:
+            client: GPortalWebSocketClient or MultiplexedConnection instance
+        """
+        loop = asyncio.get_event_loop()
+        
+        try:
+            if isinstance(client.last_error, ConsoleAuthError):
+                logger.warning("🔐 Live console token rejected, refreshing")
+                await loop.run_in_executor(None, token_cache.refresh)
+            
+            token = await loop.run_in_executor(None, load_token)
+        except Exception as e:
+            logger.error(f"❌ Error re-fetching token for reconnect: {e}")
+            return
+        
+        client.last_error = None
+        if not token or token == client.token:
+            return
+        
+        if isinstance(client, MultiplexedConnection):
+            for key, existing in list(self.multiplexed.items()):
+                if existing is client:
+                    del self.multiplexed[key]
+            self.multiplexed.setdefault(token, client)
+        
+        client.token = token
     
     async def _message_callback(self, message):
         """
         Callback for processing incoming messages
         
         Args:
-            message (dict): Message data from WebSocket
+            message (ConsoleMessage): Message record from WebSocket
         """
-        logger.info(f"📨 WebSocket callback received: {message['message'][:100]}...")
+        # Push to Server-Sent Events clients
+        console_stream = getattr(self.gust_bot, 'console_stream', None)
+        if console_stream:
+            console_stream.publish(message)
+        
+        # Typed events for KOTH, economy and stats subscribers
+        console_events.process(message)
         
         # Process special message types
         await self._process_special_messages(message)
@@ -130,27 +276,45 @@ class WebSocketManager:
         """
         Process special message types
         
+        The rule that classified the message decides what happens, so no
+        second round of text matching is needed here. Notify lines follow
+        WEBSOCKET_MESSAGE_LOG_MODE like the per-line message logs: 'all'
+        logs each one, 'sampled' at most one per server and rule each
+        interval (with a count of the skipped ones), 'off' none. The
+        template is only formatted for lines that are actually logged.
+        
         Args:
-            message (dict): Message data
+            message (ConsoleMessage): Message record
         """
-        msg_text = message["message"]
-        msg_type = message["type"]
+        rule = console_rules.get_rule(message.get("rule"))
+        if not rule or not rule.notify:
+            return
+        
+        mode = Config.WEBSOCKET_MESSAGE_LOG_MODE
+        if mode == 'off':
+            return
         
-        # Process VIP/Auth updates
-        if msg_type == "auth" and any(keyword in msg_text for keyword in ["VIP", "Admin", "Moderator"]):
-            logger.info(f"🔐 Auth levels update detected for server {message['server_id']}")
+        level = logging.WARNING if rule.notify.get("level") == "warning" else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
         
-        # Process chat messages
-        elif msg_type == "chat":
-            logger.info(f"💬 Chat message detected: {msg_text[:50]}...")
+        skipped = 0
+        if mode == 'sampled':
+            skipped = self.notify_sampler.take((message.get("server_id"), rule.name),
+                                               Config.WEBSOCKET_MESSAGE_LOG_INTERVAL)
+            if skipped is None:
+                return
         
-        # Process save events
-        elif msg_type == "save":
-            logger.info(f"💾 Server save event for server {message['server_id']}")
+        try:
+            text = rule.notify.get("template", "{message}").format_map(ChainMap(message.get("fields") or {}, message))
+        except (KeyError, IndexError, ValueError) as e:
+            logger.debug("Bad notify template for rule %s: %s", rule.name, e)
+            return
         
-        # Process errors
-        elif msg_type == "error":
-            logger.warning(f"⚠️ Server error detected: {msg_text[:100]}...")
+        if skipped:
+            logger.log(level, "%s (+%d more since last sample)", text, skipped)
+        else:
+            logger.log(level, text)
     
     def remove_connection(self, server_id):
         """
@@ -165,10 +329,12 @@ class WebSocketManager:
         if storage_key in self.connections:
             client = self.connections[storage_key]
             if self.loop and not self.loop.is_closed():
-                asyncio.run_coroutine_threadsafe(
+                future = asyncio.run_coroutine_threadsafe(
                     client.disconnect(), 
                     self.loop
                 )
+                if isinstance(client, ServerSubscription):
+                    future.add_done_callback(lambda _: self._release_multiplexed(client.connection))
             del self.connections[storage_key]
             logger.info(f"🔌 Removed WebSocket connection for server {storage_key}")
         else:
@@ -189,11 +355,13 @@ class WebSocketManager:
                 "message_count": len(client.message_buffer),
                 "region": client.region,
                 "is_test": client.is_test,
-                "reconnect_attempts": client.reconnect_attempts
+                "reconnect_attempts": client.reconnect_attempts,
+                "stream": client.counters.get_stats(),
+                "consumer_queue": client.consumer_queue.get_stats()
             }
         return status
     
-    def get_messages(self, server_id=None, limit=50, message_type=None):
+    def get_messages(self, server_id=None, limit=50, message_type=None, since=None):
         """
         Get messages from specific server or all servers
         
@@ -201,29 +369,39 @@ class WebSocketManager:
             server_id (str): Specific server ID, None for all servers
             limit (int): Maximum number of messages
             message_type (str): Filter by message type
+            since (int): Only return messages after this sequence number
+                (oldest first, up to limit)
             
         Returns:
-            list: List of messages
+            list: List of message dicts
         """
-        logger.info(f"🔍 get_messages called: server_id={server_id}, limit={limit}, type={message_type}")
+        logger.debug(f"🔍 get_messages called: server_id={server_id}, limit={limit}, type={message_type}, since={since}")
         
         if server_id and server_id in self.connections:
-            messages = self.connections[server_id].get_recent_messages(limit, message_type)
-            logger.info(f"📋 Server {server_id} returned {len(messages)} messages")
-            return messages
+            messages = self.connections[server_id].get_recent_messages(limit, message_type, since)
+            logger.debug(f"📋 Server {server_id} returned {len(messages)} messages")
+            return [dict(message) for message in messages]
+        elif since is not None:
+            # Only entries newer than the cursor are touched in each buffer
+            new_messages = []
+            for client in list(self.connections.values()):
+                new_messages.extend(client.get_recent_messages(limit, message_type, since))
+            
+            new_messages.sort(key=lambda x: x.get("seq", 0))
+            return [dict(message) for message in (new_messages[:limit] if limit else new_messages)]
         else:
-            # Get messages from all servers
-            all_messages = []
-            for server_key, client in self.connections.items():
-                client_messages = client.get_recent_messages(limit, message_type)
-                all_messages.extend(client_messages)
-                logger.info(f"📋 Server {server_key} contributed {len(client_messages)} messages")
+            # Each buffer is already in arrival order, so lazily merge their
+            # tails newest-first and stop after limit messages
+            streams = [
+                client.message_buffer.iter_newest(message_type)
+                for client in list(self.connections.values())
+            ]
+            merged = heapq.merge(*streams, key=lambda x: x.get("seq", 0), reverse=True)
+            final_messages = list(itertools.islice(merged, limit)) if limit else list(merged)
+            final_messages.reverse()
             
-            # Sort by timestamp and return most recent
-            all_messages.sort(key=lambda x: x["timestamp"])
-            final_messages = all_messages[-limit:] if limit else all_messages
-            logger.info(f"📋 Total combined messages: {len(final_messages)}")
-            return final_messages
+            logger.debug(f"📋 Total combined messages: {len(final_messages)} from {len(streams)} servers")
+            return [dict(message) for message in final_messages]
     
     def get_connection(self, server_id):
         """
@@ -261,6 +439,12 @@ class WebSocketManager:
         total_connections = len(self.connections)
         active_connections = sum(1 for client in self.connections.values() if client.connected)
         total_messages = sum(len(client.message_buffer) for client in self.connections.values())
+        streams = [client.counters.get_stats() for client in self.connections.values()]
+        queues = [client.consumer_queue.get_stats() for client in self.connections.values()]
+        dropped_by_type = {}
+        for queue in queues:
+            for message_type, count in queue["dropped_by_type"].items():
+                dropped_by_type[message_type] = dropped_by_type.get(message_type, 0) + count
         
         return {
             "websockets_available": WEBSOCKETS_AVAILABLE,
@@ -268,6 +452,22 @@ class WebSocketManager:
             "total_connections": total_connections,
             "active_connections": active_connections,
             "total_messages": total_messages,
+            "throughput": {
+                "messages_per_sec": round(sum(stream["messages_per_sec"] for stream in streams), 2),
+                "bytes_per_sec": round(sum(stream["bytes_per_sec"] for stream in streams), 1),
+                "message_log_mode": Config.WEBSOCKET_MESSAGE_LOG_MODE,
+                "notify_logs_suppressed": self.notify_sampler.suppressed
+            },
+            "consumer_queues": {
+                "policy": Config.WEBSOCKET_OVERFLOW_POLICY,
+                "depth": sum(queue["depth"] for queue in queues),
+                "max_depth": max((queue["depth"] for queue in queues), default=0),
+                "dropped": sum(queue["dropped"] for queue in queues),
+                "dropped_by_type": dropped_by_type
+            },
+            "multiplexed": self.multiplex,
+            "sockets": len(self.multiplexed) if self.multiplex else total_connections,
+            "multiplexed_connections": [conn.get_info() for conn in self.multiplexed.values()],
             "connection_details": self.get_connection_status()
         }
     
@@ -287,7 +487,5 @@ class WebSocketManager:
             self.disconnect_all()
             self.running = False
             
-            if self.loop and not self.loop.is_closed():
-                self.loop.call_soon_threadsafe(self.loop.stop)
-            
+            # The loop belongs to the shared runtime and keeps running
             logger.info("🛑 WebSocket manager stopped")
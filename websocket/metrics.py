@@ -0,0 +1,143 @@
+"""
+GUST Bot Enhanced - WebSocket Stream Metrics
+===========================================
+Per-server live console counters used in place of per-line logging
+"""
+
+import time
+from collections import deque
+
+from config import Config
+
+class StreamCounters:
+    """
+    Message, byte and classification counters for one console stream
+    
+    Recording a message only bumps integers and the current one-second
+    bucket, so it is cheap enough to run for every line on the event
+    loop. Rates are computed from the buckets when stats are read.
+    """
+    
+    __slots__ = ('window', 'messages', 'bytes', 'classify_seconds', 'classify_max',
+                 'last_message_at', '_buckets', '_last_sample', '_unsampled')
+    
+    def __init__(self, window=None):
+        """
+        Initialize stream counters
+        
+        Args:
+            window (int): Seconds of history used for the per-second rates
+        """
+        self.window = window or Config.WEBSOCKET_STATS_WINDOW
+        self.messages = 0
+        self.bytes = 0
+        self.classify_seconds = 0.0
+        self.classify_max = 0.0
+        self.last_message_at = None
+        self._buckets = deque(maxlen=self.window + 1)
+        self._last_sample = None
+        self._unsampled = 0
+    
+    def record(self, size, classify_seconds):
+        """
+        Count one console message
+        
+        Args:
+            size (int): Frame size in bytes
+            classify_seconds (float): Time spent classifying the line
+        """
+        now = time.time()
+        second = int(now)
+        
+        self.messages += 1
+        self.bytes += size
+        self.classify_seconds += classify_seconds
+        if classify_seconds > self.classify_max:
+            self.classify_max = classify_seconds
+        self.last_message_at = now
+        self._unsampled += 1
+        
+        buckets = self._buckets
+        if buckets and buckets[-1][0] == second:
+            buckets[-1][1] += 1
+            buckets[-1][2] += size
+        else:
+            buckets.append([second, 1, size])
+    
+    def take_log_sample(self, interval):
+        """
+        Check whether a sampled log line is due
+        
+        Args:
+            interval (float): Minimum seconds between sampled log lines
+            
+        Returns:
+            int: Messages since the last sample if one is due, else 0
+        """
+        now = time.monotonic()
+        if self._last_sample is not None and now - self._last_sample < interval:
+            return 0
+        
+        self._last_sample = now
+        count, self._unsampled = self._unsampled, 0
+        return count
+    
+    def get_stats(self):
+        """
+        Get counters and recent rates
+        
+        Returns:
+            dict: Totals, messages/bytes per second and classify timings
+        """
+        cutoff = int(time.time()) - self.window
+        recent = [bucket for bucket in list(self._buckets) if bucket[0] > cutoff]
+        
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "messages_per_sec": round(sum(bucket[1] for bucket in recent) / self.window, 2),
+            "bytes_per_sec": round(sum(bucket[2] for bucket in recent) / self.window, 1),
+            "classify_avg_us": round(self.classify_seconds / self.messages * 1e6, 1) if self.messages else 0.0,
+            "classify_max_us": round(self.classify_max * 1e6, 1),
+            "last_message_at": self.last_message_at
+        }
+
+class LogSampler:
+    """
+    Lets through at most one log line per key and interval
+    
+    Lines in between are only counted, and the count is reported with
+    the next line let through. Used on the event loop thread only.
+    """
+    
+    __slots__ = ('_keys', 'suppressed')
+    
+    def __init__(self):
+        """Initialize log sampler"""
+        self._keys = {}
+        self.suppressed = 0
+    
+    def take(self, key, interval):
+        """
+        Check whether a log line for a key is due
+        
+        Args:
+            key: Sampling key (e.g. server ID and rule name)
+            interval (float): Minimum seconds between lines for the key
+            
+        Returns:
+            int: Lines skipped since the last one if due, else None
+        """
+        now = time.monotonic()
+        entry = self._keys.get(key)
+        if entry is None:
+            self._keys[key] = [now, 0]
+            return 0
+        if now - entry[0] < interval:
+            entry[1] += 1
+            self.suppressed += 1
+            return None
+        
+        skipped = entry[1]
+        entry[0], entry[1] = now, 0
+        return skipped
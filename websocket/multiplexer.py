@@ -0,0 +1,288 @@
+"""
+GUST Bot Enhanced - Multiplexed WebSocket Connection
+===================================================
+One G-Portal WebSocket carrying console subscriptions for many servers
+"""
+
+import json
+import asyncio
+import logging
+
+from config import Config, WEBSOCKETS_AVAILABLE
+from .client import GPortalWebSocketClient, open_console_socket
+
+if WEBSOCKETS_AVAILABLE:
+    import websockets
+
+logger = logging.getLogger(__name__)
+
+class ServerSubscription(GPortalWebSocketClient):
+    """
+    Console stream for one server carried by a shared connection
+    
+    Keeps the buffer, status attributes and message handling of
+    GPortalWebSocketClient, so the manager treats it like any other
+    client, but it never opens a socket of its own.
+    """
+    
+    def __init__(self, server_id, region, connection, message_callback=None):
+        """
+        Initialize server subscription
+        
+        Args:
+            server_id: Server ID (may include test suffix)
+            region (str): Server region (US, EU, AS)
+            connection (MultiplexedConnection): Connection carrying the stream
+            message_callback: Async callback function for messages
+        """
+        super().__init__(server_id, region, connection.token, message_callback)
+        self.connection = connection
+    
+    async def connect(self):
+        """
+        Start the subscription on the shared connection
+        
+        Returns:
+            bool: True if the connection is up and the stream was started
+        """
+        await self.connection.add_subscription(self)
+        return self.connected
+    
+    async def disconnect(self):
+        """Stop the subscription without touching the shared socket"""
+        logger.info(f"🔌 Unsubscribing console stream for server {self.server_id}")
+        self.stop_consumer()
+        await self.connection.remove_subscription(self.server_id)
+    
+    def get_connection_info(self):
+        """
+        Get connection information
+        
+        Returns:
+            dict: Connection status and info
+        """
+        info = super().get_connection_info()
+        info["multiplexed"] = True
+        return info
+
+class MultiplexedConnection:
+    """
+    Single G-Portal WebSocket for all console subscriptions of one token
+    
+    The graphql-ws protocol tags every frame with the id of the operation
+    it belongs to, so one socket, one handshake and one keepalive can serve
+    any number of console_stream_{server_id} subscriptions. Incoming frames
+    are routed to their subscription by id, and subscriptions can be added
+    or removed while the socket stays open.
+    """
+    
+    def __init__(self, token, message_callback=None):
+        """
+        Initialize multiplexed connection
+        
+        Args:
+            token (str): G-Portal authentication token
+            message_callback: Async callback function for messages
+        """
+        self.token = token
+        self.message_callback = message_callback
+        self.ws = None
+        self.connected = False
+        self.running = False
+        self.closed = False
+        self.stop_requested = False
+        self.last_error = None
+        self.reconnect_attempts = 0
+        self.max_reconnect_attempts = Config.WEBSOCKET_MAX_RECONNECT_ATTEMPTS
+        self.subscriptions = {}
+        
+        self.handshakes = 0
+        self.frames_routed = 0
+        self.frames_unrouted = 0
+    
+    async def connect(self):
+        """
+        Open the socket and start every registered subscription
+        
+        Returns:
+            bool: True if connection successful
+        """
+        try:
+            logger.info(f"🔄 Opening multiplexed WebSocket for {len(self.subscriptions)} server(s)")
+            
+            self.ws = await open_console_socket(self.token, "multiplexed connection")
+            self.handshakes += 1
+            self.connected = True
+            self.closed = False
+            
+            for subscription in list(self.subscriptions.values()):
+                await self._start(subscription)
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Multiplexed WebSocket connection failed: {e}")
+            self.last_error = e
+            self.connected = False
+            return False
+    
+    async def _start(self, subscription):
+        """Send the start frame for a subscription on the open socket"""
+        subscription.ws = self.ws
+        subscription.token = self.token
+        try:
+            await subscription.subscribe_to_console()
+            subscription.connected = True
+            subscription.running = True
+            subscription.reconnect_attempts = 0
+        except Exception:
+            subscription.connected = False
+    
+    async def add_subscription(self, subscription):
+        """
+        Register a subscription and start it if the socket is open
+        
+        Args:
+            subscription (ServerSubscription): Subscription to carry
+        """
+        existing = self.subscriptions.get(subscription.subscription_id)
+        if existing is not None and existing is not subscription:
+            await self.remove_subscription(existing.server_id)
+        
+        self.subscriptions[subscription.subscription_id] = subscription
+        
+        if self.connected and self._is_connection_open():
+            await self._start(subscription)
+    
+    async def remove_subscription(self, server_id):
+        """
+        Stop a server's subscription, keeping the socket open for the rest
+        
+        Args:
+            server_id: Server ID to unsubscribe
+        """
+        subscription_id = f"console_stream_{int(str(server_id).split('_')[0])}"
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return
+        
+        subscription.connected = False
+        subscription.running = False
+        
+        if self.connected and self._is_connection_open():
+            try:
+                await self.ws.send(json.dumps({"id": subscription_id, "type": "stop"}))
+            except Exception as e:
+                logger.warning(f"⚠️ Error stopping subscription {subscription_id}: {e}")
+    
+    def _is_connection_open(self):
+        """Check if WebSocket connection is open"""
+        return GPortalWebSocketClient._is_connection_open(self)
+    
+    async def listen_for_messages(self):
+        """Receive frames and route them to their subscriptions"""
+        self.running = True
+        logger.info(f"👂 Starting multiplexed listener for {len(self.subscriptions)} server(s)")
+        
+        try:
+            while self.running and self.connected:
+                try:
+                    message = await asyncio.wait_for(self.ws.recv(), timeout=10.0)
+                    await self.route_message(message)
+                    
+                except asyncio.TimeoutError:
+                    # Send ping to keep connection alive
+                    if self.ws and self._is_connection_open():
+                        try:
+                            await self.ws.ping()
+                        except Exception as ping_error:
+                            logger.warning(f"⚠️ Multiplexed ping failed: {ping_error}")
+                    continue
+                    
+                except websockets.exceptions.ConnectionClosed as e:
+                    logger.warning(f"⚠️ Multiplexed WebSocket closed: {e}")
+                    break
+                except websockets.exceptions.WebSocketException as e:
+                    logger.error(f"❌ Multiplexed WebSocket error: {e}")
+                    break
+                except Exception as e:
+                    logger.error(f"❌ Error routing multiplexed message: {e}")
+                    continue
+                    
+        finally:
+            self.connected = False
+            self.running = False
+            for subscription in self.subscriptions.values():
+                subscription.connected = False
+                subscription.running = False
+            logger.info("🔌 Multiplexed listener stopped")
+    
+    async def route_message(self, message):
+        """
+        Route one raw frame to the subscription named by its id
+        
+        Args:
+            message (str): Raw WebSocket frame
+        """
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            logger.error(f"❌ Invalid JSON on multiplexed connection: {message[:100]}...")
+            return
+        
+        subscription = self.subscriptions.get(data.get("id"))
+        if subscription is not None:
+            self.frames_routed += 1
+            await subscription.process_data(data, len(message))
+        elif data.get("type") == "connection_error":
+            logger.error(f"❌ Multiplexed connection error: {data}")
+        elif data.get("type") not in ("ka", "connection_ack"):
+            self.frames_unrouted += 1
+            logger.debug(f"📭 Unrouted frame on multiplexed connection: {data.get('id')}")
+    
+    async def disconnect(self):
+        """Stop every subscription and close the socket"""
+        logger.info(f"🔌 Closing multiplexed WebSocket ({len(self.subscriptions)} subscription(s))")
+        self.stop_requested = True
+        
+        for server_id in [sub.server_id for sub in self.subscriptions.values()]:
+            await self.remove_subscription(server_id)
+        
+        self.running = False
+        self.connected = False
+        self.closed = True
+        
+        if self.ws and self._is_connection_open():
+            try:
+                await self.ws.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Error closing multiplexed WebSocket: {e}")
+    
+    def record_gap(self, event, started_at=None):
+        """
+        Add a gap marker to the buffer of every carried subscription
+        
+        Args:
+            event (str): 'start' when the stream dropped, 'end' when it resumed
+            started_at (str): ISO time the gap started (for 'end' markers)
+        """
+        for subscription in list(self.subscriptions.values()):
+            subscription.record_gap(event, started_at)
+    
+    def get_info(self):
+        """
+        Get multiplexed connection information
+        
+        Returns:
+            dict: Socket status, subscriptions and routing counters
+        """
+        return {
+            "connected": self.connected,
+            "running": self.running,
+            "closed": self.closed,
+            "reconnect_attempts": self.reconnect_attempts,
+            "subscriptions": sorted(sub.server_id for sub in self.subscriptions.values()),
+            "handshakes": self.handshakes,
+            "frames_routed": self.frames_routed,
+            "frames_unrouted": self.frames_unrouted
+        }